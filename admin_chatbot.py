@@ -27,8 +27,30 @@ from database_utils import (
     get_all_chatbots,
     update_chatbot_index,
     update_chatbot_container,
-    delete_chatbot
+    delete_chatbot,
+    get_chatbot_by_name,
+    get_index_version,
+    update_chatbot_retrieval_mode,
+    update_chatbot_performance_profile
 )
+from cache_utils import answer_cache, semantic_cache
+from coalescing_utils import single_flight
+from embedding_utils import is_embedding_configured
+from streaming_utils import is_streaming_enabled
+from async_engine import async_engine, is_async_engine_enabled
+from rerank_utils import is_rerank_enabled, rerank_stats
+from retrieval_utils import RETRIEVAL_MODES, get_local_search_client
+from rag_engine import create_rag_engine
+from profile_utils import PerformanceProfile, SEARCH_MODES, PROFILE_FIELDS, get_global_defaults
+from model_router import load_deployments
+from fallback_utils import PendingAnswer, replace_with_llm_answer
+from telemetry_utils import telemetry_store, LATENCY_STAGES
+from bm25_index import build_bm25_index
+from vector_index import build_vector_index
+from stub_clients import is_stub_mode, create_stub_clients
+from endpoint_pool import create_openai_client, get_endpoint_pool, get_endpoint_pool_stats
+from resilience_utils import wrap_clients, get_circuit_breaker_stats
+from rate_limiter import rate_limiter
 # 새로운 파일 업로드 모듈 임포트
 from azure_blob_utils import display_file_upload_popup
 
@@ -40,6 +62,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# 검색 + 답변 생성 엔진 (팝업 챗봇, CLI와 같은 경로 사용)
+rag_engine = create_rag_engine()
+
 def format_file_size(size_bytes):
     """파일 크기를 읽기 쉬운 형태로 변환"""
     if size_bytes == 0:
@@ -54,8 +79,11 @@ def format_file_size(size_bytes):
 def create_index_for_container(container_name):
     """특정 컨테이너에 대한 인덱스 생성"""
     try:
-        # 인덱스명 생성 (컨테이너명-index)
-        index_name = f"{container_name}-index"
+        # 인덱스명 생성 (컨테이너명-index, 구간 인덱싱 방식이면 컨테이너명-chunks)
+        if os.getenv("INGEST_MODE", "document").lower() == "passage":
+            index_name = f"{container_name}-chunks"
+        else:
+            index_name = f"{container_name}-index"
         
         # create_index_claud.py 실행
         env = os.environ.copy()
@@ -92,6 +120,37 @@ def create_index_for_container(container_name):
         st.error(f"❌ 인덱스 생성 중 오류 발생: {str(e)}")
         return None
 
+def create_local_index_for_container(container_name):
+    """특정 컨테이너의 텍스트 문서로 로컬 BM25 인덱스 생성"""
+    index_name = f"{container_name}-index"
+    try:
+        with st.spinner(f"📚 '{container_name}' 컨테이너로 로컬 BM25 인덱스를 생성하고 있습니다..."):
+            index = build_bm25_index(index_name, container_name=container_name)
+        
+        if index.document_count == 0:
+            st.error("❌ 인덱싱할 텍스트 문서가 없습니다. (로컬 BM25는 txt/md/csv/json/html 파일만 지원)")
+            return None
+        
+        st.success(f"✅ 로컬 인덱스 '{index_name}'가 생성되었습니다! (구간 {index.document_count}개)")
+        
+        # 임베딩 배포가 있으면 같은 구간으로 로컬 벡터 인덱스도 생성
+        if is_embedding_configured():
+            try:
+                with st.spinner("🧬 로컬 벡터 인덱스를 생성하고 있습니다..."):
+                    if is_stub_mode():
+                        _, openai_client = create_stub_clients(index_name)
+                    else:
+                        openai_client = create_openai_client()
+                    vector_index = build_vector_index(index_name, openai_client, index.documents)
+                st.success(f"✅ 로컬 벡터 인덱스가 생성되었습니다! ({vector_index.dimensions}차원)")
+            except Exception as e:
+                st.warning(f"⚠️ 로컬 벡터 인덱스 생성 실패 (BM25만 사용): {str(e)}")
+        
+        return index_name
+    except Exception as e:
+        st.error(f"❌ 로컬 인덱스 생성 중 오류 발생: {str(e)}")
+        return None
+
 def display_environment_status():
     """환경 설정 상태를 사이드바에 표시"""
     st.sidebar.header("🔧 환경 설정")
@@ -135,6 +194,86 @@ def display_environment_status():
             st.sidebar.write(f"- {chatbot}")
     else:
         st.sidebar.write("실행 중인 챗봇: **0개**")
+    
+    # 답변 캐시 통계
+    st.sidebar.header("⚡ 답변 캐시")
+    cache_stats = answer_cache.get_stats()
+    st.sidebar.write(f"L1 히트: **{cache_stats['l1_hits']}회** / L2 히트: **{cache_stats['l2_hits']}회**")
+    st.sidebar.write(f"미스: **{cache_stats['misses']}회** (히트율 {cache_stats['hit_rate']:.0%})")
+    st.sidebar.write(f"저장된 답변: L1 {cache_stats['l1_entries']}개 / L2 {cache_stats['l2_entries']}개")
+    
+    flight_stats = single_flight.get_stats()
+    if flight_stats['followers']:
+        st.sidebar.write(
+            f"동시 질문 합치기: **{flight_stats['followers']}회** (처리 중 {flight_stats['in_flight']}건)"
+        )
+    
+    if is_embedding_configured():
+        semantic_stats = semantic_cache.get_stats()
+        st.sidebar.write(
+            f"시맨틱 히트: **{semantic_stats['hits']}회** / 미스: **{semantic_stats['misses']}회** "
+            f"(저장된 질문 {semantic_stats['entries']}개)"
+        )
+    
+    # 외부 호출 서킷 브레이커 상태
+    breaker_stats = get_circuit_breaker_stats()
+    if breaker_stats:
+        st.sidebar.header("🛡️ 외부 호출 상태")
+        state_labels = {"closed": "🟢 정상", "half_open": "🟡 확인 중", "open": "🔴 차단"}
+        for breaker in breaker_stats:
+            st.sidebar.write(
+                f"{state_labels.get(breaker['state'], breaker['state'])} `{breaker['name']}` "
+                f"(성공 {breaker['successes']} / 실패 {breaker['failures']} / 거부 {breaker['rejected']})"
+            )
+            if breaker['state'] != 'closed' and breaker['last_error']:
+                st.sidebar.caption(f"마지막 오류: {breaker['last_error']}")
+    
+    # OpenAI 엔드포인트 풀 상태
+    endpoint_stats = get_endpoint_pool_stats()
+    if endpoint_stats:
+        st.sidebar.header("🌐 OpenAI 엔드포인트")
+        for endpoint in endpoint_stats:
+            state = "🟢 정상" if endpoint['state'] == 'healthy' else f"🔴 대기 {endpoint['cooldown_seconds']:.0f}초"
+            latency = f"{endpoint['ewma_ms']:.0f}ms" if endpoint['ewma_ms'] is not None else "-"
+            quota = f"{endpoint['quota_ratio']:.0%}" if endpoint['quota_ratio'] is not None else "-"
+            st.sidebar.write(
+                f"{state} `{endpoint['name']}` 지연 {latency} / 남은 할당량 {quota} "
+                f"(성공 {endpoint['successes']} / 실패 {endpoint['failures']})"
+            )
+            if endpoint['state'] != 'healthy' and endpoint['last_error']:
+                st.sidebar.caption(f"마지막 오류: {endpoint['last_error']}")
+    
+    # OpenAI 할당량 대기열 (챗봇별 공정 큐)
+    limiter_stats = rate_limiter.get_stats()
+    if limiter_stats['enabled']:
+        st.sidebar.header("🚦 OpenAI 할당량")
+        scope = "프로세스 간 공유" if limiter_stats['shared'] else "이 프로세스"
+        st.sidebar.write(f"대기 중인 요청: **{limiter_stats['queue_depth']}건** ({scope})")
+        if len(limiter_stats['deployments']) > 1:
+            st.sidebar.caption(" / ".join(
+                f"{item['deployment']} {item['queue_depth']}건" for item in limiter_stats['deployments']
+            ))
+        for chatbot in limiter_stats['chatbots']:
+            st.sidebar.write(
+                f"`{chatbot['chatbot_name']}` (가중치 {chatbot['weight']:g}): 대기 {chatbot['queue_depth']}건 / "
+                f"평균 대기 {chatbot['avg_wait_ms']:.0f}ms / 최대 {chatbot['max_wait_ms']:.0f}ms"
+            )
+            if chatbot['timeouts']:
+                st.sidebar.caption(f"대기 시간 초과: {chatbot['timeouts']}건")
+    
+    # 재순위화 단계 통계 (단계 비용 대비 절약한 프롬프트 토큰 확인용)
+    if is_rerank_enabled():
+        st.sidebar.header("🧹 재순위화")
+        rerank_summary = rerank_stats.get_stats()
+        timings = rerank_summary['avg_timings']
+        st.sidebar.write(f"실행: **{rerank_summary['runs']}회** (평균 후보 {rerank_summary['avg_candidates']:.1f}개)")
+        st.sidebar.write(
+            f"평균 소요: {timings['total_ms']:.1f}ms "
+            f"(점수 {timings['score_ms']:.1f} / 중복 {timings['dedupe_ms']:.1f} / MMR {timings['mmr_ms']:.1f})"
+        )
+        st.sidebar.write(
+            f"중복 제거: **{rerank_summary['duplicates_removed']}개** (약 {rerank_summary['duplicate_tokens']} 토큰 절약)"
+        )
 
 def display_chatbot_management():
     """챗봇 관리 메인 페이지 - 탭 기반으로 변경"""
@@ -147,14 +286,15 @@ def display_chatbot_management():
     active_chatbot = st.session_state.get('active_chatbot', None)
     
     if active_chatbot:
-        tab1, tab2, tab3, tab4 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5 = st.tabs([
             "📋 챗봇 목록", 
             "➕ 챗봇 등록", 
             "📦 컨테이너 관리", 
+            "📈 성능 지표",
             f"💬 {active_chatbot['name']}"
         ])
         
-        with tab4:
+        with tab5:
             # 챗봇 종료 버튼
             col1, col2 = st.columns([5, 1])
             with col2:
@@ -165,7 +305,7 @@ def display_chatbot_management():
             # 챗봇 UI를 여기에 임베드
             run_embedded_chatbot(active_chatbot)
     else:
-        tab1, tab2, tab3 = st.tabs(["📋 챗봇 목록", "➕ 챗봇 등록", "📦 컨테이너 관리"])
+        tab1, tab2, tab3, tab4 = st.tabs(["📋 챗봇 목록", "➕ 챗봇 등록", "📦 컨테이너 관리", "📈 성능 지표"])
     
     with tab1:
         display_chatbot_list()
@@ -175,6 +315,86 @@ def display_chatbot_management():
         
     with tab3:
         display_container_management()
+    
+    with tab4:
+        display_performance_dashboard()
+
+def display_performance_dashboard():
+    """질문 처리 단계별 지연 시간/토큰 사용량 대시보드"""
+    st.header("📈 성능 지표")
+    
+    windows = {
+        "최근 1시간": 3600,
+        "최근 24시간": 86400,
+        "최근 7일": 7 * 86400,
+        "최근 30일": 30 * 86400,
+        "전체": None
+    }
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        window_label = st.selectbox("📅 기간", list(windows.keys()), index=1, key="telemetry_window")
+    with col2:
+        chatbot_options = ["전체"] + telemetry_store.get_chatbot_names()
+        chatbot_filter = st.selectbox("🤖 챗봇", chatbot_options, key="telemetry_chatbot")
+    
+    window_seconds = windows[window_label]
+    chatbot_name = None if chatbot_filter == "전체" else chatbot_filter
+    rows = telemetry_store.get_rows(window_seconds, chatbot_name)
+    
+    if not rows:
+        st.info("📭 선택한 기간에 기록된 질문이 없습니다.")
+        return
+    
+    # 전체 요약
+    df = pd.DataFrame(rows)
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("질문 수", f"{len(df)}개")
+    with col2:
+        st.metric("캐시 히트율", f"{df['cache_hit'].mean():.0%}")
+    with col3:
+        # status가 없는 예전 기록은 error 유무로 구분
+        status = df["status"].fillna(df["error"].notna().map({True: "error", False: "ok"}))
+        st.metric("오류", f"{int((status == 'error').sum())}건", f"중단 {int((status == 'aborted').sum())}건",
+                  delta_color="off")
+    with col4:
+        st.metric("p95 전체 지연", f"{df['total_ms'].quantile(0.95):.0f}ms")
+    
+    # 챗봇별 x 단계별 백분위수
+    st.subheader("⏱️ 단계별 지연 시간 (ms) / 토큰 수")
+    summary = pd.DataFrame(telemetry_store.get_summary(window_seconds, chatbot_name))
+    summary = summary.rename(columns={"chatbot_name": "챗봇", "metric": "지표", "count": "건수"})
+    summary[["p50", "p95", "p99"]] = summary[["p50", "p95", "p99"]].round(1)
+    st.dataframe(summary, hide_index=True)
+    
+    # 모델 라우팅 결과 (배포가 여러 개일 때)
+    routing = pd.DataFrame(telemetry_store.get_routing_summary(window_seconds, chatbot_name))
+    if not routing.empty and routing["route_tier"].notna().any():
+        st.subheader("🧭 모델 라우팅")
+        total_cost = routing["cost"].sum()
+        st.write(
+            f"예상 비용 **{total_cost:.4f}** / 가장 큰 배포만 썼을 때보다 **{routing['savings'].sum():.4f}** 절감"
+        )
+        routing = routing.rename(columns={
+            "chatbot_name": "챗봇", "deployment": "배포", "route_tier": "등급", "count": "건수",
+            "p50_total_ms": "p50 전체(ms)", "p95_total_ms": "p95 전체(ms)", "cost": "비용", "savings": "절감"
+        })
+        st.dataframe(routing.round({"p50 전체(ms)": 1, "p95 전체(ms)": 1, "비용": 4, "절감": 4}), hide_index=True)
+    
+    # 최근 질문 기록
+    with st.expander("📋 최근 질문 기록"):
+        recent = df.sort_values("created_at", ascending=False).head(100).copy()
+        recent["created_at"] = pd.to_datetime(recent["created_at"], unit="s")
+        st.dataframe(
+            recent[["created_at", "chatbot_name", "retrieval_mode", "cache_hit", "hit_count",
+                    *LATENCY_STAGES.keys(), "context_tokens", "prompt_tokens", "completion_tokens",
+                    "deployment", "route_tier", "status", "error"]],
+            hide_index=True
+        )
+    
+    if telemetry_store.dropped:
+        st.warning(f"⚠️ 기록 큐가 가득 차서 버려진 기록: {telemetry_store.dropped}건")
 
 def display_chatbot_list():
     """챗봇 목록 표시 및 관리"""
@@ -211,6 +431,22 @@ def display_chatbot_list():
                     st.success("✅ 인덱스 완료")
                 else:
                     st.warning("⏳ 인덱스 대기중")
+                
+                # 챗봇별 검색 방식 선택
+                current_mode = row['retrieval_mode'] if row['retrieval_mode'] in RETRIEVAL_MODES else 'keyword'
+                selected_mode = st.selectbox(
+                    "🔎 검색 방식",
+                    options=list(RETRIEVAL_MODES.keys()),
+                    index=list(RETRIEVAL_MODES.keys()).index(current_mode),
+                    format_func=RETRIEVAL_MODES.get,
+                    key=f"retrieval_mode_{row['id']}",
+                    help="하이브리드 검색은 벡터 필드가 있는 인덱스와 임베딩 배포가 필요합니다."
+                )
+                if selected_mode != current_mode:
+                    update_chatbot_retrieval_mode(row['id'], selected_mode)
+                    active = st.session_state.get('active_chatbot')
+                    if active and active['name'] == row['chatbotname']:
+                        active['retrieval_mode'] = selected_mode
             
             with col3:
                 # 파일 업로드 버튼
@@ -226,8 +462,11 @@ def display_chatbot_list():
                         st.error("❌ 컨테이너명이 설정되지 않았습니다.")
                         continue
                     
-                    # 인덱스 생성
-                    created_index_name = create_index_for_container(container_name)
+                    # 인덱스 생성 (로컬 BM25 방식이면 로컬 인덱스 생성)
+                    if current_mode == 'bm25':
+                        created_index_name = create_local_index_for_container(container_name)
+                    else:
+                        created_index_name = create_index_for_container(container_name)
                     
                     if created_index_name:
                         # DB에 인덱스 상태와 이름 업데이트
@@ -238,6 +477,12 @@ def display_chatbot_list():
                         )
                         
                         if success:
+                            # 이전 인덱스 버전의 캐시된 답변 정리
+                            answer_cache.invalidate_index(
+                                created_index_name,
+                                keep_version=get_index_version(created_index_name)
+                            )
+                            semantic_cache.invalidate_index(created_index_name)
                             st.success(f"✅ 인덱스가 성공적으로 갱신되었습니다!")
                             st.success(f"📊 생성된 인덱스: {created_index_name}")
                             st.rerun()
@@ -262,7 +507,8 @@ def display_chatbot_list():
                     st.session_state['active_chatbot'] = {
                         'name': row['chatbotname'],
                         'container': row['containername'],
-                        'index': row['index_name']                    
+                        'index': row['index_name'],
+                        'retrieval_mode': current_mode
                     }
                     
                     st.success(f"✅ {chatbot_name} 챗봇이 활성화되었습니다!")
@@ -278,6 +524,9 @@ def display_chatbot_list():
                 ):
                     st.session_state[f"confirm_delete_{row['id']}"] = True
 
+            # 챗봇별 성능 프로필 편집
+            display_performance_profile_editor(row)
+
             # 삭제 확인 대화상자
             if st.session_state.get(f"confirm_delete_{row['id']}", False):
                 st.warning(f"⚠️ **'{row['chatbotname']}'** 챗봇을 정말 삭제하시겠습니까?")
@@ -341,11 +590,91 @@ def display_chatbot_list():
             
             st.markdown("---")
 
+def display_performance_profile_editor(row):
+    """챗봇별 성능 프로필(검색 문서 수, 컨텍스트 예산, 생성 설정, 배포) 편집"""
+    profile = PerformanceProfile.from_json(row.get('performance_profile'))
+    label = "⚙️ 성능 프로필" + ("" if profile.is_default else f" ({', '.join(f'{k}={v}' for k, v in profile.to_dict().items())})")
+    
+    # 설정하지 않은 항목은 전역 기본값을 초기값으로 보여 주고, 값을 바꾼 항목만 프로필에 저장
+    defaults = get_global_defaults()
+    initial = {}
+    for field, (kind, minimum, maximum, _) in PROFILE_FIELDS.items():
+        value = getattr(profile, field)
+        initial[field] = kind(min(max(defaults[field] if value is None else value, minimum), maximum))
+    
+    with st.expander(label, expanded=False):
+        st.caption("바꾸지 않은 항목은 전역 기본값(환경변수 설정)을 계속 따릅니다.")
+        with st.form(f"profile_form_{row['id']}"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                top = st.number_input("검색 문서 수 (top)", min_value=1, max_value=50, value=initial["top"], step=1)
+                context_tokens = st.number_input(
+                    "컨텍스트 토큰 예산", min_value=200, max_value=32000, value=initial["context_tokens"], step=500
+                )
+            with col2:
+                temperature = st.number_input(
+                    "temperature", min_value=0.0, max_value=2.0, value=initial["temperature"], step=0.1
+                )
+                max_tokens = st.number_input(
+                    "최대 답변 토큰 (max_tokens)", min_value=50, max_value=4096, value=initial["max_tokens"], step=100
+                )
+            with col3:
+                mode_options = [""] + list(SEARCH_MODES.keys())
+                search_mode = st.selectbox(
+                    "검색 모드 (search_mode)",
+                    options=mode_options,
+                    index=mode_options.index(profile.search_mode or ""),
+                    format_func=lambda mode: SEARCH_MODES.get(mode, "기본값")
+                )
+                deployment_options = [""] + [d.name for d in load_deployments() if d.name]
+                if profile.deployment and profile.deployment not in deployment_options:
+                    deployment_options.append(profile.deployment)
+                deployment = st.selectbox(
+                    "채팅 배포",
+                    options=deployment_options,
+                    index=deployment_options.index(profile.deployment or ""),
+                    format_func=lambda name: name or "자동 (모델 라우팅/기본 배포)",
+                    help="배포를 지정하면 모델 라우팅을 사용하지 않습니다."
+                )
+            
+            save_col, reset_col = st.columns(2)
+            with save_col:
+                save_clicked = st.form_submit_button("💾 프로필 저장")
+            with reset_col:
+                reset_clicked = st.form_submit_button("↩️ 전역 기본값으로 초기화")
+            
+            if save_clicked or reset_clicked:
+                submitted = {"top": top, "context_tokens": context_tokens, "temperature": temperature, "max_tokens": max_tokens}
+                # 이미 프로필에 있던 항목은 유지하고, 새 항목은 초기값(전역 기본값)에서 바꾼 경우에만 저장
+                values = {
+                    field: value for field, value in submitted.items()
+                    if getattr(profile, field) is not None or value != initial[field]
+                }
+                try:
+                    new_profile = PerformanceProfile() if reset_clicked else PerformanceProfile(
+                        search_mode=search_mode or None, deployment=deployment or None, **values
+                    )
+                except ValueError as e:
+                    st.error(f"❌ 프로필 설정 오류: {e}")
+                    return
+                
+                if update_chatbot_performance_profile(row['id'], new_profile.to_json()):
+                    # 이전 프로필로 만든 캐시된 답변 정리
+                    if row['index_name']:
+                        answer_cache.invalidate_index(row['index_name'])
+                        semantic_cache.invalidate_index(row['index_name'])
+                    active = st.session_state.get('active_chatbot')
+                    if active and active['name'] == row['chatbotname']:
+                        active['profile'] = new_profile
+                    st.success("✅ 성능 프로필이 저장되었습니다!")
+                    st.rerun()
+                else:
+                    st.error("❌ 프로필 저장 실패")
+
 def run_embedded_chatbot(chatbot_info):
     """챗봇을 현재 페이지에 임베드해서 실행"""
     from azure.core.credentials import AzureKeyCredential
     from azure.search.documents import SearchClient
-    from openai import AzureOpenAI
     import time
     
     # 환경 변수 설정
@@ -356,21 +685,37 @@ def run_embedded_chatbot(chatbot_info):
     
     # Azure 클라이언트 초기화
     try:
-        search_client = SearchClient(
-            endpoint=f"https://{os.getenv('AZURE_SEARCH_SERVICE_NAME')}.search.windows.net",
-            index_name=index_name,
-            credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_SERVICE_ADMIN_KEY"))
-        )
-        
-        openai_client = AzureOpenAI(
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_version="2023-12-01-preview"
-        )
+        if is_stub_mode():
+            # Azure 없이 로컬 스텁으로 채팅 경로 실행
+            search_client, openai_client = create_stub_clients(index_name)
+        elif is_async_engine_enabled():
+            # 모든 세션이 공유하는 비동기 엔진의 이벤트 루프를 통해 호출
+            search_client = async_engine.get_search_client(index_name)
+            # 엔드포인트 풀이 설정되어 있으면 OpenAI 호출은 풀을 사용 (재시도/전환도 풀이 담당해 wrap_clients가 감싸지 않음)
+            openai_client = get_endpoint_pool() or async_engine.get_openai_client()
+        else:
+            search_client = SearchClient(
+                endpoint=f"https://{os.getenv('AZURE_SEARCH_SERVICE_NAME')}.search.windows.net",
+                index_name=index_name,
+                credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_SERVICE_ADMIN_KEY"))
+            )
+            
+            openai_client = create_openai_client()
     except Exception as e:
         st.error(f"Azure 클라이언트 초기화 실패: {e}")
         return
     
+    # 마감 시간/재시도/서킷 브레이커 적용 (엔드포인트 풀은 풀 자체의 전환을 사용)
+    search_client, openai_client = wrap_clients(search_client, openai_client)
+    
+    # 로컬 BM25 방식이면 로컬 인덱스로 검색
+    if chatbot_info.get('retrieval_mode') == 'bm25':
+        local_client = get_local_search_client(index_name)
+        if local_client is None:
+            st.warning("⚠️ 로컬 BM25 인덱스가 없습니다. 먼저 인덱스를 갱신해주세요.")
+            return
+        search_client = local_client
+    
     # 문서 상태 확인
     doc_count = get_document_count_embedded(search_client)
     
@@ -380,6 +725,14 @@ def run_embedded_chatbot(chatbot_info):
     
     st.info(f"📚 현재 {doc_count}개의 문서가 검색 가능합니다.")
     
+    # 성능 프로필은 챗봇 활성화마다 한 번만 읽어 둠 (이후 질문은 DB를 조회하지 않음)
+    if 'profile' not in chatbot_info:
+        chatbot = get_chatbot_by_name(chatbot_info['name'])
+        chatbot_info['profile'] = PerformanceProfile.from_json(chatbot and chatbot.get('performance_profile'))
+    profile = chatbot_info['profile']
+    if not profile.is_default:
+        st.caption(f"⚙️ 성능 프로필: {', '.join(f'{k}={v}' for k, v in profile.to_dict().items())}")
+    
     # 세션 상태 초기화 (챗봇별로 분리)
     chat_key = f"messages_{chatbot_info['name']}"
     if chat_key not in st.session_state:
@@ -406,11 +759,29 @@ def run_embedded_chatbot(chatbot_info):
         
         # AI 응답 생성
         with st.chat_message("assistant"):
+            streaming = is_streaming_enabled()
             with st.spinner("답변을 생성하고 있습니다..."):
-                answer, sources = search_and_answer_embedded(search_client, openai_client, prompt)
+                answer, sources = rag_engine.answer(
+                    search_client, openai_client, prompt,
+                    index_name=index_name,
+                    index_version=get_index_version(index_name),
+                    stream=streaming,
+                    retrieval_mode=chatbot_info.get('retrieval_mode', 'keyword'),
+                    chatbot_name=chatbot_info['name'],
+                    session=st.session_state.setdefault(f"rag_{chat_key}", {}),
+                    history=st.session_state[chat_key][:-1],
+                    profile=profile
+                )
+            # 마감 시간을 넘기면 추출형 답변을 먼저 표시하고 LLM 답변이 도착하면 교체
+            if isinstance(answer, PendingAnswer):
+                answer = replace_with_llm_answer(st.empty(), answer)
+            # 스트리밍 모드에서는 토큰이 도착하는 대로 표시하고 전체 답변을 돌려받음
+            elif streaming:
+                answer = st.write_stream(answer)
+            else:
                 st.write(answer)
-                if sources:
-                    st.caption(f"📋 참고 문서: {', '.join(sources)}")
+            if sources:
+                st.caption(f"📋 참고 문서: {', '.join(sources)}")
         
         # AI 메시지 추가
         st.session_state[chat_key].append({
@@ -423,6 +794,7 @@ def run_embedded_chatbot(chatbot_info):
     if st.session_state[chat_key]:
         if st.button("🗑️ 채팅 기록 삭제", key=f"clear_{chatbot_info['name']}"):
             st.session_state[chat_key] = []
+            st.session_state.pop(f"rag_{chat_key}", None)
             st.rerun()
 
 def get_document_count_embedded(search_client):
@@ -434,78 +806,6 @@ def get_document_count_embedded(search_client):
         st.error(f"문서 수 확인 실패: {e}")
         return 0
 
-def get_best_content_embedded(doc):
-    """문서에서 가장 좋은 텍스트 내용을 반환"""
-    content = doc.get("content", "").strip()
-    ocr_text = doc.get("ocr_text", "").strip()
-    filename = doc.get("metadata_storage_name", "Unknown")
-    
-    if ocr_text:
-        return ocr_text, f"{filename} (OCR)"
-    elif content:
-        return content, f"{filename} (원본)"
-    else:
-        return "", filename
-
-def search_and_answer_embedded(search_client, openai_client, question):
-    """질문에 대해 검색하고 GPT로 답변 생성"""
-    try:
-        # Azure Search로 관련 문서 검색
-        results = search_client.search(
-            search_text=question,
-            top=3,
-            search_mode="any"
-        )
-        
-        # 검색된 문서의 내용 수집
-        contexts = []
-        sources = []
-        
-        for doc in results:
-            text, source = get_best_content_embedded(doc)
-            if text:
-                contexts.append(text)
-                sources.append(source)
-        
-        if not contexts:
-            return "❌ 질문과 관련된 문서를 찾을 수 없습니다.", []
-        
-        # 모든 컨텍스트를 합치되, 너무 길면 자르기
-        combined_context = "\n\n".join(contexts)
-        if len(combined_context) > 8000:
-            combined_context = combined_context[:8000] + "...[내용 일부 생략]"
-    
-        # GPT에게 질문과 컨텍스트 전달
-        response = openai_client.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-            messages=[
-                {
-                    "role": "system", 
-                    "content": """당신은 제공된 문서를 바탕으로 정확하고 도움이 되는 답변을 제공하는 AI 어시스턴트입니다.
-
-규칙:
-1. 제공된 문서의 내용만을 바탕으로 답변하세요
-2. 문서에 없는 내용은 추측하지 마세요  
-3. 답변할 수 없다면 솔직히 말하세요
-4. 가능한 한 구체적이고 정확한 정보를 제공하세요
-5. 한국어로 자연스럽게 답변하세요
-6. 답변의 근거가 되는 부분이 있다면 언급해주세요"""
-                },
-                {
-                    "role": "user", 
-                    "content": f"다음 문서들을 바탕으로 질문에 답변해주세요.\n\n문서 내용:\n{combined_context}\n\n질문: {question}"
-                }
-            ],
-            temperature=0.2,
-            max_tokens=1500
-        )
-        
-        answer = response.choices[0].message.content
-        return answer, sources
-        
-    except Exception as e:
-        return f"❌ 검색 또는 답변 생성 실패: {e}", []
-
 def display_chatbot_registration():
     """새 챗봇 등록"""
     st.header("➕ 새 챗봇 등록")
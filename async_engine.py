@@ -0,0 +1,263 @@
+"""
+비동기 검색/생성 엔진 모듈
+모든 Streamlit 세션이 하나의 백그라운드 이벤트 루프를 공유하면서
+비동기 SearchClient / AsyncAzureOpenAI 로 Azure Search와 OpenAI를 호출합니다.
+세션 스레드는 submit()으로 작업을 넘기고 결과만 기다리므로
+HTTP 연결은 루프 한 곳에서 풀링되어 재사용됩니다.
+복원력 계층(resilience_utils)은 어댑터의 submit()으로 받은 Future를 직접 기다리므로
+대기 중인 호출이 스레드 풀 스레드를 차지하지 않고, 마감 시간이 지나면 루프의 작업이 취소됩니다.
+"""
+
+import os
+import queue
+import atexit
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents.aio import SearchClient as AsyncSearchClient
+from openai import AsyncAzureOpenAI
+
+from retrieval_utils import SearchResultList
+
+logger = logging.getLogger(__name__)
+
+_STREAM_END = object()
+
+class StreamStalled(TimeoutError):
+    """스트리밍 응답의 다음 조각이 제한 시간 안에 오지 않음"""
+
+def is_async_engine_enabled() -> bool:
+    """비동기 엔진 사용 여부 (기본값: 사용 안 함)"""
+    return os.getenv("ASYNC_ENGINE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+class AsyncRAGEngine:
+    """백그라운드 이벤트 루프 하나에서 모든 검색/생성 요청을 처리하는 엔진"""
+
+    def __init__(self, request_timeout: float = 120.0, max_connections: int = 100):
+        self.request_timeout = request_timeout
+        self.max_connections = max_connections
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        # 루프 스레드에서만 생성/사용되는 클라이언트
+        self._search_clients: Dict[str, AsyncSearchClient] = {}
+        self._openai_client: Optional[AsyncAzureOpenAI] = None
+
+    def start(self):
+        """이벤트 루프 스레드 시작 (이미 실행 중이면 무시)"""
+        with self._start_lock:
+            if self._loop is not None and self._thread.is_alive():
+                return
+
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                name="async-rag-engine",
+                daemon=True
+            )
+            self._thread.start()
+            logger.info("비동기 RAG 엔진 이벤트 루프 시작")
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, fn: Callable[..., Awaitable], *args, **kwargs) -> Future:
+        """
+        비동기 함수를 공유 이벤트 루프에서 실행하고 concurrent.futures.Future 반환
+        (코루틴은 루프 안에서 생성되며, Future를 취소하면 루프의 작업도 취소됨)
+        """
+        self.start()
+
+        async def _call():
+            return await fn(*args, **kwargs)
+
+        return asyncio.run_coroutine_threadsafe(_call(), self._loop)
+
+    def wait(self, future: Future, timeout: Optional[float] = None) -> Any:
+        """Future 결과 대기 (시간 초과면 루프의 작업을 취소하고 TimeoutError)"""
+        try:
+            return future.result(timeout=timeout or self.request_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def run(self, fn: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """비동기 함수를 제출하고 결과가 나올 때까지 대기 (복원력 계층 없이 사용할 때)"""
+        return self.wait(self.submit(fn, *args, **kwargs))
+
+    def iterate(self, async_iterable: AsyncIterable) -> Iterator[Any]:
+        """
+        비동기 이터러블을 세션 스레드에서 동기 이터레이터로 소비
+
+        request_timeout 동안 다음 항목이 오지 않으면 StreamStalled를 발생시키고,
+        끝까지 받지 않고 중단하면(세션 종료 등) 루프의 수신 작업도 취소합니다.
+        """
+        items: "queue.Queue" = queue.Queue()
+
+        async def _pump():
+            try:
+                async for item in async_iterable:
+                    items.put(item)
+            except asyncio.CancelledError:
+                close = getattr(async_iterable, "close", None)
+                if close is not None:
+                    await close()
+                raise
+            except Exception as e:
+                items.put(e)
+            finally:
+                items.put(_STREAM_END)
+
+        future = self.submit(_pump)
+        try:
+            while True:
+                try:
+                    item = items.get(timeout=self.request_timeout)
+                except queue.Empty:
+                    raise StreamStalled(f"스트림이 {self.request_timeout:g}초 동안 응답하지 않습니다.")
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    # ----- 클라이언트 (루프 스레드에서 지연 생성) -----
+
+    def _get_search_client(self, index_name: str) -> AsyncSearchClient:
+        client = self._search_clients.get(index_name)
+        if client is None:
+            client = AsyncSearchClient(
+                endpoint=f"https://{os.getenv('AZURE_SEARCH_SERVICE_NAME')}.search.windows.net",
+                index_name=index_name,
+                credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_SERVICE_ADMIN_KEY"))
+            )
+            self._search_clients[index_name] = client
+        return client
+
+    def _get_openai_client(self) -> AsyncAzureOpenAI:
+        if self._openai_client is None:
+            import httpx
+            self._openai_client = AsyncAzureOpenAI(
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_version="2023-12-01-preview",
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=self.max_connections),
+                    timeout=self.request_timeout
+                )
+            )
+        return self._openai_client
+
+    # ----- 비동기 API -----
+
+    async def search(self, index_name: str, search_text: str, **kwargs) -> SearchResultList:
+        """Azure Search 비동기 검색 후 결과를 목록으로 수집"""
+        results = await self._get_search_client(index_name).search(search_text=search_text, **kwargs)
+        documents = [doc async for doc in results]
+        count = await results.get_count() if kwargs.get("include_total_count") else None
+        return SearchResultList(documents, count)
+
+    async def complete(self, **kwargs):
+        """chat.completions.create 비동기 호출 (stream=True이면 비동기 스트림 반환)"""
+        return await self._get_openai_client().chat.completions.create(**kwargs)
+
+    async def embed(self, **kwargs):
+        """embeddings.create 비동기 호출"""
+        return await self._get_openai_client().embeddings.create(**kwargs)
+
+    async def _close(self):
+        for client in self._search_clients.values():
+            await client.close()
+        self._search_clients.clear()
+        if self._openai_client is not None:
+            await self._openai_client.close()
+            self._openai_client = None
+
+    def shutdown(self):
+        """클라이언트 연결을 닫고 이벤트 루프 종료"""
+        if self._loop is None or not self._loop.is_running():
+            return
+        try:
+            self.wait(self.submit(self._close), timeout=10)
+        except Exception as e:
+            logger.warning(f"비동기 엔진 종료 중 오류 (무시): {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # ----- 기존 채팅 함수용 동기 어댑터 -----
+
+    def get_search_client(self, index_name: str) -> "EngineSearchClient":
+        """SearchClient와 같은 search() 인터페이스를 제공하는 어댑터 반환"""
+        return EngineSearchClient(self, index_name)
+
+    def get_openai_client(self) -> "EngineOpenAIClient":
+        """AzureOpenAI와 같은 chat.completions / embeddings 인터페이스를 제공하는 어댑터 반환"""
+        return EngineOpenAIClient(self)
+
+class EngineSearchClient:
+    """엔진을 통해 검색하는 SearchClient 호환 어댑터"""
+
+    def __init__(self, engine: AsyncRAGEngine, index_name: str):
+        self._engine = engine
+        self.index_name = index_name
+
+    def submit(self, search_text: str = None, **kwargs) -> Future:
+        """검색을 루프에 제출하고 Future 반환 (복원력 계층이 스레드 풀 없이 기다리는 데 사용)"""
+        return self._engine.submit(self._engine.search, self.index_name, search_text, **kwargs)
+
+    def search(self, search_text: str = None, **kwargs) -> SearchResultList:
+        return self._engine.wait(self.submit(search_text, **kwargs))
+
+class _EngineCompletions:
+    def __init__(self, engine: AsyncRAGEngine):
+        self._engine = engine
+
+    def submit(self, **kwargs) -> Future:
+        """호출을 루프에 제출 (stream=True이면 응답이 시작된 스트림을 동기 이터레이터로 감싸 반환)"""
+        engine = self._engine
+        if not kwargs.get("stream"):
+            return engine.submit(engine.complete, **kwargs)
+
+        async def _open():
+            return engine.iterate(await engine.complete(**kwargs))
+
+        return engine.submit(_open)
+
+    def create(self, **kwargs):
+        return self._engine.wait(self.submit(**kwargs))
+
+class _EngineChat:
+    def __init__(self, engine: AsyncRAGEngine):
+        self.completions = _EngineCompletions(engine)
+
+class _EngineEmbeddings:
+    def __init__(self, engine: AsyncRAGEngine):
+        self._engine = engine
+
+    def submit(self, **kwargs) -> Future:
+        return self._engine.submit(self._engine.embed, **kwargs)
+
+    def create(self, **kwargs):
+        return self._engine.wait(self.submit(**kwargs))
+
+class EngineOpenAIClient:
+    """엔진을 통해 호출하는 AzureOpenAI 호환 어댑터"""
+
+    def __init__(self, engine: AsyncRAGEngine):
+        self.chat = _EngineChat(engine)
+        self.embeddings = _EngineEmbeddings(engine)
+
+# 전역 비동기 엔진 인스턴스 (프로세스 내 모든 세션이 공유)
+async_engine = AsyncRAGEngine(
+    request_timeout=float(os.getenv("ASYNC_ENGINE_TIMEOUT_SECONDS", "120")),
+    max_connections=int(os.getenv("ASYNC_ENGINE_MAX_CONNECTIONS", "100"))
+)
+atexit.register(async_engine.shutdown)
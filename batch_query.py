@@ -0,0 +1,365 @@
+"""
+일괄 질문 처리 CLI
+JSONL 파일의 질문들을 챗봇의 RAG 경로(캐시 → 검색 → 재순위화 → 컨텍스트 → 답변 생성)로 동시에 처리하고,
+질문별 답변/출처/단계별 지연/토큰 사용량을 결과 JSONL에 완료되는 대로 기록합니다.
+인덱스 갱신 후 회귀 확인이나 FAQ 목록 미리 답변하기에 사용합니다.
+
+입력 형식 (한 줄에 하나, requests.jsonl과 같은 형태):
+    {"request_id": "q-001", "question": "휴가 신청 방법은?"}
+    {"request_id": "q-002", "title": "출장비 정산", "body": "출장비는 언제까지 정산하나요?"}
+질문은 question → body → title 순서로 찾고, id가 없으면 줄 번호를 사용합니다.
+
+같은 출력 파일로 다시 실행하면 이미 성공한 질문은 건너뛰므로 중단된 실행을 이어서 할 수 있습니다.
+OpenAI 호출은 공유 속도 제한기(OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT)를 그대로 따르며,
+--qps로 질문 시작 속도를 추가로 제한할 수 있습니다.
+
+사용법:
+    python batch_query.py --chatbot 고객지원봇 --input questions.jsonl --output answers.jsonl --concurrency 8
+    USE_STUB_CLIENTS=true python batch_query.py --index guide-index --input questions.jsonl --output out.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from database_utils import get_chatbot_by_name, get_chatbot_by_index, get_index_version
+from endpoint_pool import create_openai_client
+from fallback_utils import PendingAnswer
+from profile_utils import PerformanceProfile
+from rag_engine import RAGEngine, create_rag_engine
+from resilience_utils import wrap_clients
+from retrieval_utils import get_local_search_client
+from stub_clients import is_stub_mode, create_stub_clients
+from telemetry_utils import percentile, telemetry_store
+
+logger = logging.getLogger(__name__)
+
+# 결과 요약에 표시할 단계 (타이밍 훅 stage 이름)
+SUMMARY_STAGES = ["cache_lookup", "retrieve", "rerank", "context", "route", "generate", "total"]
+
+class ChatbotTarget:
+    """질문을 보낼 챗봇 (인덱스, 검색 방식, 성능 프로필, 클라이언트)"""
+
+    def __init__(self, name: str, index_name: str, retrieval_mode: str = "keyword",
+                 profile: Optional[PerformanceProfile] = None, search_client=None, openai_client=None):
+        self.name = name
+        self.index_name = index_name
+        self.retrieval_mode = retrieval_mode
+        self.profile = profile
+        self.search_client = search_client
+        self.openai_client = openai_client
+
+def create_chat_clients(index_name: str, retrieval_mode: str = "keyword"):
+    """
+    관리자 화면과 같은 방식으로 (검색, OpenAI) 클라이언트 생성
+    USE_STUB_CLIENTS=true면 스텁, 로컬 BM25 방식이면 로컬 인덱스로 검색합니다.
+    """
+    if is_stub_mode():
+        search_client, openai_client = create_stub_clients(index_name)
+    else:
+        from azure.core.credentials import AzureKeyCredential
+        from azure.search.documents import SearchClient
+
+        search_client = SearchClient(
+            endpoint=f"https://{os.getenv('AZURE_SEARCH_SERVICE_NAME')}.search.windows.net",
+            index_name=index_name,
+            credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_SERVICE_ADMIN_KEY"))
+        )
+        openai_client = create_openai_client()
+
+    search_client, openai_client = wrap_clients(search_client, openai_client)
+    if retrieval_mode == "bm25":
+        local_client = get_local_search_client(index_name)
+        if local_client is None:
+            raise ValueError(f"'{index_name}' 로컬 BM25 인덱스가 없습니다. 먼저 인덱스를 갱신해주세요.")
+        search_client = local_client
+    return search_client, openai_client
+
+def resolve_chatbot(chatbot_name: Optional[str] = None, index_name: Optional[str] = None,
+                    retrieval_mode: Optional[str] = None) -> ChatbotTarget:
+    """챗봇 이름(또는 인덱스명)으로 등록 정보를 읽어 대상 챗봇 구성 (등록되지 않은 인덱스는 기본 설정)"""
+    chatbot = get_chatbot_by_name(chatbot_name) if chatbot_name else get_chatbot_by_index(index_name)
+    if chatbot_name and chatbot is None:
+        raise ValueError(f"등록되지 않은 챗봇입니다: {chatbot_name}")
+    if chatbot is not None:
+        index_name = index_name or chatbot["index_name"]
+        chatbot_name = chatbot["chatbotname"]
+    if not index_name:
+        raise ValueError("인덱스가 없는 챗봇입니다. 먼저 인덱스를 갱신해주세요.")
+
+    retrieval_mode = retrieval_mode or (chatbot or {}).get("retrieval_mode") or "keyword"
+    profile = PerformanceProfile.from_json((chatbot or {}).get("performance_profile"))
+    search_client, openai_client = create_chat_clients(index_name, retrieval_mode)
+    return ChatbotTarget(chatbot_name or index_name, index_name, retrieval_mode, profile, search_client, openai_client)
+
+def read_questions(path: str) -> Iterator[Tuple[str, str, Dict]]:
+    """입력 JSONL에서 (id, 질문, 원본 항목) 읽기 (빈 줄/질문 없는 줄은 건너뜀)"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                logger.warning(f"{path}:{line_number} JSON 형식 오류, 건너뜁니다: {e}")
+                continue
+            if isinstance(item, str):
+                item = {"question": item}
+            question = (item.get("question") or item.get("body") or item.get("title") or "").strip()
+            if not question:
+                logger.warning(f"{path}:{line_number} 질문이 없어 건너뜁니다.")
+                continue
+            question_id = str(item.get("request_id") or item.get("id") or line_number)
+            yield question_id, question, item
+
+def read_completed_ids(path: str) -> set:
+    """이전 실행 결과에서 오류 없이 끝난 질문 id (재실행 시 건너뜀)"""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 중단되면서 마지막 줄이 잘린 경우
+                continue
+            if record.get("id") is not None and not record.get("error"):
+                completed.add(str(record["id"]))
+    return completed
+
+class _Pacer:
+    """초당 질문 시작 수 제한 (qps가 0이면 제한 없음)"""
+
+    def __init__(self, qps: float = 0.0):
+        self.interval = 1.0 / qps if qps > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            scheduled = max(self._next, now)
+            self._next = scheduled + self.interval
+        if scheduled > now:
+            time.sleep(scheduled - now)
+
+class BatchRunner:
+    """질문 목록을 제한된 동시성으로 RAG 엔진에 보내고 결과를 JSONL로 기록"""
+
+    def __init__(self, engine: RAGEngine, target: ChatbotTarget, concurrency: int = 4, qps: float = 0.0):
+        self.engine = engine
+        self.target = target
+        self.concurrency = max(1, concurrency)
+        self._pacer = _Pacer(qps)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # 질문 처리가 끝나면(total) 같은 스레드에서 RAGRequest를 넘겨받음
+        engine.add_timing_hook(self._capture)
+
+    def _capture(self, stage: str, elapsed_ms: float, request):
+        if stage == "total":
+            self._local.request = request
+
+    def ask(self, question_id: str, question: str, submitted: float,
+            profile: Optional[PerformanceProfile] = None) -> Dict:
+        """질문 하나 처리 (대기 시간과 RAGRequest의 단계별 결과 포함, profile을 주면 챗봇 프로필 대신 사용)"""
+        self._pacer.wait()
+        started = time.perf_counter()
+        self._local.request = None
+        target = self.target
+        try:
+            answer, sources = self.engine.answer(
+                target.search_client, target.openai_client, question,
+                index_name=target.index_name,
+                index_version=get_index_version(target.index_name),
+                retrieval_mode=target.retrieval_mode,
+                chatbot_name=target.name,
+                profile=profile or target.profile
+            )
+            fallback_text = None
+            # 마감 시간을 넘긴 경우에도 LLM 답변을 끝까지 받아서 기록
+            if isinstance(answer, PendingAnswer):
+                fallback_text = answer.text
+                answer = "".join(answer.iter_llm())
+            error = None
+        except Exception as e:
+            answer, sources, fallback_text, error = None, [], None, str(e)
+
+        request = self._local.request
+        record = {
+            "id": question_id,
+            "question": question,
+            "chatbot": target.name,
+            "answer": answer,
+            "sources": sources,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "queue_ms": round((started - submitted) * 1000, 1),
+            "finished_at": time.time(),
+        }
+        if request is not None:
+            context = request.context or {}
+            record.update({
+                "timings": {stage: round(ms, 1) for stage, ms in request.timings.items()},
+                "tokens": {
+                    "context": context.get("tokens_used"),
+                    "prompt": request.prompt_tokens,
+                    "completion": request.completion_tokens,
+                },
+                "document_ids": request.document_ids,
+                "cache_hit": request.cache_hit,
+                "coalesced": request.coalesced,
+                "fallback_used": request.fallback_used,
+                "deployment": request.deployment,
+                "rate_limit_wait_ms": round(request.rate_limit_wait * 1000, 1),
+            })
+            error = error or request.error
+        if fallback_text is not None:
+            record["fallback_answer"] = fallback_text
+        record["error"] = error
+        return record
+
+    def run(self, questions: List[Tuple[str, str]], output_path: str) -> List[Dict]:
+        """질문들을 처리하며 완료되는 대로 output_path에 추가 기록, 이번 실행의 결과 목록 반환"""
+        records = []
+        total = len(questions)
+        with open(output_path, "a", encoding="utf-8") as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch-query") as executor:
+            submitted = time.perf_counter()
+            futures = [
+                executor.submit(self.ask, question_id, question, submitted)
+                for question_id, question in questions
+            ]
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    record = future.result()
+                    with self._write_lock:
+                        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        out.flush()
+                    records.append(record)
+                    status = "❌" if record["error"] else "✅"
+                    print(f"[{done}/{total}] {status} {record['id']} {record['latency_ms']:.0f}ms")
+            except KeyboardInterrupt:
+                # 아직 시작하지 않은 질문은 취소 (기록된 결과로 다음 실행에서 이어서 처리)
+                for future in futures:
+                    future.cancel()
+                print("\n⏹️ 중단되었습니다. 같은 출력 파일로 다시 실행하면 이어서 처리합니다.")
+                raise
+        return records
+
+def summarize(records: List[Dict], elapsed_seconds: float) -> Dict:
+    """처리량, 지연 백분위수, 토큰 사용량, 오류 수 요약"""
+    succeeded = [r for r in records if not r["error"]]
+    summary = {
+        "questions": len(records),
+        "succeeded": len(succeeded),
+        "errors": len(records) - len(succeeded),
+        "elapsed_seconds": round(elapsed_seconds, 2),
+        "throughput_qps": round(len(records) / elapsed_seconds, 3) if elapsed_seconds > 0 else None,
+        "cache_hits": sum(1 for r in records if r.get("cache_hit")),
+        "fallbacks": sum(1 for r in records if r.get("fallback_used")),
+        "prompt_tokens": sum((r.get("tokens") or {}).get("prompt") or 0 for r in records),
+        "completion_tokens": sum((r.get("tokens") or {}).get("completion") or 0 for r in records),
+        "latency_ms": {},
+        "stages_ms": {},
+    }
+    latencies = [r["latency_ms"] for r in succeeded]
+    for p in (50, 95, 99):
+        value = percentile(latencies, p)
+        summary["latency_ms"][f"p{p}"] = round(value, 1) if value is not None else None
+    for stage in SUMMARY_STAGES:
+        values = [(r.get("timings") or {}).get(stage) for r in succeeded]
+        if any(v is not None for v in values):
+            summary["stages_ms"][stage] = {
+                "p50": round(percentile(values, 50), 1),
+                "p95": round(percentile(values, 95), 1),
+            }
+    return summary
+
+def print_summary(summary: Dict):
+    print("=" * 60)
+    print(f"📊 질문 {summary['questions']}개 (성공 {summary['succeeded']} / 오류 {summary['errors']}), "
+          f"{summary['elapsed_seconds']}초")
+    if summary["throughput_qps"] is not None:
+        print(f"⚡ 처리량: {summary['throughput_qps']} 질문/초")
+    latency = summary["latency_ms"]
+    print(f"⏱️ 지연: p50 {latency['p50']}ms / p95 {latency['p95']}ms / p99 {latency['p99']}ms")
+    for stage, values in summary["stages_ms"].items():
+        print(f"   - {stage}: p50 {values['p50']}ms / p95 {values['p95']}ms")
+    print(f"🔢 토큰: 프롬프트 {summary['prompt_tokens']} / 답변 {summary['completion_tokens']}")
+    print(f"💾 캐시 적중 {summary['cache_hits']}개, 추출형 답변 {summary['fallbacks']}개")
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONL 질문 일괄 처리")
+    parser.add_argument("--chatbot", help="등록된 챗봇 이름")
+    parser.add_argument("--index", help="인덱스명 (챗봇 대신 직접 지정)")
+    parser.add_argument("--retrieval-mode", choices=["keyword", "hybrid", "bm25"], help="검색 방식 (기본값: 챗봇 설정)")
+    parser.add_argument("--input", required=True, help="질문 JSONL 파일")
+    parser.add_argument("--output", required=True, help="결과 JSONL 파일 (이미 있으면 이어서 처리)")
+    parser.add_argument("--summary", help="요약을 저장할 JSON 파일")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시에 처리할 질문 수")
+    parser.add_argument("--qps", type=float, default=0.0, help="초당 질문 시작 수 제한 (0이면 제한 없음)")
+    parser.add_argument("--limit", type=int, default=0, help="처리할 최대 질문 수 (0이면 전체)")
+    parser.add_argument("--no-cache", action="store_true", help="답변 캐시를 사용하지 않음 (회귀 확인용)")
+    args = parser.parse_args()
+
+    if not args.chatbot and not args.index:
+        parser.error("--chatbot 또는 --index 중 하나는 필요합니다.")
+
+    load_dotenv()
+    try:
+        target = resolve_chatbot(args.chatbot, args.index, args.retrieval_mode)
+    except Exception as e:
+        print(f"❌ 챗봇 준비 실패: {e}")
+        sys.exit(1)
+
+    completed = read_completed_ids(args.output)
+    questions = []
+    seen = set()
+    for question_id, question, _ in read_questions(args.input):
+        if question_id in completed or question_id in seen:
+            continue
+        seen.add(question_id)
+        questions.append((question_id, question))
+    if args.limit:
+        questions = questions[:args.limit]
+
+    print(f"🤖 {target.name} (인덱스: {target.index_name}, 검색 방식: {target.retrieval_mode})")
+    if completed:
+        print(f"⏭️ 이전 실행에서 완료된 질문 {len(completed)}개는 건너뜁니다.")
+    if not questions:
+        print("✅ 처리할 질문이 없습니다.")
+        return
+    print(f"🚀 질문 {len(questions)}개 처리 시작 (동시 {args.concurrency}개)")
+
+    engine = create_rag_engine(use_cache=not args.no_cache)
+    runner = BatchRunner(engine, target, concurrency=args.concurrency, qps=args.qps)
+    started = time.perf_counter()
+    try:
+        records = runner.run(questions, args.output)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    finally:
+        telemetry_store.flush()
+
+    summary = summarize(records, time.perf_counter() - started)
+    print_summary(summary)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"📝 요약 저장: {args.summary}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,257 @@
+"""
+검색 품질/지연 벤치마크 CLI
+챗봇별 정답 세트(질문, 정답 문서)로 답변 생성 없이 검색만 실행해
+recall@k, MRR, 검색 응답 크기(payload bytes), 검색 지연 p50/p95를 측정합니다.
+인덱싱 방식(create_index_claud.py)이나 검색 설정을 바꾸기 전후로 실행하고 결과 파일을 비교합니다.
+
+정답 세트 형식 (JSONL, 한 줄에 하나):
+    {"chatbot": "고객지원봇", "question": "휴가 신청 방법은?", "expected": ["휴가규정.txt"]}
+expected에는 문서 id, metadata_storage_name(파일명), metadata_storage_path 중 하나를 적습니다.
+chatbot이 없는 줄은 --chatbot(또는 --index)으로 지정한 챗봇에 보냅니다.
+
+결과는 --results-dir(기본값: benchmarks) 아래 retrieval-{이름}-{시각}.json 으로 매번 새 파일에 저장되며,
+--diff로 이전 결과 파일과 지표를 비교할 수 있습니다.
+
+사용법:
+    python benchmark_retrieval.py --golden golden.jsonl --chatbot 고객지원봇 --k 1,3,5
+    python benchmark_retrieval.py --golden golden.jsonl --index guide-index --retrieval-mode bm25 --diff benchmarks/old.json
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import subprocess
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from batch_query import resolve_chatbot
+from rag_engine import get_best_content, get_chat_deployment
+from rerank_utils import get_rerank_candidates, rerank_documents
+from retrieval_utils import get_document_key, retrieve_documents
+from telemetry_utils import percentile
+
+logger = logging.getLogger(__name__)
+
+RESULTS_VERSION = 1
+
+def load_golden_set(path: str, default_chatbot: Optional[str]) -> Dict[str, List[Dict]]:
+    """정답 세트를 챗봇별로 묶어 읽음"""
+    golden: Dict[str, List[Dict]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            expected = item.get("expected") or item.get("expected_documents") or []
+            if isinstance(expected, str):
+                expected = [expected]
+            chatbot = item.get("chatbot") or default_chatbot
+            if not item.get("question") or not expected or not chatbot:
+                logger.warning(f"{path}:{line_number} 질문/정답 문서/챗봇이 없어 건너뜁니다.")
+                continue
+            golden.setdefault(chatbot, []).append({"question": item["question"], "expected": expected})
+    return golden
+
+def _document_labels(doc: Dict) -> set:
+    """정답 문서와 비교할 문서 식별자들 (id, 파일명, 경로)"""
+    labels = {get_document_key(doc), doc.get("id"), doc.get("metadata_storage_name"), doc.get("metadata_storage_path")}
+    return {label for label in labels if label}
+
+def find_ranks(results: List[Dict], expected: List[str]) -> Dict[str, Optional[int]]:
+    """정답 문서별로 처음 나타난 순위 (1부터, 없으면 None). 구간 인덱스는 같은 파일의 첫 구간 순위를 사용"""
+    ranks: Dict[str, Optional[int]] = {label: None for label in expected}
+    for rank, doc in enumerate(results, 1):
+        labels = _document_labels(doc)
+        for label in expected:
+            if ranks[label] is None and label in labels:
+                ranks[label] = rank
+    return ranks
+
+def score_question(ranks: Dict[str, Optional[int]], ks: List[int]) -> Dict:
+    """질문 하나의 recall@k와 역순위(reciprocal rank)"""
+    found = [rank for rank in ranks.values() if rank is not None]
+    scores = {f"recall@{k}": sum(1 for rank in found if rank <= k) / len(ranks) for k in ks}
+    scores["reciprocal_rank"] = 1.0 / min(found) if found else 0.0
+    return scores
+
+def benchmark_chatbot(target, questions: List[Dict], ks: List[int], search_mode: str,
+                      rerank: bool = False, repeat: int = 1, warmup: int = 0) -> Dict:
+    """챗봇 하나의 정답 세트로 검색만 실행하고 지표 계산"""
+    top = max(ks)
+    candidates = max(get_rerank_candidates(), top) if rerank else top
+
+    def _search(question: str):
+        return list(retrieve_documents(
+            target.search_client, target.openai_client, question,
+            retrieval_mode=target.retrieval_mode, top=candidates, search_mode=search_mode,
+            index_name=target.index_name
+        ))
+
+    # 연결 수립/캐시 준비 시간이 지연 측정에 섞이지 않도록 먼저 몇 번 실행
+    for item in questions[:warmup]:
+        try:
+            _search(item["question"])
+        except Exception:
+            pass
+
+    details = []
+    latencies, rerank_latencies, payloads = [], [], []
+    for item in questions:
+        detail = {"question": item["question"], "expected": item["expected"]}
+        try:
+            for _ in range(max(1, repeat)):
+                started = time.perf_counter()
+                results = _search(item["question"])
+                latencies.append((time.perf_counter() - started) * 1000)
+            payload = len(json.dumps(results, ensure_ascii=False, default=str).encode("utf-8"))
+            payloads.append(payload)
+            if rerank:
+                started = time.perf_counter()
+                results = rerank_documents(
+                    results, item["question"], get_best_content, top=top, model=get_chat_deployment()
+                )["documents"]
+                rerank_latencies.append((time.perf_counter() - started) * 1000)
+            results = results[:top]
+            ranks = find_ranks(results, item["expected"])
+            detail.update(score_question(ranks, ks))
+            detail.update({
+                "ranks": ranks,
+                "retrieved": [get_document_key(doc) for doc in results],
+                "payload_bytes": payload,
+            })
+        except Exception as e:
+            detail["error"] = str(e)
+        details.append(detail)
+
+    scored = [d for d in details if "error" not in d]
+    metrics = {
+        "questions": len(details),
+        "errors": len(details) - len(scored),
+    }
+    for k in ks:
+        metrics[f"recall@{k}"] = sum(d[f"recall@{k}"] for d in scored) / len(scored) if scored else None
+    metrics["mrr"] = sum(d["reciprocal_rank"] for d in scored) / len(scored) if scored else None
+    metrics["payload_bytes_avg"] = sum(payloads) / len(payloads) if payloads else None
+    metrics["payload_bytes_p95"] = percentile(payloads, 95)
+    metrics["search_p50_ms"] = percentile(latencies, 50)
+    metrics["search_p95_ms"] = percentile(latencies, 95)
+    if rerank:
+        metrics["rerank_p50_ms"] = percentile(rerank_latencies, 50)
+        metrics["rerank_p95_ms"] = percentile(rerank_latencies, 95)
+    return {"metrics": metrics, "questions": details}
+
+def get_git_commit() -> Optional[str]:
+    """결과 파일에 남길 현재 코드 버전 (git을 사용할 수 없으면 None)"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+def save_results(results: Dict, results_dir: str, name: str) -> str:
+    os.makedirs(results_dir, exist_ok=True)
+    safe_name = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in name)
+    stem = os.path.join(results_dir, f"retrieval-{safe_name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    path, suffix = f"{stem}.json", 1
+    while os.path.exists(path):
+        suffix += 1
+        path = f"{stem}-{suffix}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return path
+
+def _format(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3f}" if abs(value) < 10 else f"{value:,.1f}"
+    return f"{value:,}"
+
+def print_metrics(name: str, metrics: Dict, previous: Optional[Dict] = None):
+    print(f"\n🤖 {name}")
+    header = f"   {'지표':<20}{'이번 실행':>14}"
+    if previous is not None:
+        header += f"{'이전 실행':>14}{'변화':>12}"
+    print(header)
+    for key, value in metrics.items():
+        line = f"   {key:<20}{_format(value):>14}"
+        if previous is not None:
+            before = previous.get(key)
+            change = "-"
+            if isinstance(value, (int, float)) and isinstance(before, (int, float)):
+                change = f"{value - before:+.3f}" if abs(value) < 10 else f"{value - before:+,.1f}"
+            line += f"{_format(before):>14}{change:>12}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="검색 품질(recall@k, MRR)과 지연 벤치마크")
+    parser.add_argument("--golden", required=True, help="정답 세트 JSONL 파일")
+    parser.add_argument("--chatbot", help="chatbot이 없는 줄에 사용할 챗봇 이름")
+    parser.add_argument("--index", help="챗봇 대신 인덱스명을 직접 지정")
+    parser.add_argument("--retrieval-mode", choices=["keyword", "hybrid", "bm25"], help="검색 방식 (기본값: 챗봇 설정)")
+    parser.add_argument("--search-mode", choices=["any", "all"], help="검색 모드 (기본값: 챗봇 성능 프로필 또는 any)")
+    parser.add_argument("--k", default="1,3,5,10", help="recall@k의 k 목록 (쉼표로 구분)")
+    parser.add_argument("--rerank", action="store_true", help="재순위화 후 순위로 평가")
+    parser.add_argument("--repeat", type=int, default=1, help="지연 측정을 위해 질문마다 반복할 횟수")
+    parser.add_argument("--warmup", type=int, default=2, help="측정 전에 실행할 질문 수")
+    parser.add_argument("--label", help="결과 파일 이름에 붙일 이름 (예: chunk-500)")
+    parser.add_argument("--results-dir", default="benchmarks", help="결과 파일 디렉터리")
+    parser.add_argument("--diff", help="비교할 이전 결과 파일")
+    args = parser.parse_args()
+
+    load_dotenv()
+    ks = sorted({int(k) for k in args.k.split(",") if k.strip()})
+    golden = load_golden_set(args.golden, args.chatbot or args.index)
+    if not golden:
+        print("❌ 평가할 정답 세트가 없습니다.")
+        sys.exit(1)
+
+    previous = {}
+    if args.diff:
+        with open(args.diff, "r", encoding="utf-8") as f:
+            previous = json.load(f).get("chatbots", {})
+
+    results = {
+        "version": RESULTS_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": get_git_commit(),
+        "label": args.label,
+        "golden_set": os.path.abspath(args.golden),
+        "config": {
+            "k": ks, "rerank": args.rerank, "repeat": args.repeat, "warmup": args.warmup,
+            "retrieval_mode": args.retrieval_mode, "search_mode": args.search_mode,
+        },
+        "chatbots": {},
+    }
+
+    for name, questions in golden.items():
+        try:
+            if args.index and name == args.index:
+                target = resolve_chatbot(index_name=args.index, retrieval_mode=args.retrieval_mode)
+            else:
+                target = resolve_chatbot(chatbot_name=name, retrieval_mode=args.retrieval_mode)
+        except Exception as e:
+            print(f"❌ {name}: 챗봇 준비 실패: {e}")
+            continue
+
+        search_mode = args.search_mode or (target.profile.search_mode if target.profile else None) or "any"
+        print(f"🔍 {name}: 질문 {len(questions)}개 (인덱스 {target.index_name}, {target.retrieval_mode}, {search_mode})")
+        result = benchmark_chatbot(target, questions, ks, search_mode, args.rerank, args.repeat, args.warmup)
+        result.update({"index_name": target.index_name, "retrieval_mode": target.retrieval_mode,
+                       "search_mode": search_mode})
+        results["chatbots"][name] = result
+        print_metrics(name, result["metrics"], (previous.get(name) or {}).get("metrics") if args.diff else None)
+
+    path = save_results(results, args.results_dir, args.label or "-".join(results["chatbots"]) or "run")
+    print(f"\n📝 결과 저장: {path}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,290 @@
+"""
+로컬 BM25 검색 인덱스 모듈
+Azure Search 없이 개발/CI 환경이나 Azure Search 장애 시 사용할 수 있는
+순수 Python/NumPy 역색인 기반 BM25 검색기를 제공합니다.
+SearchClient.search(search_text, top, search_mode) 와 같은 방식으로 호출할 수 있습니다.
+
+사용 예:
+    python bm25_index.py --container guide --index-name guide-index
+    python bm25_index.py --folder ./docs --index-name guide-index --query "휴가 신청 방법"
+"""
+
+import os
+import json
+import logging
+import argparse
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from text_utils import tokenize, split_passages
+from followup_utils import parse_id_filter
+from retrieval_utils import SearchResultList, get_document_key
+
+logger = logging.getLogger(__name__)
+
+LOCAL_INDEX_ROOT = os.getenv("LOCAL_INDEX_DIR", "local_indexes")
+
+TEXT_EXTENSIONS = (".txt", ".md", ".csv", ".json", ".html", ".htm", ".xml")
+
+class LocalBM25Index:
+    """CSR 형태의 NumPy 배열로 저장되는 BM25 역색인"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.documents: List[Dict] = []
+        # 단어 t의 posting 목록은 postings_docs[term_offsets[t]:term_offsets[t + 1]]
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.postings_docs = np.zeros(0, dtype=np.int32)
+        self.postings_tf = np.zeros(0, dtype=np.uint16)
+        self.doc_lengths = np.zeros(0, dtype=np.int32)
+        self.idf = np.zeros(0, dtype=np.float32)
+
+    @property
+    def document_count(self) -> int:
+        return len(self.documents)
+
+    def build(self, documents: List[Dict]) -> "LocalBM25Index":
+        """문서 목록(content 필드 포함)으로 역색인 생성"""
+        self.documents = documents
+        postings: Dict[str, List[tuple]] = {}
+        doc_lengths = []
+
+        for doc_id, doc in enumerate(documents):
+            counts = Counter(tokenize(doc.get("content", "")))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, min(tf, 65535)))
+
+        terms = sorted(postings)
+        self.vocab = {term: i for i, term in enumerate(terms)}
+
+        lengths = np.array([len(postings[term]) for term in terms], dtype=np.int64)
+        self.term_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.postings_docs = np.fromiter(
+            (doc_id for term in terms for doc_id, _ in postings[term]), dtype=np.int32, count=int(lengths.sum())
+        )
+        self.postings_tf = np.fromiter(
+            (tf for term in terms for _, tf in postings[term]), dtype=np.uint16, count=int(lengths.sum())
+        )
+        self.doc_lengths = np.array(doc_lengths, dtype=np.int32)
+        self._compute_idf()
+
+        logger.info(f"BM25 인덱스 생성: 문서 {len(documents)}개, 단어 {len(terms)}개")
+        return self
+
+    def _compute_idf(self):
+        n = max(len(self.documents), 1)
+        df = np.diff(self.term_offsets).astype(np.float32)
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    def search(self, search_text: Optional[str] = None, top: int = 50, search_mode: str = "any",
+               include_total_count: bool = False, **kwargs) -> SearchResultList:
+        """SearchClient.search 와 같은 방식의 BM25 검색 (filter는 build_id_filter 형식의 문서 id 필터만 지원)"""
+        n = len(self.documents)
+        if n == 0:
+            return SearchResultList([], 0 if include_total_count else None)
+
+        allowed_ids = parse_id_filter(kwargs.get("filter"))
+        allowed = None
+        if allowed_ids is not None:
+            allowed = np.fromiter(
+                (get_document_key(doc) in allowed_ids for doc in self.documents), dtype=bool, count=n
+            )
+
+        if not search_text or search_text.strip() == "*":
+            rows = np.flatnonzero(allowed) if allowed is not None else np.arange(n)
+            order = rows[:top]
+            scores = np.ones(n, dtype=np.float32)
+            matched_count = len(rows)
+        else:
+            scores = np.zeros(n, dtype=np.float32)
+            matches = np.zeros(n, dtype=np.int32)
+            query_terms = [self.vocab[t] for t in set(tokenize(search_text)) if t in self.vocab]
+            avgdl = float(self.doc_lengths.mean()) or 1.0
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / avgdl)
+
+            for term_id in query_terms:
+                start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+                docs = self.postings_docs[start:end]
+                tf = self.postings_tf[start:end].astype(np.float32)
+                # 한 단어의 posting 안에서 문서 id는 중복되지 않으므로 fancy indexing 누적이 안전함
+                scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + norm[docs])
+                matches[docs] += 1
+
+            if search_mode == "all":
+                required = len(set(tokenize(search_text)))
+                scores[matches < required] = 0.0
+            if allowed is not None:
+                scores[~allowed] = 0.0
+
+            candidates = np.flatnonzero(scores > 0)
+            matched_count = len(candidates)
+            if matched_count > top:
+                candidates = candidates[np.argpartition(-scores[candidates], top)[:top]]
+            order = candidates[np.argsort(-scores[candidates])]
+
+        results = []
+        for doc_id in order:
+            doc = dict(self.documents[doc_id])
+            doc["@search.score"] = float(scores[doc_id])
+            results.append(doc)
+
+        return SearchResultList(results, matched_count if include_total_count else None)
+
+    def save(self, path: str):
+        """배열은 .npy, 단어 목록과 문서는 JSON으로 저장"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "term_offsets.npy"), self.term_offsets)
+        np.save(os.path.join(path, "postings_docs.npy"), self.postings_docs)
+        np.save(os.path.join(path, "postings_tf.npy"), self.postings_tf)
+        np.save(os.path.join(path, "doc_lengths.npy"), self.doc_lengths)
+
+        terms = sorted(self.vocab, key=self.vocab.get)
+        with open(os.path.join(path, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": terms}, f, ensure_ascii=False)
+        with open(os.path.join(path, "documents.jsonl"), "w", encoding="utf-8") as f:
+            for doc in self.documents:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+
+        logger.info(f"BM25 인덱스 저장 완료: {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "LocalBM25Index":
+        """저장된 인덱스 로드 (posting 배열은 메모리 매핑)"""
+        with open(os.path.join(path, "vocab.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        index = cls(k1=meta.get("k1", 1.2), b=meta.get("b", 0.75))
+        index.vocab = {term: i for i, term in enumerate(meta["terms"])}
+        index.term_offsets = np.load(os.path.join(path, "term_offsets.npy"))
+        index.postings_docs = np.load(os.path.join(path, "postings_docs.npy"), mmap_mode="r")
+        index.postings_tf = np.load(os.path.join(path, "postings_tf.npy"), mmap_mode="r")
+        index.doc_lengths = np.load(os.path.join(path, "doc_lengths.npy"))
+
+        with open(os.path.join(path, "documents.jsonl"), "r", encoding="utf-8") as f:
+            index.documents = [json.loads(line) for line in f if line.strip()]
+
+        index._compute_idf()
+        return index
+
+def get_bm25_index_path(index_name: str) -> str:
+    """인덱스명에 해당하는 로컬 BM25 인덱스 경로"""
+    return os.path.join(LOCAL_INDEX_ROOT, index_name, "bm25")
+
+def make_documents(files: List[tuple], passage_chars: int = 1000, overlap_chars: int = 200) -> List[Dict]:
+    """
+    (파일명, 텍스트) 목록을 검색 문서 목록으로 변환
+
+    passage_chars > 0 이면 구간 인덱스와 같은 방식으로 겹치는 구간 단위로 나눕니다.
+    """
+    documents = []
+    for file_no, (name, text) in enumerate(files):
+        if not text or not text.strip():
+            continue
+        if passage_chars <= 0:
+            documents.append({"id": f"{file_no}", "content": text, "metadata_storage_name": name})
+            continue
+        for i, passage in enumerate(split_passages(text, passage_chars, overlap_chars)):
+            documents.append({
+                "id": f"{file_no}-{i}",
+                "parent_id": str(file_no),
+                "chunk_index": i,
+                "page": passage["page"],
+                "offset": passage["offset"],
+                "content": passage["content"],
+                "metadata_storage_name": name
+            })
+    return documents
+
+def read_folder_files(folder: str) -> List[tuple]:
+    """로컬 폴더의 텍스트 파일 읽기"""
+    files = []
+    for root, _, names in os.walk(folder):
+        for name in sorted(names):
+            if name.lower().endswith(TEXT_EXTENSIONS):
+                with open(os.path.join(root, name), "r", encoding="utf-8", errors="ignore") as f:
+                    files.append((os.path.relpath(os.path.join(root, name), folder), f.read()))
+    return files
+
+def read_container_files(container_name: str) -> List[tuple]:
+    """Azure Blob 컨테이너의 텍스트 파일 읽기 (바이너리 문서는 건너뜀)"""
+    from azure_blob_utils import azure_manager
+
+    if not azure_manager.is_configured():
+        raise RuntimeError("Azure Storage가 설정되지 않았습니다.")
+
+    container_name = container_name.lower().replace("_", "-").replace(" ", "-")
+    container_client = azure_manager.blob_service_client.get_container_client(container_name)
+
+    files = []
+    for blob in container_client.list_blobs():
+        if not blob.name.lower().endswith(TEXT_EXTENSIONS):
+            logger.info(f"텍스트가 아닌 파일은 건너뜀: {blob.name}")
+            continue
+        data = container_client.download_blob(blob.name).readall()
+        files.append((blob.name, data.decode("utf-8", errors="ignore")))
+    return files
+
+def build_bm25_index(index_name: str, container_name: str = None, folder: str = None,
+                     passage_chars: int = 1000) -> LocalBM25Index:
+    """컨테이너 또는 로컬 폴더에서 BM25 인덱스를 만들어 저장"""
+    files = read_folder_files(folder) if folder else read_container_files(container_name)
+    index = LocalBM25Index().build(make_documents(files, passage_chars))
+    index.save(get_bm25_index_path(index_name))
+    _loaded_indexes.pop(index_name, None)
+    return index
+
+_loaded_indexes: Dict[str, tuple] = {}
+_load_lock = threading.Lock()
+
+def get_local_bm25_index(index_name: str) -> Optional[LocalBM25Index]:
+    """저장된 로컬 BM25 인덱스 조회 (프로세스 내 캐시, 파일이 갱신되면 다시 로드)"""
+    path = get_bm25_index_path(index_name)
+    vocab_path = os.path.join(path, "vocab.json")
+    if not index_name or not os.path.exists(vocab_path):
+        return None
+
+    mtime = os.path.getmtime(vocab_path)
+    with _load_lock:
+        cached = _loaded_indexes.get(index_name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            index = LocalBM25Index.load(path)
+        except Exception as e:
+            logger.error(f"로컬 BM25 인덱스 로드 실패 ({index_name}): {e}")
+            return None
+        _loaded_indexes[index_name] = (mtime, index)
+        return index
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 BM25 인덱스 생성/검색")
+    parser.add_argument("--index-name", required=True, help="챗봇 인덱스명 (예: guide-index)")
+    parser.add_argument("--container", help="문서를 읽을 Azure Blob 컨테이너")
+    parser.add_argument("--folder", help="문서를 읽을 로컬 폴더")
+    parser.add_argument("--passage-chars", type=int, default=1000, help="구간 크기 (0이면 파일 단위)")
+    parser.add_argument("--query", help="생성 후(또는 기존 인덱스로) 실행할 검색어")
+    parser.add_argument("--top", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.container or args.folder:
+        index = build_bm25_index(args.index_name, args.container, args.folder, args.passage_chars)
+        print(f"✅ BM25 인덱스 생성 완료: 문서 {index.document_count}개 → {get_bm25_index_path(args.index_name)}")
+    else:
+        index = get_local_bm25_index(args.index_name)
+        if index is None:
+            print(f"❌ '{args.index_name}' 로컬 인덱스가 없습니다. --container 또는 --folder로 먼저 생성하세요.")
+            return
+
+    if args.query:
+        for i, doc in enumerate(index.search(args.query, top=args.top), 1):
+            print(f"{i}. [{doc['@search.score']:.3f}] {doc.get('metadata_storage_name')}: {doc['content'][:100]}...")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
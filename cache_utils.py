@@ -0,0 +1,289 @@
+"""
+답변 캐시 유틸리티 모듈
+같은 질문에 대한 Azure Search + GPT 호출을 줄이기 위해
+프로세스 내 LRU(L1)와 SQLite(L2) 2단계 캐시, 그리고
+임베딩 유사도 기반 시맨틱 캐시를 제공합니다.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def normalize_question(question: str) -> str:
+    """캐시 키 생성을 위한 질문 정규화 (대소문자, 문장부호, 공백 통일)"""
+    text = unicodedata.normalize("NFKC", question or "").lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+def make_cache_key(index_name: str, index_version: int, question: str) -> str:
+    """인덱스명 + 인덱스 버전 + 정규화된 질문으로 캐시 키 생성"""
+    return f"{index_name}:{index_version}:{normalize_question(question)}"
+
+class AnswerCache:
+    """메모리 LRU(L1) + SQLite(L2) 2단계 답변 캐시"""
+
+    def __init__(self, db_path: str = "answer_cache.db", max_entries: int = 512,
+                 ttl_seconds: int = 3600, l2_ttl_seconds: int = 86400):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.l2_ttl_seconds = l2_ttl_seconds
+
+        self._l1: "OrderedDict[str, Tuple[float, str, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "stores": 0}
+
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """여러 Streamlit 워커가 동시에 접근할 수 있도록 WAL 모드로 연결"""
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_database(self):
+        """L2 캐시 테이블 초기화"""
+        try:
+            with self._connect() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS answer_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        index_name TEXT NOT NULL,
+                        index_version INTEGER NOT NULL,
+                        answer TEXT NOT NULL,
+                        sources TEXT,
+                        created_at REAL NOT NULL
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_answer_cache_index ON answer_cache (index_name)')
+                conn.commit()
+        except Exception as e:
+            logger.error(f"답변 캐시 DB 초기화 실패: {e}")
+
+    def get(self, index_name: str, index_version: int, question: str) -> Optional[Tuple[str, List[str]]]:
+        """캐시된 (답변, 출처) 조회 - L1 → L2 순서"""
+        key = make_cache_key(index_name, index_version, question)
+        now = time.time()
+
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._l1.move_to_end(key)
+                self.stats["l1_hits"] += 1
+                return entry[1], list(entry[2])
+            if entry:
+                del self._l1[key]
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT answer, sources, created_at FROM answer_cache WHERE cache_key = ? AND created_at > ?',
+                    (key, now - self.l2_ttl_seconds)
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"L2 캐시 조회 실패: {e}")
+            row = None
+
+        with self._lock:
+            if row:
+                answer, sources = row[0], json.loads(row[1] or "[]")
+                self._put_l1(key, answer, sources)
+                self.stats["l2_hits"] += 1
+                return answer, list(sources)
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, index_name: str, index_version: int, question: str, answer: str, sources: List[str]):
+        """답변을 L1과 L2에 모두 저장"""
+        key = make_cache_key(index_name, index_version, question)
+
+        with self._lock:
+            self._put_l1(key, answer, sources)
+            self.stats["stores"] += 1
+
+        try:
+            with self._connect() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO answer_cache
+                    (cache_key, index_name, index_version, answer, sources, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (key, index_name, index_version, answer, json.dumps(sources, ensure_ascii=False), time.time()))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"L2 캐시 저장 실패: {e}")
+
+    def _put_l1(self, key: str, answer: str, sources: List[str]):
+        """L1에 저장하고 용량을 넘으면 가장 오래 사용되지 않은 항목 제거 (lock 보유 상태에서 호출)"""
+        self._l1[key] = (time.time(), answer, list(sources))
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.max_entries:
+            self._l1.popitem(last=False)
+
+    def invalidate_index(self, index_name: str, keep_version: Optional[int] = None) -> int:
+        """특정 인덱스의 캐시 삭제 (keep_version이 주어지면 해당 버전은 유지)"""
+        prefix = f"{index_name}:"
+        keep_prefix = f"{index_name}:{keep_version}:" if keep_version is not None else None
+
+        with self._lock:
+            for key in [k for k in self._l1 if k.startswith(prefix)]:
+                if keep_prefix is None or not key.startswith(keep_prefix):
+                    del self._l1[key]
+
+        try:
+            with self._connect() as conn:
+                if keep_version is None:
+                    cursor = conn.execute('DELETE FROM answer_cache WHERE index_name = ?', (index_name,))
+                else:
+                    cursor = conn.execute(
+                        'DELETE FROM answer_cache WHERE index_name = ? AND index_version != ?',
+                        (index_name, keep_version)
+                    )
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"캐시 무효화 실패: {e}")
+            return 0
+
+    def get_stats(self) -> Dict:
+        """히트/미스 카운터와 캐시 크기 반환"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["l1_entries"] = len(self._l1)
+
+        try:
+            with self._connect() as conn:
+                stats["l2_entries"] = conn.execute('SELECT COUNT(*) FROM answer_cache').fetchone()[0]
+        except Exception:
+            stats["l2_entries"] = 0
+
+        lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["l1_hits"] + stats["l2_hits"]) / lookups if lookups else 0.0
+        return stats
+
+class _SemanticIndexStore:
+    """인덱스 하나의 질문 임베딩 행렬과 답변 저장소"""
+
+    def __init__(self, index_version: int, capacity: int):
+        self.index_version = index_version
+        self.capacity = capacity
+        self.matrix: Optional[np.ndarray] = None
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+        self.entries: List[Optional[Tuple[str, str, List[str]]]] = [None] * capacity
+
+    def lookup(self, embedding: np.ndarray, threshold: float, tick: int) -> Optional[Tuple[float, Tuple[str, str, List[str]]]]:
+        """가장 유사한 질문을 벡터 연산 한 번으로 찾음"""
+        if self.size == 0 or self.matrix is None or self.matrix.shape[1] != embedding.shape[0]:
+            return None
+
+        similarities = self.matrix[:self.size] @ embedding
+        best = int(np.argmax(similarities))
+        score = float(similarities[best])
+        if score < threshold:
+            return None
+
+        self.last_used[best] = tick
+        return score, self.entries[best]
+
+    def add(self, embedding: np.ndarray, question: str, answer: str, sources: List[str], tick: int):
+        """임베딩 추가 (가득 차면 가장 오래 사용되지 않은 행을 덮어씀)"""
+        if self.matrix is None or self.matrix.shape[1] != embedding.shape[0]:
+            self.matrix = np.zeros((min(self.capacity, 64), embedding.shape[0]), dtype=np.float32)
+            self.size = 0
+        elif self.size == self.matrix.shape[0] and self.size < self.capacity:
+            # 용량 한도까지 두 배씩 늘려 메모리를 미리 잡아두지 않음
+            grown = np.zeros((min(self.capacity, self.size * 2), self.matrix.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.matrix
+            self.matrix = grown
+
+        if self.size < self.capacity:
+            slot = self.size
+            self.size += 1
+        else:
+            slot = int(np.argmin(self.last_used[:self.size]))
+
+        self.matrix[slot] = embedding
+        self.entries[slot] = (question, answer, list(sources))
+        self.last_used[slot] = tick
+
+class SemanticAnswerCache:
+    """질문 임베딩의 코사인 유사도로 답변을 재사용하는 챗봇(인덱스)별 시맨틱 캐시"""
+
+    def __init__(self, threshold: float = 0.92, max_entries_per_index: int = 20000):
+        self.threshold = threshold
+        self.max_entries_per_index = max_entries_per_index
+
+        self._stores: Dict[str, _SemanticIndexStore] = {}
+        self._lock = threading.Lock()
+        self._tick = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    def _get_store(self, index_name: str, index_version: int) -> _SemanticIndexStore:
+        """인덱스 저장소 조회 (인덱스 버전이 바뀌면 새로 생성, lock 보유 상태에서 호출)"""
+        store = self._stores.get(index_name)
+        if store is None or store.index_version != index_version:
+            store = _SemanticIndexStore(index_version, self.max_entries_per_index)
+            self._stores[index_name] = store
+        return store
+
+    def get(self, index_name: str, index_version: int, embedding: np.ndarray) -> Optional[Tuple[str, List[str]]]:
+        """유사도가 임계값 이상인 과거 질문의 (답변, 출처) 반환"""
+        with self._lock:
+            self._tick += 1
+            result = self._get_store(index_name, index_version).lookup(embedding, self.threshold, self._tick)
+            if result is None:
+                self.stats["misses"] += 1
+                return None
+
+            score, (matched_question, answer, sources) = result
+            self.stats["hits"] += 1
+
+        logger.info(f"시맨틱 캐시 히트 (유사도 {score:.3f}): '{matched_question}'")
+        return answer, list(sources)
+
+    def set(self, index_name: str, index_version: int, embedding: np.ndarray,
+            question: str, answer: str, sources: List[str]):
+        """질문 임베딩과 답변 저장"""
+        with self._lock:
+            self._tick += 1
+            self._get_store(index_name, index_version).add(embedding, question, answer, sources, self._tick)
+            self.stats["stores"] += 1
+
+    def invalidate_index(self, index_name: str):
+        """특정 인덱스의 시맨틱 캐시 삭제"""
+        with self._lock:
+            self._stores.pop(index_name, None)
+
+    def get_stats(self) -> Dict:
+        """히트/미스 카운터와 저장된 질문 수 반환"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = sum(store.size for store in self._stores.values())
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+# 전역 답변 캐시 인스턴스
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512")),
+    ttl_seconds=int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+    l2_ttl_seconds=int(os.getenv("ANSWER_CACHE_L2_TTL_SECONDS", "86400"))
+)
+
+# 전역 시맨틱 캐시 인스턴스
+semantic_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+    max_entries_per_index=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "20000"))
+)
@@ -1,14 +1,27 @@
 import streamlit as st
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents import SearchClient
-from openai import AzureOpenAI
 import os
 from dotenv import load_dotenv
 import time
 
+from database_utils import get_index_version, get_retrieval_mode, get_performance_profile
+from profile_utils import PerformanceProfile
+from streaming_utils import is_streaming_enabled
+from async_engine import async_engine, is_async_engine_enabled
+from retrieval_utils import get_local_search_client
+from rag_engine import create_rag_engine
+from fallback_utils import PendingAnswer, replace_with_llm_answer
+from stub_clients import is_stub_mode, create_stub_clients
+from endpoint_pool import create_openai_client, get_endpoint_pool
+from resilience_utils import wrap_clients
+
 # 환경 변수 로드
 load_dotenv()
 
+# 검색 + 답변 생성 엔진 (관리자 화면, CLI와 같은 경로 사용, 시맨틱 캐시는 사용하지 않음)
+rag_engine = create_rag_engine(use_semantic_cache=False)
+
 # 페이지 설정
 st.set_page_config(
     page_title="AI 문서 검색 챗봇",
@@ -109,19 +122,27 @@ st.markdown("""
 @st.cache_resource
 def initialize_clients(index_name):
     
+    # 마감 시간/재시도/서킷 브레이커 적용
+    if is_stub_mode():
+        # Azure 없이 로컬 스텁으로 채팅 경로 실행
+        return wrap_clients(*create_stub_clients(index_name))
+    
+    if is_async_engine_enabled():
+        # 모든 세션이 공유하는 비동기 엔진의 이벤트 루프를 통해 호출
+        # 엔드포인트 풀이 설정되어 있으면 OpenAI 호출은 풀을 사용 (재시도/전환도 풀이 담당해 wrap_clients가 감싸지 않음)
+        return wrap_clients(
+            async_engine.get_search_client(index_name), get_endpoint_pool() or async_engine.get_openai_client()
+        )
+    
     search_client = SearchClient(
         endpoint=f"https://{os.getenv('AZURE_SEARCH_SERVICE_NAME')}.search.windows.net",
         index_name=index_name,
         credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_SERVICE_ADMIN_KEY"))
     )
     
-    openai_client = AzureOpenAI(
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_version="2023-12-01-preview"
-    )
+    openai_client = create_openai_client()
     
-    return search_client, openai_client
+    return wrap_clients(search_client, openai_client)
 
 def get_document_count(search_client):
     """인덱스의 문서 수 확인"""
@@ -132,80 +153,6 @@ def get_document_count(search_client):
         st.error(f"문서 수 확인 실패: {e}")
         return 0
 
-def get_best_content(doc):
-    """문서에서 가장 좋은 텍스트 내용을 반환"""
-    content = doc.get("content", "").strip()
-    ocr_text = doc.get("ocr_text", "").strip()
-    filename = doc.get("metadata_storage_name", "Unknown")
-    
-    if ocr_text:
-        return ocr_text, f"{filename} (OCR)"
-    elif content:
-        return content, f"{filename} (원본)"
-    else:
-        return "", filename
-
-def search_and_answer(search_client, openai_client, question):
-    """질문에 대해 검색하고 GPT로 답변 생성"""
-    try:
-        # Azure Search로 관련 문서 검색
-        with st.spinner("🔍 관련 문서를 검색하고 있습니다..."):
-            results = search_client.search(
-                search_text=question,
-                top=3,
-                search_mode="any"
-            )
-            
-            # 검색된 문서의 내용 수집
-            contexts = []
-            sources = []
-            
-            for doc in results:
-                text, source = get_best_content(doc)
-                if text:
-                    contexts.append(text)
-                    sources.append(source)
-            
-            if not contexts:
-                return "❌ 질문과 관련된 문서를 찾을 수 없습니다.", []
-            
-            # 모든 컨텍스트를 합치되, 너무 길면 자르기
-            combined_context = "\n\n".join(contexts)
-            if len(combined_context) > 8000:
-                combined_context = combined_context[:8000] + "...[내용 일부 생략]"
-        
-        # GPT에게 질문과 컨텍스트 전달
-        with st.spinner("🤖 AI가 답변을 생성하고 있습니다..."):
-            response = openai_client.chat.completions.create(
-                model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": """당신은 제공된 문서를 바탕으로 정확하고 도움이 되는 답변을 제공하는 AI 어시스턴트입니다.
-
-규칙:
-1. 제공된 문서의 내용만을 바탕으로 답변하세요
-2. 문서에 없는 내용은 추측하지 마세요  
-3. 답변할 수 없다면 솔직히 말하세요
-4. 가능한 한 구체적이고 정확한 정보를 제공하세요
-5. 한국어로 자연스럽게 답변하세요
-6. 답변의 근거가 되는 부분이 있다면 언급해주세요"""
-                    },
-                    {
-                        "role": "user", 
-                        "content": f"다음 문서들을 바탕으로 질문에 답변해주세요.\n\n문서 내용:\n{combined_context}\n\n질문: {question}"
-                    }
-                ],
-                temperature=0.2,
-                max_tokens=1500
-            )
-            
-            answer = response.choices[0].message.content
-            return answer, sources
-            
-    except Exception as e:
-        return f"❌ 검색 또는 답변 생성 실패: {e}", []
-
 def main():
 
     index_name = os.getenv('INDEX_NAME', 'azureblob-index')
@@ -216,6 +163,11 @@ def main():
         st.session_state.chat_active = False
     if "processing" not in st.session_state:
         st.session_state.processing = False
+    if "rag_session" not in st.session_state:
+        st.session_state.rag_session = {}
+    # 성능 프로필은 세션 시작 시 한 번만 읽어 둠
+    if "profile" not in st.session_state:
+        st.session_state.profile = PerformanceProfile.from_json(get_performance_profile(index_name))
     
     # 클라이언트 초기화
     try:
@@ -224,6 +176,11 @@ def main():
         st.error(f"Azure 클라이언트 초기화 실패: {e}")
         st.stop()
     
+    # 로컬 BM25 방식이면 로컬 인덱스로 검색
+    retrieval_mode = get_retrieval_mode(index_name)
+    if retrieval_mode == "bm25":
+        search_client = get_local_search_client(index_name) or search_client
+    
     # 메인 컨테이너
     st.markdown('<div class="chat-container">', unsafe_allow_html=True)
     st.markdown('<div class="chat-header">🤖 AI 문서 검색 챗봇</div>', unsafe_allow_html=True)
@@ -289,7 +246,32 @@ def main():
         st.session_state.messages.append({"role": "user", "content": user_input})
         
         # AI 응답 생성
-        answer, sources = search_and_answer(search_client, openai_client, user_input)
+        streaming = is_streaming_enabled()
+        with st.spinner("🔍 관련 문서를 검색하고 답변을 생성하고 있습니다..."):
+            answer, sources = rag_engine.answer(
+                search_client, openai_client, user_input,
+                index_name=index_name,
+                index_version=get_index_version(index_name),
+                stream=streaming,
+                retrieval_mode=retrieval_mode,
+                chatbot_name=os.getenv('CHATBOT_NAME'),
+                session=st.session_state.rag_session,
+                history=st.session_state.messages[:-1],
+                profile=st.session_state.profile
+            )
+        
+        # 마감 시간을 넘기면 추출형 답변을 먼저 표시하고 LLM 답변이 도착하면 교체
+        if isinstance(answer, PendingAnswer):
+            with chat_container:
+                st.markdown(f'<div class="user-message">👤 {user_input}</div>', 
+                          unsafe_allow_html=True)
+                answer = replace_with_llm_answer(st.empty(), answer)
+        # 스트리밍 모드에서는 토큰이 도착하는 대로 표시하고 전체 답변을 돌려받음
+        elif streaming:
+            with chat_container:
+                st.markdown(f'<div class="user-message">👤 {user_input}</div>', 
+                          unsafe_allow_html=True)
+                answer = st.write_stream(answer)
         
         # AI 메시지 추가
         st.session_state.messages.append({
@@ -305,6 +287,7 @@ def main():
     if st.session_state.messages:
         if st.button("🗑️ 채팅 기록 삭제", key="clear_button"):
             st.session_state.messages = []
+            st.session_state.rag_session = {}
             st.rerun()
     
     st.markdown('</div>', unsafe_allow_html=True)
@@ -0,0 +1,124 @@
+"""
+동시 요청 합치기(single-flight) 유틸리티 모듈
+공지 직후처럼 같은 질문이 동시에 몰리면 처음 요청(leader)만 검색/답변 생성을 수행하고,
+처리 중에 들어온 같은 질문(follower)은 그 결과(출처, 스트리밍 조각 포함)를 함께 받습니다.
+프로세스 안의 모든 Streamlit 세션이 같은 SingleFlight 객체를 공유합니다.
+"""
+
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from resilience_utils import ResiliencePolicy
+
+def is_coalescing_enabled() -> bool:
+    """동시 요청 합치기 사용 여부 (기본값: 사용)"""
+    return os.getenv("ENABLE_REQUEST_COALESCING", "true").lower() in ("1", "true", "yes")
+
+def get_coalesce_timeout_seconds() -> float:
+    """
+    follower가 출처와 다음 답변 조각을 각각 기다리는 최대 시간
+    (기본값: 검색 + 답변 생성 마감 시간, COALESCE_TIMEOUT_SECONDS로 조정)
+    """
+    default = (ResiliencePolicy.from_env("SEARCH", 10.0).deadline_seconds
+               + ResiliencePolicy.from_env("OPENAI", 60.0).deadline_seconds)
+    return float(os.getenv("COALESCE_TIMEOUT_SECONDS", str(default)))
+
+class Flight:
+    """
+    처리 중인 요청 하나의 공유 결과
+
+    leader가 출처(와 추출형 답변)를 먼저 알리고(publish) 답변 조각을 차례로 추가(append)하면,
+    follower는 지금까지 쌓인 조각부터 이어서 받습니다.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.ready = False
+        self.done = False
+        self.failed = False
+        self.sources: List[str] = []
+        self.fallback_text: Optional[str] = None
+        self.chunks: List[str] = []
+        self.followers = 0
+
+    def publish(self, sources: List[str], fallback_text: Optional[str] = None):
+        with self._cond:
+            self.sources = sources
+            self.fallback_text = fallback_text
+            self.ready = True
+            self._cond.notify_all()
+
+    def append(self, chunk: str):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, failed: bool = False):
+        with self._cond:
+            self.done = True
+            self.failed = self.failed or failed
+            self.ready = True
+            self._cond.notify_all()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """출처가 정해질 때까지 대기 (leader가 결과 없이 실패하거나 timeout이 지나면 False)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.ready, timeout)
+            return self.ready and not self.failed
+
+    def iter_chunks(self, timeout: Optional[float] = None) -> Iterator[str]:
+        """처음부터 모든 답변 조각을 도착하는 대로 반환 (다음 조각이 timeout 안에 오지 않으면 TimeoutError)"""
+        position = 0
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: position < len(self.chunks) or self.done, timeout):
+                    raise TimeoutError(f"같은 질문의 답변 조각이 {timeout:.1f}초 안에 오지 않았습니다.")
+                if position >= len(self.chunks):
+                    return
+                chunk = self.chunks[position]
+            position += 1
+            yield chunk
+
+    def text(self) -> str:
+        """답변이 끝날 때까지 기다린 뒤 전체 답변 반환"""
+        return "".join(self.iter_chunks())
+
+class SingleFlight:
+    """키별로 처리 중인 Flight를 관리"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Tuple, Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def join(self, key: Tuple) -> Tuple[Flight, bool]:
+        """(Flight, leader 여부) 반환. 처리 중인 같은 키가 없으면 새 Flight의 leader가 됨"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.done:
+                flight.followers += 1
+                self.followers += 1
+                return flight, False
+            flight = Flight()
+            self._flights[key] = flight
+            self.leaders += 1
+            return flight, True
+
+    def forget(self, key: Tuple, flight: Flight):
+        """처리가 끝난 Flight 제거 (이후 같은 질문은 답변 캐시가 처리)"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "followers": self.followers,
+                "in_flight": len(self._flights),
+            }
+
+# 프로세스 전체에서 공유하는 동시 요청 합치기
+single_flight = SingleFlight()
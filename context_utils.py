@@ -0,0 +1,162 @@
+"""
+컨텍스트 구성 유틸리티 모듈
+검색 결과를 문자 수가 아닌 실제 토큰 수 기준으로 예산 안에 채워 넣습니다.
+"""
+
+import os
+import math
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from text_utils import tokenize, split_paragraphs
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+    logging.warning("tiktoken이 설치되지 않았습니다. 토큰 수를 근사치로 계산합니다. pip install tiktoken으로 설치하세요.")
+
+logger = logging.getLogger(__name__)
+
+_encodings = {}
+
+def get_context_token_budget() -> int:
+    """컨텍스트 토큰 예산 (기본값: 3000)"""
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+def _get_encoding(model: Optional[str]):
+    """배포(모델)에 맞는 tiktoken 인코딩 반환 (사용할 수 없으면 None)"""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+
+    model = os.getenv("AZURE_OPENAI_TOKENIZER_MODEL") or model or "gpt-4"
+    if model not in _encodings:
+        try:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                # Azure 배포명은 임의 지정이므로 모델명을 알 수 없으면 GPT-4 계열 인코딩 사용
+                _encodings[model] = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # 인코딩 파일을 내려받을 수 없는 환경(오프라인 등)에서는 근사치 사용
+            logger.warning(f"tiktoken 인코딩 로드 실패, 근사치로 계산합니다: {e}")
+            _encodings[model] = None
+    return _encodings[model]
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """텍스트의 토큰 수 계산"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+
+    # 근사치: 한글은 글자당 약 1토큰, 그 외는 4글자당 1토큰
+    hangul = sum(1 for ch in text if "가" <= ch <= "힣")
+    return hangul + math.ceil((len(text) - hangul) / 4)
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """텍스트를 최대 토큰 수에 맞게 자름"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+
+    while text and count_tokens(text) > max_tokens:
+        text = text[:int(len(text) * 0.9)]
+    return text
+
+def _rank_paragraphs(paragraphs: List[str], question_terms: set) -> List[int]:
+    """질문 단어와 많이 겹치는 문단부터 순서대로 인덱스 반환"""
+    def score(i):
+        terms = set(tokenize(paragraphs[i]))
+        return (len(terms & question_terms), -i)
+    return sorted(range(len(paragraphs)), key=score, reverse=True)
+
+def pack_context(
+    results: Iterable[Dict],
+    question: str,
+    content_getter: Callable[[Dict], Tuple[str, str]],
+    token_budget: Optional[int] = None,
+    model: Optional[str] = None
+) -> Dict:
+    """
+    검색 결과를 점수 순서대로 토큰 예산 안에 채워 컨텍스트 구성
+
+    검색 결과는 점수 내림차순으로 온다고 가정하며, 각 문서 안에서는
+    질문과 관련이 높은 문단부터 채웁니다. 예산이 가득 차면 나머지 문서는
+    토큰 계산/문단 선택을 하지 않습니다.
+    검색 요청 수를 줄이는 효과는 없습니다. rag_engine은 검색 마감 시간, 검색 건수 기록,
+    후속 질문 재사용, 재순위화를 위해 검색 결과(최대 후보 수)를 검색 단계에서 모두 받아 둡니다.
+
+    Args:
+        results: 검색 결과 (목록 또는 이터레이터)
+        question: 사용자 질문
+        content_getter: 문서에서 (텍스트, 출처) 를 꺼내는 함수
+        token_budget: 컨텍스트 토큰 예산 (미지정 시 CONTEXT_TOKEN_BUDGET)
+        model: 토큰 계산에 사용할 배포(모델)명
+
+    Returns:
+        context, sources, tokens_used, token_budget, documents_used 를 담은 딕셔너리
+    """
+    token_budget = token_budget or get_context_token_budget()
+    question_terms = set(tokenize(question))
+    separator_tokens = count_tokens("\n\n", model)
+
+    sections = []
+    sources = []
+    tokens_used = 0
+
+    for doc in results:
+        text, source = content_getter(doc)
+        if not text:
+            continue
+
+        header = f"[출처: {source}]"
+        remaining = token_budget - tokens_used - count_tokens(header, model) - separator_tokens
+        if remaining <= 0:
+            break
+
+        paragraphs = split_paragraphs(text)
+        selected = {}
+        for i in _rank_paragraphs(paragraphs, question_terms):
+            paragraph_tokens = count_tokens(paragraphs[i], model) + separator_tokens
+            if paragraph_tokens <= remaining:
+                selected[i] = paragraphs[i]
+                remaining -= paragraph_tokens
+            elif not selected and remaining > 50:
+                # 가장 관련 높은 문단이 예산보다 크면 남은 예산만큼 잘라서 사용
+                selected[i] = truncate_to_tokens(paragraphs[i], remaining - separator_tokens, model)
+                remaining = 0
+                break
+
+        if not selected:
+            break
+
+        # 선택된 문단은 원래 문서 순서대로 배치
+        body = "\n\n".join(selected[i] for i in sorted(selected))
+        section = f"{header}\n{body}"
+        sections.append(section)
+        # 같은 파일의 여러 구간이 선택되어도 출처는 한 번만 표시
+        if source not in sources:
+            sources.append(source)
+        tokens_used += count_tokens(section, model) + separator_tokens
+
+        if remaining <= 0 or tokens_used >= token_budget:
+            break
+
+    context = "\n\n".join(sections)
+    logger.info(f"컨텍스트 구성: 문서 {len(sections)}개, {tokens_used}/{token_budget} 토큰")
+
+    return {
+        "context": context,
+        "sources": sources,
+        "tokens_used": tokens_used,
+        "token_budget": token_budget,
+        "documents_used": len(sections)
+    }
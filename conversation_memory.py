@@ -0,0 +1,159 @@
+"""
+멀티턴 대화 메모리 모듈
+최근 대화는 토큰 예산 안에서 그대로 프롬프트에 넣고, 예산을 벗어난 오래된 대화는
+백그라운드 스레드에서 누적 요약(rolling summary)으로 접어 둡니다.
+요약은 채팅 키(messages_{챗봇명})별 대화 상태에 저장되며, 답변 경로에서는 이미 만들어진 요약만 사용하므로
+대화가 길어져도 프롬프트 크기와 응답 지연은 일정하게 유지됩니다.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from context_utils import count_tokens, truncate_to_tokens
+from rate_limiter import rate_limiter, estimate_request_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "다음은 사용자와 사내 문서 챗봇의 이전 대화 요약과 이어지는 대화입니다. "
+    "이후 질문을 이해하는 데 필요한 주제, 사용자가 밝힌 조건, 챗봇이 알려준 핵심 사실만 남겨 "
+    "한국어로 간결하게 다시 요약해주세요."
+)
+
+# 요약 호출은 답변 경로와 분리된 작은 스레드 풀에서 실행
+_summary_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SUMMARY_MAX_WORKERS", "2")),
+    thread_name_prefix="conversation-summary"
+)
+
+def is_conversation_memory_enabled() -> bool:
+    """이전 대화를 프롬프트에 포함할지 여부 (기본값: 사용)"""
+    return os.getenv("ENABLE_CONVERSATION_MEMORY", "true").lower() in ("1", "true", "yes")
+
+def get_history_token_budget() -> int:
+    """그대로 포함할 최근 대화의 토큰 예산 (기본값: 800)"""
+    return int(os.getenv("HISTORY_TOKEN_BUDGET", "800"))
+
+def get_summary_max_tokens() -> int:
+    """누적 요약의 최대 토큰 수 (기본값: 300)"""
+    return int(os.getenv("SUMMARY_MAX_TOKENS", "300"))
+
+def get_summary_min_messages() -> int:
+    """요약에 새로 접을 메시지가 이 개수 이상 쌓이면 요약 갱신 (기본값: 4, 약 2턴)"""
+    return int(os.getenv("SUMMARY_MIN_MESSAGES", "4"))
+
+class ConversationMemory:
+    """
+    대화 기록 → 프롬프트용 메시지 변환과 백그라운드 누적 요약
+
+    요약 상태는 대화별 상태 딕셔너리(session)의 "summary" 항목에
+    {"text": 요약, "messages": 요약에 반영된 앞쪽 메시지 수} 로 저장됩니다.
+    """
+
+    def __init__(self, history_token_budget: int = 800, summary_max_tokens: int = 300,
+                 summary_min_messages: int = 4, temperature: float = 0.0):
+        self.history_token_budget = history_token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_min_messages = summary_min_messages
+        self.temperature = temperature
+        self._lock = threading.Lock()
+
+    def build_history(self, messages: List[Dict], session: Optional[Dict], model: Optional[str] = None,
+                      openai_client=None, deployment: Optional[str] = None,
+                      chatbot_name: Optional[str] = None) -> List[Dict]:
+        """
+        프롬프트에 넣을 이전 대화 메시지 구성
+
+        최근 메시지부터 거꾸로 토큰 예산이 찰 때까지 그대로 포함하고, 그보다 앞의 대화는
+        요약으로만 포함합니다. 아직 요약되지 않은 오래된 메시지가 충분히 쌓였으면
+        openai_client로 요약 갱신을 백그라운드에 예약합니다.
+
+        Args:
+            messages: 현재 질문을 제외한 이전 대화 ({"role", "content"} 목록)
+            session: 대화별 상태 딕셔너리 (None이면 요약 없이 최근 대화만 사용)
+        """
+        history = [m for m in messages if m.get("role") in ("user", "assistant") and m.get("content")]
+        if not history:
+            return []
+
+        recent = []
+        used = 0
+        cut = len(history)
+        for message in reversed(history):
+            tokens = count_tokens(message["content"], model)
+            if used + tokens > self.history_token_budget:
+                # 가장 최근 메시지 하나가 예산보다 길면 잘라서라도 포함
+                if not recent:
+                    recent.append({
+                        "role": message["role"],
+                        "content": truncate_to_tokens(message["content"], self.history_token_budget, model)
+                    })
+                    cut -= 1
+                break
+            recent.append({"role": message["role"], "content": message["content"]})
+            used += tokens
+            cut -= 1
+        recent.reverse()
+
+        prompt_messages = []
+        if session is not None:
+            summary = session.get("summary") or {}
+            if summary.get("text"):
+                summary_text = truncate_to_tokens(summary["text"], self.summary_max_tokens, model)
+                prompt_messages.append({"role": "system", "content": f"이전 대화 요약:\n{summary_text}"})
+            if openai_client is not None and cut - summary.get("messages", 0) >= self.summary_min_messages:
+                self._schedule_summary(history[:cut], session, openai_client, deployment, model, chatbot_name)
+        return prompt_messages + recent
+
+    def _schedule_summary(self, older: List[Dict], session: Dict, openai_client, deployment: Optional[str],
+                          model: Optional[str], chatbot_name: Optional[str]):
+        """대화별로 한 번에 하나의 요약 갱신만 예약"""
+        with self._lock:
+            if session.get("summary_pending"):
+                return
+            session["summary_pending"] = True
+        _summary_executor.submit(
+            self._update_summary, [dict(m) for m in older], session, openai_client, deployment, model, chatbot_name
+        )
+
+    def _update_summary(self, older: List[Dict], session: Dict, openai_client, deployment: Optional[str],
+                        model: Optional[str], chatbot_name: Optional[str]):
+        """이전 요약 + 새로 밀려난 대화를 새 요약으로 접음 (실패하면 다음 턴에 다시 시도)"""
+        try:
+            summary = session.get("summary") or {}
+            start = summary.get("messages", 0)
+            turns = "\n".join(
+                f"{'사용자' if m['role'] == 'user' else '챗봇'}: {truncate_to_tokens(m['content'], 400, model)}"
+                for m in older[start:]
+            )
+            messages = [
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"이전 요약:\n{summary.get('text') or '(없음)'}\n\n이어지는 대화:\n{turns}"}
+            ]
+            rate_limiter.acquire(
+                estimate_request_tokens(messages, self.summary_max_tokens, model), chatbot_name, deployment=deployment
+            )
+            response = openai_client.chat.completions.create(
+                model=deployment,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.summary_max_tokens
+            )
+            text = (response.choices[0].message.content or "").strip()
+            if text:
+                session["summary"] = {"text": text, "messages": len(older)}
+                logger.info(f"대화 요약 갱신: 메시지 {len(older)}개 반영 ({count_tokens(text, model)} 토큰)")
+        except Exception as e:
+            logger.warning(f"대화 요약 갱신 실패: {e}")
+        finally:
+            session["summary_pending"] = False
+
+# 프로세스 전체에서 공유하는 대화 메모리 설정
+conversation_memory = ConversationMemory(
+    history_token_budget=get_history_token_budget(),
+    summary_max_tokens=get_summary_max_tokens(),
+    summary_min_messages=get_summary_min_messages()
+)
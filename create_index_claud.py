@@ -11,16 +11,31 @@ from azure.search.documents.indexes.models import (
     SearchIndexerDataContainer,
     SearchIndexerDataSourceConnection,
     FieldMapping,
-    FieldMappingFunction
+    FieldMappingFunction,
+    VectorSearch,
+    VectorSearchProfile,
+    HnswAlgorithmConfiguration
 )
 from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
 from azure.storage.blob import BlobServiceClient
+import re
+import sys
 import json
 import time
+import argparse
 from dotenv import load_dotenv
 
+from text_utils import split_passages
+from context_utils import truncate_to_tokens
+from embedding_utils import embed_texts, get_embedding_dimensions, is_embedding_configured
+from retrieval_utils import VECTOR_FIELD_NAME
+
 load_dotenv()
 
+# 벡터를 만든 원본 문서의 수정 시각 (벡터 필드는 반환되지 않으므로 이 값으로 벡터가 없거나 오래된 문서를 찾음)
+VECTOR_SOURCE_FIELD = "vector_source_modified"
+
 class AzureSearchIndexCreator:
     def __init__(self, search_service_name, search_admin_key, storage_connection_string):
         """
@@ -66,9 +81,30 @@ class AzureSearchIndexCreator:
             print(f"데이터 소스 생성 중 오류 발생: {str(e)}")
             return None
 
-    def create_simple_index(self, index_name):
+    def _vector_search_schema(self, vector_dimensions):
+        """
+        벡터 필드와 벡터 검색(HNSW) 설정 생성 - 차원 수가 없으면 ([], None)
+        """
+        if not vector_dimensions:
+            return [], None
+        
+        vector_field = SearchField(
+            name=VECTOR_FIELD_NAME,
+            type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+            searchable=True,
+            hidden=True,  # 검색 응답 크기를 줄이기 위해 벡터는 반환하지 않음
+            vector_search_dimensions=vector_dimensions,
+            vector_search_profile_name="default-vector-profile"
+        )
+        vector_search = VectorSearch(
+            algorithms=[HnswAlgorithmConfiguration(name="default-hnsw")],
+            profiles=[VectorSearchProfile(name="default-vector-profile", algorithm_configuration_name="default-hnsw")]
+        )
+        return [vector_field], vector_search
+
+    def create_simple_index(self, index_name, vector_dimensions=None):
         """
-        간단한 검색 인덱스 스키마 생성 - 기본 필드만
+        간단한 검색 인덱스 스키마 생성 - 기본 필드만 (vector_dimensions 지정 시 벡터 필드 추가)
         """
         fields = [
             SimpleField(name="id", type=SearchFieldDataType.String, key=True),
@@ -80,9 +116,14 @@ class AzureSearchIndexCreator:
             SimpleField(name="metadata_storage_last_modified", type=SearchFieldDataType.DateTimeOffset, filterable=True, sortable=True),
         ]
         
+        vector_fields, vector_search = self._vector_search_schema(vector_dimensions)
+        if vector_fields:
+            vector_fields.append(self._vector_source_field())
+        
         index = SearchIndex(
             name=index_name,
-            fields=fields
+            fields=fields + vector_fields,
+            vector_search=vector_search
         )
         
         try:
@@ -93,6 +134,255 @@ class AzureSearchIndexCreator:
             print(f"인덱스 생성 중 오류 발생: {str(e)}")
             return None
 
+    def create_chunk_index(self, index_name, vector_dimensions=None):
+        """
+        구간(passage) 단위 검색 인덱스 스키마 생성 - 구간 하나가 문서 하나
+        """
+        fields = [
+            SimpleField(name="id", type=SearchFieldDataType.String, key=True),
+            SimpleField(name="parent_id", type=SearchFieldDataType.String, filterable=True),
+            SimpleField(name="chunk_index", type=SearchFieldDataType.Int32, filterable=True, sortable=True),
+            SimpleField(name="page", type=SearchFieldDataType.Int32, filterable=True),
+            SimpleField(name="offset", type=SearchFieldDataType.Int32),
+            SearchableField(name="content", type=SearchFieldDataType.String, analyzer_name="ko.microsoft"),
+            SimpleField(name="metadata_storage_name", type=SearchFieldDataType.String, filterable=True),
+            SimpleField(name="metadata_storage_path", type=SearchFieldDataType.String, filterable=True),
+        ]
+        
+        vector_fields, vector_search = self._vector_search_schema(vector_dimensions)
+        
+        index = SearchIndex(
+            name=index_name,
+            fields=fields + vector_fields,
+            vector_search=vector_search
+        )
+        
+        try:
+            result = self.search_client.create_or_update_index(index)
+            print(f"구간 인덱스 '{index_name}' 생성 완료")
+            return result
+        except Exception as e:
+            print(f"구간 인덱스 생성 중 오류 발생: {str(e)}")
+            return None
+
+    def wait_for_indexer(self, indexer_name, timeout_seconds=600, poll_seconds=10):
+        """
+        인덱서 실행이 끝날 때까지 대기
+        """
+        deadline = time.time() + timeout_seconds
+        while time.time() < deadline:
+            try:
+                status = self.indexer_client.get_indexer_status(indexer_name)
+                last_status = status.last_result.status if status.last_result else None
+                if last_status in ("success", "transientFailure", "persistentFailure"):
+                    print(f"인덱서 '{indexer_name}' 실행 완료: {last_status}")
+                    return last_status == "success"
+            except Exception as e:
+                print(f"인덱서 상태 확인 중 오류 (재시도): {str(e)}")
+            time.sleep(poll_seconds)
+        
+        print(f"인덱서 '{indexer_name}' 실행 대기 시간 초과")
+        return False
+
+    def build_chunk_documents(self, source_index_name, passage_chars=1000, overlap_chars=200):
+        """
+        문서 인덱스에서 추출된 본문을 읽어 구간 문서 목록 생성
+        
+        Blob 텍스트 추출(PDF 등)은 인덱서가 이미 수행했으므로, 그 결과를 그대로 나눕니다.
+        """
+        source_client = SearchClient(
+            endpoint=self.search_endpoint,
+            index_name=source_index_name,
+            credential=AzureKeyCredential(self.search_admin_key)
+        )
+        
+        results = source_client.search(
+            "*",
+            select=["id", "content", "metadata_storage_name", "metadata_storage_path"]
+        )
+        
+        for doc in results:
+            parent_id = doc.get("id")
+            content = doc.get("content") or ""
+            if not parent_id or not content.strip():
+                continue
+            
+            # 인덱스 키에 허용되지 않는 문자는 치환
+            safe_parent_id = re.sub(r"[^A-Za-z0-9_\-=]", "_", parent_id)
+            
+            for i, passage in enumerate(split_passages(content, passage_chars, overlap_chars)):
+                yield {
+                    "id": f"{safe_parent_id}-{i}",
+                    "parent_id": parent_id,
+                    "chunk_index": i,
+                    "page": passage["page"],
+                    "offset": passage["offset"],
+                    "content": passage["content"],
+                    "metadata_storage_name": doc.get("metadata_storage_name"),
+                    "metadata_storage_path": doc.get("metadata_storage_path"),
+                }
+
+    def upload_chunk_documents(self, chunk_index_name, documents, batch_size=500, openai_client=None):
+        """
+        구간 문서를 배치 단위로 업로드 (openai_client가 주어지면 배치마다 임베딩 생성)
+        """
+        chunk_client = SearchClient(
+            endpoint=self.search_endpoint,
+            index_name=chunk_index_name,
+            credential=AzureKeyCredential(self.search_admin_key)
+        )
+        
+        uploaded = 0
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                uploaded += self._upload_batch(chunk_client, self._attach_vectors(batch, openai_client))
+                batch = []
+        if batch:
+            uploaded += self._upload_batch(chunk_client, self._attach_vectors(batch, openai_client))
+        
+        print(f"구간 문서 {uploaded}개 업로드 완료")
+        return uploaded
+
+    def _attach_vectors(self, batch, openai_client, max_tokens=8000):
+        """
+        배치 문서의 content를 한 번에 임베딩해서 벡터 필드에 추가
+        """
+        if openai_client is None:
+            return batch
+        
+        try:
+            texts = [truncate_to_tokens(doc.get("content") or "", max_tokens) for doc in batch]
+            vectors = embed_texts(openai_client, texts)
+            for doc, vector in zip(batch, vectors):
+                doc[VECTOR_FIELD_NAME] = vector.tolist()
+        except Exception as e:
+            print(f"임베딩 생성 중 오류 발생 (벡터 없이 업로드): {str(e)}")
+        return batch
+
+    def _vector_source_field(self):
+        return SimpleField(name=VECTOR_SOURCE_FIELD, type=SearchFieldDataType.DateTimeOffset, filterable=True)
+
+    def _ensure_vector_source_field(self, index_name):
+        """
+        이전 버전으로 만든 인덱스에 벡터 원본 수정 시각 필드가 없으면 추가
+        """
+        try:
+            index = self.search_client.get_index(index_name)
+            if not any(field.name == VECTOR_SOURCE_FIELD for field in index.fields):
+                index.fields.append(self._vector_source_field())
+                self.search_client.create_or_update_index(index)
+                print(f"인덱스 '{index_name}'에 '{VECTOR_SOURCE_FIELD}' 필드 추가")
+            return True
+        except Exception as e:
+            print(f"인덱스 스키마 확인 중 오류 발생: {str(e)}")
+            return False
+
+    def add_document_vectors(self, index_name, openai_client, batch_size=100):
+        """
+        인덱서가 적재한 문서 중 벡터가 없거나 원본이 바뀐 문서에만 벡터 필드를 채움 (파일 단위 인덱스용)
+        
+        여러 번 실행해도 이미 벡터가 있는 문서는 다시 임베딩하지 않으므로,
+        인덱서가 나중에 추가/갱신한 문서는 --backfill-vectors로 다시 실행해 채웁니다.
+        모든 대상 문서에 벡터를 추가했으면 True 반환
+        """
+        if not self._ensure_vector_source_field(index_name):
+            return False
+        
+        index_client = SearchClient(
+            endpoint=self.search_endpoint,
+            index_name=index_name,
+            credential=AzureKeyCredential(self.search_admin_key)
+        )
+        
+        pending = 0
+        updated = 0
+        batch = []
+        results = index_client.search(
+            "*",
+            select=["id", "content", "metadata_storage_last_modified", VECTOR_SOURCE_FIELD]
+        )
+        for doc in results:
+            modified = doc.get("metadata_storage_last_modified")
+            vectorized = doc.get(VECTOR_SOURCE_FIELD)
+            if vectorized is not None and (modified is None or vectorized == modified):
+                continue
+            pending += 1
+            batch.append({
+                "id": doc["id"],
+                "content": doc.get("content") or "",
+                VECTOR_SOURCE_FIELD: modified or time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            })
+            if len(batch) >= batch_size:
+                updated += self._merge_vectors(index_client, batch, openai_client)
+                batch = []
+        if batch:
+            updated += self._merge_vectors(index_client, batch, openai_client)
+        
+        print(f"벡터가 필요한 문서 {pending}개 중 {updated}개에 벡터 추가 완료")
+        return updated == pending
+
+    def _merge_vectors(self, index_client, batch, openai_client):
+        """
+        문서 배치의 벡터를 생성해서 merge 업로드 (벡터 원본 수정 시각도 함께 기록)
+        """
+        batch = self._attach_vectors(batch, openai_client)
+        updates = [
+            {"id": doc["id"], VECTOR_FIELD_NAME: doc[VECTOR_FIELD_NAME], VECTOR_SOURCE_FIELD: doc[VECTOR_SOURCE_FIELD]}
+            for doc in batch if VECTOR_FIELD_NAME in doc
+        ]
+        if not updates:
+            return 0
+        try:
+            results = index_client.merge_documents(documents=updates)
+            return sum(1 for r in results if r.succeeded)
+        except Exception as e:
+            print(f"벡터 업로드 중 오류 발생: {str(e)}")
+            return 0
+
+    def _upload_batch(self, chunk_client, batch):
+        """
+        구간 문서 배치 하나 업로드 후 성공 개수 반환
+        """
+        try:
+            results = chunk_client.upload_documents(documents=batch)
+            failed = [r for r in results if not r.succeeded]
+            for r in failed[:5]:
+                print(f"  구간 업로드 실패: {r.key} - {r.error_message}")
+            return len(batch) - len(failed)
+        except Exception as e:
+            print(f"구간 업로드 중 오류 발생: {str(e)}")
+            return 0
+
+    def create_chunk_pipeline(self, base_name, passage_chars=1000, overlap_chars=200,
+                              openai_client=None, vector_dimensions=None):
+        """
+        문서 인덱서 완료 후 구간 인덱스({base_name}-chunks) 생성 및 적재
+        """
+        index_name = f"{base_name}-index"
+        indexer_name = f"{base_name}-indexer"
+        chunk_index_name = f"{base_name}-chunks"
+        
+        print(f"=== 구간 인덱스 생성 시작: {chunk_index_name} ===")
+        
+        if not self.wait_for_indexer(indexer_name):
+            print("문서 인덱서가 완료되지 않아 구간 인덱스를 만들 수 없습니다.")
+            return False
+        
+        if not self.create_chunk_index(chunk_index_name, vector_dimensions):
+            return False
+        
+        documents = self.build_chunk_documents(index_name, passage_chars, overlap_chars)
+        uploaded = self.upload_chunk_documents(
+            chunk_index_name,
+            documents,
+            openai_client=openai_client if vector_dimensions else None
+        )
+        
+        print(f"=== 구간 인덱스 생성 완료 ===")
+        return uploaded > 0
+
     def create_simple_indexer(self, indexer_name, data_source_name, index_name):
         """
         스킬셋 없는 간단한 인덱서 생성
@@ -269,6 +559,7 @@ class AzureSearchIndexCreator:
         """
         indexer_name = f"{base_name}-indexer"
         index_name = f"{base_name}-index"
+        chunk_index_name = f"{base_name}-chunks"
         data_source_name = f"{base_name}-datasource"
         
         print(f"기존 리소스 삭제 중...")
@@ -285,13 +576,19 @@ class AzureSearchIndexCreator:
         except Exception as e:
             print(f"인덱스 삭제 중 오류 (무시): {str(e)}")
         
+        try:
+            self.search_client.delete_index(chunk_index_name)
+            print(f"기존 구간 인덱스 '{chunk_index_name}' 삭제 완료")
+        except Exception as e:
+            print(f"구간 인덱스 삭제 중 오류 (무시): {str(e)}")
+        
         try:
             self.indexer_client.delete_data_source_connection(data_source_name)
             print(f"기존 데이터소스 '{data_source_name}' 삭제 완료")
         except Exception as e:
             print(f"데이터소스 삭제 중 오류 (무시): {str(e)}")
 
-    def create_simple_pipeline(self, base_name, container_name):
+    def create_simple_pipeline(self, base_name, container_name, vector_dimensions=None):
         """
         간단한 파이프라인 생성 - 특정 컨테이너 기준
         """
@@ -317,7 +614,7 @@ class AzureSearchIndexCreator:
             return False
         
         # 2. 인덱스 생성
-        if not self.create_simple_index(index_name):
+        if not self.create_simple_index(index_name, vector_dimensions):
             return False
         
         # 3. 인덱서 생성 및 실행
@@ -366,8 +663,13 @@ class AzureSearchIndexCreator:
 
 def main():
     """
-    컨테이너 기준 인덱싱 실행
+    컨테이너 기준 인덱싱 실행 (--backfill-vectors: 인덱스를 다시 만들지 않고 벡터가 없는 문서만 채움)
     """
+    parser = argparse.ArgumentParser(description="컨테이너 기준 Azure Search 인덱스 생성")
+    parser.add_argument("--backfill-vectors", action="store_true",
+                        help="기존 파일 단위 인덱스에서 벡터가 없거나 원본이 바뀐 문서에만 벡터 추가")
+    args = parser.parse_args()
+    
     config = {
         "search_service_name": os.getenv("AZURE_SEARCH_SERVICE_NAME"),
         "search_admin_key": os.getenv("AZURE_SEARCH_SERVICE_ADMIN_KEY"),
@@ -384,19 +686,75 @@ def main():
     # 컨테이너 설정 (환경변수 또는 기본값 사용)
     container_name = os.getenv("CONTAINER_NAME", "default-container")
     index_name = os.getenv("INDEX_NAME", f"{container_name}-index")
+    base_name = re.sub(r"-(index|chunks)$", "", index_name)
+    
+    # 인덱싱 방식: document(파일 단위, 기본값) 또는 passage(구간 단위)
+    ingest_mode = os.getenv("INGEST_MODE", "document").lower()
     
     print(f"타겟 컨테이너: {container_name}")
     print(f"인덱스 이름: {index_name}")
+    print(f"인덱싱 방식: {ingest_mode}")
     
-    # 컨테이너 기준 파이프라인 실행
-    success = creator.create_simple_pipeline(index_name.replace("-index", ""), container_name)
+    # 하이브리드 검색용 벡터 필드 (ENABLE_VECTOR_SEARCH=true 이고 임베딩 배포가 설정된 경우)
+    openai_client, vector_dimensions = None, None
+    if os.getenv("ENABLE_VECTOR_SEARCH", "false").lower() in ("1", "true", "yes"):
+        if is_embedding_configured():
+            from openai import AzureOpenAI
+            openai_client = AzureOpenAI(
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_version="2023-12-01-preview"
+            )
+            # 차원 수가 지정되지 않았으면 임베딩 한 번으로 확인
+            vector_dimensions = get_embedding_dimensions() or embed_texts(openai_client, ["dimension probe"]).shape[1]
+            print(f"벡터 필드 사용: {vector_dimensions}차원")
+        else:
+            print("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME이 설정되지 않아 벡터 필드 없이 생성합니다.")
+    
+    if args.backfill_vectors:
+        if ingest_mode == "passage":
+            print("구간 인덱싱 방식은 구간 인덱스를 다시 만들 때 벡터를 함께 생성합니다.")
+            sys.exit(1)
+        if not vector_dimensions:
+            print("벡터 검색이 설정되지 않았습니다. (ENABLE_VECTOR_SEARCH, AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME)")
+            sys.exit(1)
+        if not creator.add_document_vectors(f"{base_name}-index", openai_client):
+            sys.exit(1)
+        return
+    
+    # 컨테이너 기준 파이프라인 실행 (구간 방식이면 벡터는 구간 인덱스에만 추가)
+    success = creator.create_simple_pipeline(
+        base_name,
+        container_name,
+        vector_dimensions=None if ingest_mode == "passage" else vector_dimensions
+    )
     
     if success:
         print(f"'{container_name}' 컨테이너 인덱싱이 시작되었습니다.")
         
-        # 잠시 후 상태 확인
-        time.sleep(30)
-        creator.diagnose_simple_indexing(index_name.replace("-index", ""))
+        if ingest_mode == "passage":
+            chunk_success = creator.create_chunk_pipeline(
+                base_name,
+                passage_chars=int(os.getenv("PASSAGE_CHARS", "1000")),
+                overlap_chars=int(os.getenv("PASSAGE_OVERLAP_CHARS", "200")),
+                openai_client=openai_client,
+                vector_dimensions=vector_dimensions
+            )
+            if not chunk_success:
+                print("구간 인덱스 생성에 실패했습니다.")
+                sys.exit(1)
+        elif vector_dimensions:
+            # 인덱서가 끝난 뒤 문서마다 벡터 추가 (실패하면 --backfill-vectors로 다시 채울 수 있음)
+            if not creator.wait_for_indexer(f"{base_name}-indexer"):
+                print("문서 인덱서가 완료되지 않아 벡터를 추가하지 못했습니다. 완료 후 --backfill-vectors로 실행하세요.")
+                sys.exit(1)
+            if not creator.add_document_vectors(f"{base_name}-index", openai_client):
+                print("일부 문서에 벡터를 추가하지 못했습니다. --backfill-vectors로 다시 실행하세요.")
+                sys.exit(1)
+        else:
+            # 잠시 후 상태 확인
+            time.sleep(30)
+        creator.diagnose_simple_indexing(base_name)
     else:
         print("인덱스 생성에 실패했습니다.")
 
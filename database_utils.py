@@ -33,6 +33,9 @@ class ChatbotDatabase:
                         description TEXT,
                         index_status BOOLEAN DEFAULT FALSE,
                         index_name TEXT,
+                        index_version INTEGER DEFAULT 0,
+                        retrieval_mode TEXT DEFAULT 'keyword',
+                        performance_profile TEXT,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
@@ -49,6 +52,15 @@ class ChatbotDatabase:
                 if 'index_name' not in columns:
                     migration_needed.append('index_name')
                 
+                if 'index_version' not in columns:
+                    migration_needed.append('index_version')
+                
+                if 'retrieval_mode' not in columns:
+                    migration_needed.append('retrieval_mode')
+                
+                if 'performance_profile' not in columns:
+                    migration_needed.append('performance_profile')
+                
                 # 마이그레이션 수행
                 for column in migration_needed:
                     if column == 'containername':
@@ -63,6 +75,18 @@ class ChatbotDatabase:
                     elif column == 'index_name':
                         cursor.execute('ALTER TABLE chatbots ADD COLUMN index_name TEXT')
                         print("✅ index_name 컬럼이 추가되었습니다.")
+                    
+                    elif column == 'index_version':
+                        cursor.execute('ALTER TABLE chatbots ADD COLUMN index_version INTEGER DEFAULT 0')
+                        print("✅ index_version 컬럼이 추가되었습니다.")
+                    
+                    elif column == 'retrieval_mode':
+                        cursor.execute("ALTER TABLE chatbots ADD COLUMN retrieval_mode TEXT DEFAULT 'keyword'")
+                        print("✅ retrieval_mode 컬럼이 추가되었습니다.")
+                    
+                    elif column == 'performance_profile':
+                        cursor.execute('ALTER TABLE chatbots ADD COLUMN performance_profile TEXT')
+                        print("✅ performance_profile 컬럼이 추가되었습니다.")
                 
                 # 더 이상 필요 없는 foldername 컬럼 제거 (SQLite에서는 직접 삭제 불가능하므로 생략)
                 # 실제 운영환경에서는 별도의 마이그레이션 스크립트로 처리
@@ -111,7 +135,7 @@ def get_all_chatbots() -> List[Dict]:
         if 'containername' in columns:
             cursor.execute('''
                 SELECT id, chatbotname, containername, description, index_status, 
-                       index_name, created_at, updated_at
+                       index_name, retrieval_mode, performance_profile, created_at, updated_at
                 FROM chatbots 
                 ORDER BY created_at DESC
             ''')
@@ -119,7 +143,7 @@ def get_all_chatbots() -> List[Dict]:
             # 호환성을 위해 foldername을 containername으로 반환
             cursor.execute('''
                 SELECT id, chatbotname, foldername as containername, description, index_status, 
-                       index_name, created_at, updated_at
+                       index_name, 'keyword' as retrieval_mode, NULL as performance_profile, created_at, updated_at
                 FROM chatbots 
                 ORDER BY created_at DESC
             ''')
@@ -139,14 +163,14 @@ def get_chatbot_by_id(chatbot_id: int) -> Optional[Dict]:
         if 'containername' in columns:
             cursor.execute('''
                 SELECT id, chatbotname, containername, description, index_status, 
-                       index_name, created_at, updated_at
+                       index_name, retrieval_mode, performance_profile, created_at, updated_at
                 FROM chatbots 
                 WHERE id = ?
             ''', (chatbot_id,))
         else:
             cursor.execute('''
                 SELECT id, chatbotname, foldername as containername, description, index_status, 
-                       index_name, created_at, updated_at
+                       index_name, 'keyword' as retrieval_mode, NULL as performance_profile, created_at, updated_at
                 FROM chatbots 
                 WHERE id = ?
             ''', (chatbot_id,))
@@ -167,14 +191,14 @@ def get_chatbot_by_name(chatbot_name: str) -> Optional[Dict]:
         if 'containername' in columns:
             cursor.execute('''
                 SELECT id, chatbotname, containername, description, index_status, 
-                       index_name, created_at, updated_at
+                       index_name, retrieval_mode, performance_profile, created_at, updated_at
                 FROM chatbots 
                 WHERE chatbotname = ?
             ''', (chatbot_name,))
         else:
             cursor.execute('''
                 SELECT id, chatbotname, foldername as containername, description, index_status, 
-                       index_name, created_at, updated_at
+                       index_name, 'keyword' as retrieval_mode, NULL as performance_profile, created_at, updated_at
                 FROM chatbots 
                 WHERE chatbotname = ?
             ''', (chatbot_name,))
@@ -182,14 +206,45 @@ def get_chatbot_by_name(chatbot_name: str) -> Optional[Dict]:
         result = cursor.fetchone()
         return dict(result) if result else None
 
+def get_chatbot_by_index(index_name: str) -> Optional[Dict]:
+    """인덱스명으로 챗봇 정보 조회 (같은 인덱스를 쓰는 챗봇이 여럿이면 가장 최근에 갱신된 챗봇)"""
+    with sqlite3.connect(chatbot_db.db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        # 컬럼 존재 여부 확인
+        cursor.execute("PRAGMA table_info(chatbots)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'containername' in columns:
+            cursor.execute('''
+                SELECT id, chatbotname, containername, description, index_status, 
+                       index_name, retrieval_mode, performance_profile, created_at, updated_at
+                FROM chatbots 
+                WHERE index_name = ?
+                ORDER BY updated_at DESC LIMIT 1
+            ''', (index_name,))
+        else:
+            cursor.execute('''
+                SELECT id, chatbotname, foldername as containername, description, index_status, 
+                       index_name, 'keyword' as retrieval_mode, NULL as performance_profile, created_at, updated_at
+                FROM chatbots 
+                WHERE index_name = ?
+                ORDER BY updated_at DESC LIMIT 1
+            ''', (index_name,))
+        
+        result = cursor.fetchone()
+        return dict(result) if result else None
+
 def update_chatbot_index(chatbot_id: int, index_status: bool, index_name: str = None) -> bool:
-    """챗봇 인덱스 상태 및 인덱스명 업데이트"""
+    """챗봇 인덱스 상태 및 인덱스명 업데이트 (갱신될 때마다 인덱스 버전 증가)"""
     try:
         with sqlite3.connect(chatbot_db.db_path) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE chatbots 
-                SET index_status = ?, index_name = ?, updated_at = CURRENT_TIMESTAMP
+                SET index_status = ?, index_name = ?, 
+                    index_version = COALESCE(index_version, 0) + 1, updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
             ''', (index_status, index_name, chatbot_id))
             conn.commit()
@@ -198,6 +253,80 @@ def update_chatbot_index(chatbot_id: int, index_status: bool, index_name: str =
         print(f"인덱스 상태 업데이트 오류: {e}")
         return False
 
+def get_index_version(index_name: str) -> int:
+    """인덱스명으로 현재 인덱스 버전 조회 (답변 캐시 키에 사용)"""
+    try:
+        with sqlite3.connect(chatbot_db.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT MAX(COALESCE(index_version, 0)) FROM chatbots WHERE index_name = ?
+            ''', (index_name,))
+            result = cursor.fetchone()
+            return result[0] if result and result[0] is not None else 0
+    except Exception as e:
+        print(f"인덱스 버전 조회 오류: {e}")
+        return 0
+
+def get_retrieval_mode(index_name: str) -> str:
+    """인덱스명으로 챗봇의 검색 방식 조회 (keyword / hybrid)"""
+    try:
+        with sqlite3.connect(chatbot_db.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT retrieval_mode FROM chatbots WHERE index_name = ? ORDER BY updated_at DESC LIMIT 1
+            ''', (index_name,))
+            result = cursor.fetchone()
+            return result[0] if result and result[0] else 'keyword'
+    except Exception as e:
+        print(f"검색 방식 조회 오류: {e}")
+        return 'keyword'
+
+def update_chatbot_retrieval_mode(chatbot_id: int, retrieval_mode: str) -> bool:
+    """챗봇 검색 방식 업데이트"""
+    try:
+        with sqlite3.connect(chatbot_db.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE chatbots 
+                SET retrieval_mode = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (retrieval_mode, chatbot_id))
+            conn.commit()
+            return cursor.rowcount > 0
+    except Exception as e:
+        print(f"검색 방식 업데이트 오류: {e}")
+        return False
+
+def get_performance_profile(index_name: str) -> Optional[str]:
+    """인덱스명으로 챗봇의 성능 프로필(JSON) 조회"""
+    try:
+        with sqlite3.connect(chatbot_db.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT performance_profile FROM chatbots WHERE index_name = ? ORDER BY updated_at DESC LIMIT 1
+            ''', (index_name,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+    except Exception as e:
+        print(f"성능 프로필 조회 오류: {e}")
+        return None
+
+def update_chatbot_performance_profile(chatbot_id: int, performance_profile: Optional[str]) -> bool:
+    """챗봇 성능 프로필(JSON) 업데이트 (None이면 전역 기본값 사용)"""
+    try:
+        with sqlite3.connect(chatbot_db.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE chatbots 
+                SET performance_profile = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (performance_profile, chatbot_id))
+            conn.commit()
+            return cursor.rowcount > 0
+    except Exception as e:
+        print(f"성능 프로필 업데이트 오류: {e}")
+        return False
+
 def update_chatbot_container(chatbot_id: int, container_name: str) -> bool:
     """챗봇 컨테이너명 업데이트"""
     try:
@@ -2,8 +2,14 @@ from azure.core.credentials import AzureKeyCredential
 from azure.search.documents import SearchClient
 from openai import AzureOpenAI
 import os
+import sys
 from dotenv import load_dotenv
 
+# 상위 폴더의 공용 RAG 엔진 사용
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fallback_utils import PendingAnswer
+from rag_engine import create_rag_engine
+
 load_dotenv()
 
 # 새로운 simple index 사용
@@ -21,6 +27,8 @@ openai_client = AzureOpenAI(
     api_version="2023-12-01-preview"
 )
 
+rag_engine = create_rag_engine(use_cache=False)
+
 def display_documents():
     """인덱스의 모든 문서를 표시"""
     print("🔍 인덱스 내용 확인:")
@@ -70,85 +78,23 @@ def display_documents():
         print(f"❌ 문서 조회 실패: {e}")
         return False
 
-def get_best_content(doc):
-    """문서에서 가장 좋은 텍스트 내용을 반환"""
-    content = doc.get("content", "").strip()
-    ocr_text = doc.get("ocr_text", "").strip()
-    filename = doc.get("metadata_storage_name", "Unknown")
-    
-    # OCR 텍스트가 있으면 우선 사용 (PDF 이미지에서 추출된 텍스트)
-    if ocr_text:
-        return ocr_text, f"{filename} (OCR)"
-    # 원본 텍스트가 있으면 사용 (텍스트 기반 PDF)
-    elif content:
-        return content, f"{filename} (원본)"
-    else:
-        return "", filename
-
 def search_and_answer(question):
     """질문에 대해 검색하고 GPT로 답변 생성"""
     print(f"\n🔍 검색 중: '{question}'")
     
-    try:
-        # Azure Search로 관련 문서 검색
-        results = search_client.search(
-            search_text=question,
-            top=3,
-            search_mode="any"
-        )
-        
-        # 검색된 문서의 내용 수집
-        contexts = []
-        sources = []
-        
-        for doc in results:
-            text, source = get_best_content(doc)
-            if text:
-                contexts.append(text)
-                sources.append(source)
-        
-        if not contexts:
-            return "❌ 질문과 관련된 문서를 찾을 수 없습니다."
-        
-        print(f"📚 {len(contexts)}개 문서에서 정보를 찾았습니다:")
-        for i, source in enumerate(sources, 1):
-            print(f"   {i}. {source}")
-        
-        # 모든 컨텍스트를 합치되, 너무 길면 자르기
-        combined_context = "\n\n".join(contexts)
-        if len(combined_context) > 8000:  # 토큰 제한을 고려하여 자르기
-            combined_context = combined_context[:8000] + "...[내용 일부 생략]"
-        
-        # GPT에게 질문과 컨텍스트 전달
-        response = openai_client.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-            messages=[
-                {
-                    "role": "system", 
-                    "content": """당신은 제공된 문서를 바탕으로 정확하고 도움이 되는 답변을 제공하는 AI 어시스턴트입니다.
-
-규칙:
-1. 제공된 문서의 내용만을 바탕으로 답변하세요
-2. 문서에 없는 내용은 추측하지 마세요  
-3. 답변할 수 없다면 솔직히 말하세요
-4. 가능한 한 구체적이고 정확한 정보를 제공하세요
-5. 한국어로 자연스럽게 답변하세요
-6. 답변의 근거가 되는 부분이 있다면 언급해주세요"""
-                },
-                {
-                    "role": "user", 
-                    "content": f"다음 문서들을 바탕으로 질문에 답변해주세요.\n\n문서 내용:\n{combined_context}\n\n질문: {question}"
-                }
-            ],
-            temperature=0.2,
-            max_tokens=1500
-        )
-        
-        answer = response.choices[0].message.content
-        return f"🤖 답변:\n{answer}\n\n📋 참고 문서: {', '.join(sources)}"
-        
-    except Exception as e:
-        return f"❌ 검색 또는 답변 생성 실패: {e}"
+    answer, sources = rag_engine.answer(search_client, openai_client, question)
+    # 답변 마감 시간(ANSWER_DEADLINE_SECONDS)을 넘기면 추출형 답변을 먼저 보여주고 LLM 답변을 끝까지 받음
+    if isinstance(answer, PendingAnswer):
+        print(f"⏳ 답변 생성이 지연되어 문서 발췌를 먼저 보여드립니다:\n{answer.text}\n")
+        answer = "".join(answer.iter_llm())
+    if not sources:
+        return answer
+    
+    print(f"📚 {len(sources)}개 문서에서 정보를 찾았습니다:")
+    for i, source in enumerate(sources, 1):
+        print(f"   {i}. {source}")
+    
+    return f"🤖 답변:\n{answer}\n\n📋 참고 문서: {', '.join(sources)}"
 
 def main():
     """메인 실행 함수"""
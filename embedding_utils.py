@@ -0,0 +1,62 @@
+"""
+임베딩 유틸리티 모듈
+Azure OpenAI 임베딩 배포를 사용해 텍스트를 정규화된 벡터로 변환합니다.
+"""
+
+import os
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def get_embedding_deployment() -> Optional[str]:
+    """임베딩 배포명 반환 (미설정 시 None)"""
+    return os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME")
+
+def get_embedding_dimensions() -> Optional[int]:
+    """요청할 임베딩 차원 수 (text-embedding-3 계열에서만 사용, 미설정 시 모델 기본값)"""
+    value = os.getenv("AZURE_OPENAI_EMBEDDING_DIMENSIONS")
+    return int(value) if value else None
+
+def is_embedding_configured() -> bool:
+    """임베딩 사용 가능 여부 확인"""
+    return bool(get_embedding_deployment())
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """코사인 유사도를 내적으로 계산할 수 있도록 행 단위 L2 정규화"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def embed_texts(openai_client, texts: List[str], batch_size: int = 16) -> np.ndarray:
+    """
+    텍스트 목록을 배치 단위로 임베딩
+
+    Returns:
+        (len(texts), dim) 크기의 L2 정규화된 float32 배열
+    """
+    deployment = get_embedding_deployment()
+    if not deployment:
+        raise RuntimeError("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME이 설정되지 않았습니다.")
+
+    dimensions = get_embedding_dimensions()
+    extra_args = {"dimensions": dimensions} if dimensions else {}
+
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        batch = [text or " " for text in texts[start:start + batch_size]]
+        response = openai_client.embeddings.create(model=deployment, input=batch, **extra_args)
+        # 응답 순서가 입력 순서와 다를 수 있으므로 index 기준으로 정렬
+        for item in sorted(response.data, key=lambda d: d.index):
+            vectors.append(item.embedding)
+
+    if not vectors:
+        return np.zeros((0, dimensions or 0), dtype=np.float32)
+
+    return normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+def embed_text(openai_client, text: str) -> np.ndarray:
+    """단일 텍스트 임베딩 (정규화된 1차원 벡터)"""
+    return embed_texts(openai_client, [text])[0]
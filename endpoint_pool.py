@@ -0,0 +1,350 @@
+"""
+Azure OpenAI 다중 엔드포인트 풀 모듈
+여러 리전의 엔드포인트/배포를 하나의 AzureOpenAI 호환 클라이언트로 묶어,
+최근 응답 지연(EWMA)과 남은 할당량(x-ratelimit-remaining-* 헤더, 없으면 로컬 추정)을 보고 호출할 엔드포인트를 고르고
+429/5xx 응답이나 엔드포인트별 마감 시간 초과 시 다음 엔드포인트로 자동 전환합니다.
+
+엔드포인트 목록은 AZURE_OPENAI_ENDPOINTS 환경변수(JSON 배열)로 설정합니다. 예:
+    [{"name": "koreacentral", "endpoint": "https://kr.openai.azure.com", "api_key_env": "AZURE_OPENAI_API_KEY_KR",
+      "deployment": "gpt-4o", "tpm": 150000},
+     {"name": "japaneast", "endpoint": "https://jp.openai.azure.com", "api_key": "...", "deployment": "gpt-4o-jp",
+      "model": "gpt-4o", "tpm": 80000}]
+model은 호출하는 쪽이 넘기는 배포명(기본값: deployment)이며, 해당 엔드포인트에서는 deployment로 바꿔 호출합니다.
+요청한 배포명을 담당하는 엔드포인트가 없으면 배포명을 바꾸지 않고 그대로 호출합니다.
+tpm/rpm(분당 토큰/요청 한도)은 남은 할당량 비율 계산에 사용하며, 응답 헤더가 있으면 헤더 값을 우선합니다.
+설정하지 않으면 기존처럼 AZURE_OPENAI_ENDPOINT 하나만 사용합니다.
+
+풀을 쓰면 재시도와 전환은 풀이 담당하므로 resilience_utils.wrap_clients는 풀을 감싸지 않고 그대로 사용합니다.
+(엔드포인트별 냉각 시간이 엔드포인트별 서킷 브레이커 역할을 함)
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+from resilience_utils import DeadlineExceeded, is_retryable, get_retry_after, get_status_code
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_VERSION = "2023-12-01-preview"
+
+# 엔드포인트 호출을 실행하는 스레드 풀 (마감 시간이 지나면 기다리지 않고 다음 엔드포인트로 넘어감)
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ENDPOINT_POOL_MAX_WORKERS", "32")),
+    thread_name_prefix="endpoint-pool"
+)
+
+def get_endpoint_timeout_seconds() -> float:
+    """엔드포인트 한 곳의 응답(스트리밍이면 첫 응답)을 기다리는 시간 (기본값: 20초)"""
+    return float(os.getenv("ENDPOINT_TIMEOUT_SECONDS", "20"))
+
+def load_endpoint_configs() -> List[Dict]:
+    """AZURE_OPENAI_ENDPOINTS 설정 읽기 (없거나 잘못되면 빈 목록)"""
+    raw = os.getenv("AZURE_OPENAI_ENDPOINTS")
+    if not raw:
+        return []
+    try:
+        configs = json.loads(raw)
+        if not isinstance(configs, list):
+            raise ValueError("JSON 배열이어야 합니다.")
+        return configs
+    except ValueError as e:
+        logger.error(f"AZURE_OPENAI_ENDPOINTS 설정 오류, 기본 엔드포인트만 사용합니다: {e}")
+        return []
+
+class PoolMember:
+    """풀에 속한 엔드포인트 하나의 클라이언트와 상태 (EWMA 지연, 할당량, 냉각 시간)"""
+
+    def __init__(self, name: str, client, deployment: Optional[str] = None, model: Optional[str] = None,
+                 embedding_deployment: Optional[str] = None, tpm: int = 0, rpm: int = 0,
+                 ewma_alpha: float = 0.3, base_cooldown: float = 2.0, max_cooldown: float = 60.0):
+        self.name = name
+        self.client = client
+        self.deployment = deployment
+        self.model = model or deployment
+        self.embedding_deployment = embedding_deployment
+        self.tpm = tpm
+        self.rpm = rpm
+        self.ewma_alpha = ewma_alpha
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        # AzureOpenAI 클라이언트는 요청별 HTTP 타임아웃을 지원 (시간 초과로 전환한 호출이 스레드 풀에 남지 않도록 함)
+        self.native_timeout = hasattr(client, "with_options")
+
+        self._lock = threading.Lock()
+        self.ewma_latency: Optional[float] = None
+        self.remaining_tokens: Optional[float] = None
+        self.remaining_requests: Optional[float] = None
+        self._quota_updated = 0.0
+        # tpm/rpm을 설정하지 않으면 응답 헤더에서 본 가장 큰 남은 토큰/요청 수를 한도로 봄
+        self._observed_limit = 0.0
+        self._observed_request_limit = 0.0
+        self._usage = deque()
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def _update_ewma(self, latency: float):
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = self.ewma_alpha * latency + (1 - self.ewma_alpha) * self.ewma_latency
+
+    def _remaining_ratio(self, limit: float, remaining: Optional[float], used: float, now: float) -> float:
+        if not limit:
+            return 1.0
+        # 응답 헤더 값이 최근 것이면 사용하고, 아니면 최근 1분 사용량으로 추정
+        if remaining is not None and now - self._quota_updated < 60:
+            refilled = (now - self._quota_updated) / 60 * limit
+            return max(0.0, min(1.0, (remaining + refilled) / limit))
+        return max(0.0, 1.0 - used / limit)
+
+    def quota_ratio(self, now: float) -> float:
+        """남은 분당 할당량 비율 (토큰/요청 중 더 부족한 쪽, 0~1, 알 수 없으면 1)"""
+        with self._lock:
+            while self._usage and now - self._usage[0][0] > 60:
+                self._usage.popleft()
+            token_ratio = self._remaining_ratio(
+                self.tpm or self._observed_limit, self.remaining_tokens,
+                sum(tokens for _, tokens in self._usage), now
+            )
+            request_ratio = self._remaining_ratio(
+                self.rpm or self._observed_request_limit, self.remaining_requests, len(self._usage), now
+            )
+            return min(token_ratio, request_ratio)
+
+    def score(self, now: float) -> float:
+        """낮을수록 우선 (지연 시간 / 남은 할당량 비율, 아직 호출한 적 없으면 0으로 먼저 시도)"""
+        latency = self.ewma_latency if self.ewma_latency is not None else 0.0
+        return latency / max(self.quota_ratio(now), 0.05)
+
+    def invoke(self, kind: str, kwargs: Dict):
+        """(결과, 응답 헤더) 반환. SDK가 with_raw_response를 지원하면 할당량 헤더도 읽음"""
+        target = self.client.chat.completions if kind == "chat" else self.client.embeddings
+        raw = getattr(target, "with_raw_response", None)
+        if raw is not None:
+            response = raw.create(**kwargs)
+            return response.parse(), response.headers
+        return target.create(**kwargs), {}
+
+    def record_success(self, latency: float, headers, tokens: int):
+        now = time.time()
+        with self._lock:
+            self._update_ewma(latency)
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.cooldown_until = 0.0
+            self._usage.append((now, tokens))
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens") if headers else None
+            remaining_requests = headers.get("x-ratelimit-remaining-requests") if headers else None
+            try:
+                if remaining_tokens is not None:
+                    self.remaining_tokens = float(remaining_tokens)
+                    self._observed_limit = max(self._observed_limit, self.remaining_tokens + tokens)
+                if remaining_requests is not None:
+                    self.remaining_requests = float(remaining_requests)
+                    self._observed_request_limit = max(self._observed_request_limit, self.remaining_requests + 1)
+                if remaining_tokens is not None or remaining_requests is not None:
+                    self._quota_updated = now
+            except ValueError:
+                pass
+
+    def record_failure(self, error: Exception, retry_after: Optional[float] = None, latency: Optional[float] = None):
+        """실패한 엔드포인트는 Retry-After(없으면 연속 실패 수에 따른 지수 증가) 동안 냉각"""
+        now = time.time()
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"[:200]
+            if latency is not None:
+                self._update_ewma(latency)
+            if get_status_code(error) == 429:
+                # 할당량 소진: 헤더가 다시 들어올 때까지 남은 할당량을 0으로 봄
+                self.remaining_tokens = 0.0
+                self.remaining_requests = 0.0
+                self._quota_updated = now
+            cooldown = retry_after or min(self.max_cooldown, self.base_cooldown * (2 ** (self.consecutive_failures - 1)))
+            self.cooldown_until = now + cooldown
+
+    def get_stats(self) -> Dict:
+        now = time.time()
+        ratio = self.quota_ratio(now)
+        with self._lock:
+            return {
+                "name": self.name,
+                "model": self.model,
+                "state": "healthy" if self.is_available(now) else "cooling",
+                "cooldown_seconds": max(0.0, self.cooldown_until - now),
+                "ewma_ms": self.ewma_latency * 1000 if self.ewma_latency is not None else None,
+                "quota_ratio": ratio if self.tpm or self.rpm or self._observed_limit or self._observed_request_limit
+                else None,
+                "successes": self.successes,
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
+class _PoolCompletions:
+    def __init__(self, pool: "EndpointPool"):
+        self._pool = pool
+
+    def create(self, **kwargs):
+        return self._pool.call("chat", kwargs)
+
+class _PoolEmbeddings:
+    def __init__(self, pool: "EndpointPool"):
+        self._pool = pool
+
+    def create(self, **kwargs):
+        return self._pool.call("embeddings", kwargs)
+
+class EndpointPool:
+    """AzureOpenAI 호환 (chat.completions.create, embeddings.create) 다중 엔드포인트 클라이언트"""
+
+    # 재시도/전환을 풀이 직접 처리함 (wrap_clients가 복원력 계층을 겹쳐 씌우지 않음)
+    handles_failover = True
+
+    def __init__(self, members: List[PoolMember], attempt_timeout: float = 20.0):
+        if not members:
+            raise ValueError("엔드포인트가 하나 이상 필요합니다.")
+        self.members = members
+        self.attempt_timeout = attempt_timeout
+        self.failovers = 0
+        self._unmatched_models = set()
+        self.chat = SimpleNamespace(completions=_PoolCompletions(self))
+        self.embeddings = _PoolEmbeddings(self)
+
+    def _candidates(self, kind: str, model: Optional[str]) -> Tuple[List[PoolMember], bool]:
+        """
+        (호출 순서, 배포명 변환 여부) 반환
+        호출 순서: 사용 가능한 엔드포인트(점수 순) → 냉각 중인 엔드포인트(냉각이 먼저 끝나는 순)
+
+        요청한 배포(model)를 담당하는 엔드포인트가 있으면 그 엔드포인트들만 사용하고,
+        하나도 없으면 모델 라우팅/성능 프로필이 고른 배포를 다른 배포로 바꾸지 않도록 요청을 그대로 보냅니다.
+        """
+        members = self.members
+        mapped = False
+        if kind == "chat" and model:
+            matched = [m for m in members if m.model == model]
+            if matched:
+                members, mapped = matched, True
+            elif model not in self._unmatched_models:
+                self._unmatched_models.add(model)
+                logger.warning(f"'{model}' 배포를 담당하는 엔드포인트가 설정되지 않아 배포명을 바꾸지 않고 호출합니다.")
+        elif kind == "embeddings":
+            mapped = True
+        now = time.time()
+        available = sorted((m for m in members if m.is_available(now)), key=lambda m: m.score(now))
+        cooling = sorted((m for m in members if not m.is_available(now)), key=lambda m: m.cooldown_until)
+        return available + cooling, mapped
+
+    def _prepare(self, member: PoolMember, kind: str, kwargs: Dict, mapped: bool) -> Dict:
+        kwargs = dict(kwargs)
+        if member.native_timeout:
+            kwargs.setdefault("timeout", self.attempt_timeout)
+        if not mapped:
+            return kwargs
+        if kind == "chat" and member.deployment:
+            kwargs["model"] = member.deployment
+        elif kind == "embeddings" and member.embedding_deployment:
+            kwargs["model"] = member.embedding_deployment
+        return kwargs
+
+    def call(self, kind: str, kwargs: Dict):
+        """가장 좋은 엔드포인트부터 호출하고, 재시도할 수 있는 오류/시간 초과면 다음 엔드포인트로 전환"""
+        last_error: Optional[Exception] = None
+        candidates, mapped = self._candidates(kind, kwargs.get("model"))
+        for position, member in enumerate(candidates):
+            if position > 0:
+                self.failovers += 1
+                logger.warning(f"OpenAI 엔드포인트 전환: {member.name} (이전 오류: {last_error})")
+            started = time.monotonic()
+            future = _executor.submit(member.invoke, kind, self._prepare(member, kind, kwargs, mapped))
+            try:
+                result, headers = future.result(timeout=self.attempt_timeout)
+            except FutureTimeoutError:
+                last_error = DeadlineExceeded(f"{member.name}: {self.attempt_timeout:.1f}초 안에 응답이 없습니다.")
+                member.record_failure(last_error, latency=self.attempt_timeout)
+                continue
+            except Exception as e:
+                if not is_retryable(e):
+                    # 요청 자체의 오류(400 등)는 다른 엔드포인트에서도 같으므로 바로 전달
+                    raise
+                last_error = e
+                member.record_failure(e, get_retry_after(e))
+                continue
+
+            usage = getattr(result, "usage", None)
+            tokens = getattr(usage, "total_tokens", None) or kwargs.get("max_tokens") or 0
+            member.record_success(time.monotonic() - started, headers, tokens)
+            return result
+
+        raise last_error or RuntimeError("사용 가능한 OpenAI 엔드포인트가 없습니다.")
+
+    def get_stats(self) -> List[Dict]:
+        return [member.get_stats() for member in self.members]
+
+def create_pool_member(config: Dict):
+    """설정 항목 하나로 PoolMember 생성 (SDK 자체 재시도는 끄고 풀이 전환을 담당)"""
+    from openai import AzureOpenAI
+
+    api_key = config.get("api_key") or os.getenv(config.get("api_key_env", "AZURE_OPENAI_API_KEY"))
+    client = AzureOpenAI(
+        api_key=api_key,
+        azure_endpoint=config["endpoint"],
+        api_version=config.get("api_version", DEFAULT_API_VERSION),
+        max_retries=0
+    )
+    return PoolMember(
+        name=config.get("name") or config["endpoint"],
+        client=client,
+        deployment=config.get("deployment"),
+        model=config.get("model"),
+        embedding_deployment=config.get("embedding_deployment"),
+        tpm=int(config.get("tpm", 0)),
+        rpm=int(config.get("rpm", 0))
+    )
+
+_pool: Optional[EndpointPool] = None
+_pool_lock = threading.Lock()
+
+def get_endpoint_pool() -> Optional[EndpointPool]:
+    """프로세스 전체에서 공유하는 엔드포인트 풀 (AZURE_OPENAI_ENDPOINTS가 없으면 None)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            configs = load_endpoint_configs()
+            if configs:
+                _pool = EndpointPool(
+                    [create_pool_member(config) for config in configs],
+                    attempt_timeout=get_endpoint_timeout_seconds()
+                )
+                logger.info(f"OpenAI 엔드포인트 풀: {', '.join(m.name for m in _pool.members)}")
+        return _pool
+
+def get_endpoint_pool_stats() -> List[Dict]:
+    """관리자 화면 표시용 엔드포인트별 상태 (풀을 쓰지 않으면 빈 목록)"""
+    return _pool.get_stats() if _pool is not None else []
+
+def create_openai_client():
+    """엔드포인트 풀이 설정되어 있으면 풀을, 아니면 AZURE_OPENAI_ENDPOINT 단일 클라이언트 반환"""
+    pool = get_endpoint_pool()
+    if pool is not None:
+        return pool
+
+    from openai import AzureOpenAI
+    return AzureOpenAI(
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_version=DEFAULT_API_VERSION
+    )
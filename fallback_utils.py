@@ -0,0 +1,82 @@
+"""
+지연 대비 추출형(extractive) 답변 유틸리티 모듈
+답변 생성이 마감 시간 안에 시작되지 않으면 검색된 문서에서 질문과 가장 관련 있는 문장을
+골라 먼저 보여주고, 나중에 도착한 LLM 답변으로 교체할 수 있도록 합니다.
+"""
+
+import os
+import math
+import itertools
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+
+from text_utils import tokenize, split_sentences
+
+EXTRACTIVE_ANSWER_HEADER = "⚡ 답변 생성이 지연되어 문서에서 찾은 관련 문장을 먼저 보여드립니다. (AI 답변이 도착하면 교체됩니다)"
+
+def get_answer_deadline_seconds() -> float:
+    """첫 답변 출력까지의 마감 시간 (초, 0이면 사용 안 함)"""
+    return float(os.getenv("ANSWER_DEADLINE_SECONDS", "0"))
+
+def build_extractive_answer(
+    question: str,
+    results: Iterable[Dict],
+    content_getter: Callable[[Dict], Tuple[str, str]],
+    max_sentences: int = 3
+) -> str:
+    """
+    검색 결과에서 질문 단어와 많이 겹치는 문장을 골라 추출형 답변 구성
+
+    문장 점수는 겹치는 질문 단어 수를 문장 길이의 제곱근으로 나눈 값이며,
+    선택된 문장은 출처와 함께 원래 검색 순서대로 표시합니다.
+    """
+    question_terms = set(tokenize(question))
+    candidates = []
+    for doc_rank, doc in enumerate(results):
+        text, source = content_getter(doc)
+        for sentence_no, sentence in enumerate(split_sentences(text)):
+            terms = tokenize(sentence)
+            if not terms:
+                continue
+            overlap = len(question_terms & set(terms))
+            if overlap:
+                candidates.append((overlap / math.sqrt(len(terms)), doc_rank, sentence_no, sentence, source))
+
+    if not candidates:
+        return f"{EXTRACTIVE_ANSWER_HEADER}\n\n관련 문장을 찾지 못했습니다. 잠시 후 다시 시도해주세요."
+
+    best = sorted(candidates, key=lambda c: c[0], reverse=True)[:max_sentences]
+    lines = [f"- {sentence} ({source})" for _, _, _, sentence, source in sorted(best, key=lambda c: (c[1], c[2]))]
+    return f"{EXTRACTIVE_ANSWER_HEADER}\n\n" + "\n".join(lines)
+
+class PendingAnswer:
+    """
+    추출형 답변을 먼저 보여주고 LLM 답변을 기다리는 결과
+
+    text는 바로 표시할 추출형 답변이며, iter_llm()은 LLM 답변 조각을 도착하는 대로 반환합니다
+    (LLM 호출이 실패하면 오류 안내 조각이 반환됨).
+    """
+
+    def __init__(self, text: str, llm_chunks: Iterator[str]):
+        self.text = text
+        self._llm_chunks = llm_chunks
+
+    def __str__(self):
+        return self.text
+
+    def iter_llm(self) -> Iterator[str]:
+        return self._llm_chunks
+
+def replace_with_llm_answer(placeholder, pending: PendingAnswer) -> str:
+    """
+    placeholder(st.empty())에 추출형 답변을 표시한 뒤, LLM 답변이 도착하면 스트리밍으로 교체
+
+    Returns:
+        최종적으로 표시된 답변 (LLM 답변이 없으면 추출형 답변)
+    """
+    placeholder.markdown(pending.text)
+    chunks = pending.iter_llm()
+    # 첫 조각이 올 때까지 추출형 답변을 유지
+    first = next(chunks, None)
+    if first is None:
+        return pending.text
+    return placeholder.write_stream(itertools.chain([first], chunks))
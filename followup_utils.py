@@ -0,0 +1,146 @@
+"""
+후속 질문(follow-up) 판별 유틸리티 모듈
+"그거 더 자세히 알려줘" 처럼 이전 답변을 가리키는 질문은 이전 턴의 검색 문서가 가장 좋은 컨텍스트이므로,
+세션에 이전 턴의 검색 결과(문서 id와 본문)를 보관해 두고 새 검색을 건너뛰거나
+이전 후보 문서 id로 범위를 좁혀 검색합니다.
+판별은 지시어/요청 표현과 새 내용어 유무만 보는 가벼운 규칙 기반입니다.
+"""
+
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+# 이전 답변/문서를 가리키는 표현
+FOLLOWUP_MARKERS = [
+    "그거", "그것", "그게", "그건", "그걸", "이거", "이것", "이게", "이건", "저거", "거기",
+    "그럼", "그러면", "그렇다면", "위에서", "위의", "앞에서", "방금", "아까", "더 자세히", "자세히",
+    "좀 더", "조금 더", "예를 들", "예시", "다시 설명", "요약해", "정리해", "그 내용", "해당 내용", "그 문서",
+    "more detail", "elaborate", "explain further", "what about", "tell me more",
+]
+
+# 내용어에서 제외할 요청/질문 표현
+_REQUEST_WORDS = {
+    "알려줘", "알려주세요", "알려", "설명해줘", "설명해주세요", "설명", "말해줘", "말해주세요", "해줘", "해주세요",
+    "주세요", "뭐야", "뭔가요", "무엇", "무엇인가요", "어떻게", "어떤", "대해", "대해서", "내용", "관련", "자세히",
+    "다시", "예시", "요약", "정리", "그럼", "그러면", "그렇다면", "방금", "아까", "위에서", "앞에서",
+    "누가", "누구", "언제", "어디", "어디서", "얼마", "얼마나", "무슨", "어느", "있나요", "되나요", "하나요",
+    "more", "detail", "details", "tell", "explain", "about", "what", "that", "this", "please",
+}
+
+# 단어 끝에서 떼어낼 조사/어미
+_SUFFIXES = sorted(
+    ["은", "는", "이", "가", "을", "를", "에", "의", "로", "으로", "에서", "도", "만", "요", "이요", "까지", "부터", "랑", "하고"],
+    key=len, reverse=True
+)
+
+_WORD_PATTERN = re.compile(r"[0-9a-z가-힣]+")
+
+def is_followup_reuse_enabled() -> bool:
+    """후속 질문 검색 재사용 여부 (기본값: 사용)"""
+    return os.getenv("ENABLE_FOLLOWUP_REUSE", "true").lower() in ("1", "true", "yes")
+
+def _normalize(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text or "").lower().split())
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+            return word[:-len(suffix)]
+    return word
+
+def _content_words(question: str) -> List[str]:
+    words = [_stem(word) for word in _WORD_PATTERN.findall(_normalize(question))]
+    return [
+        word for word in words
+        if len(word) >= 2 and word not in _REQUEST_WORDS
+        and not any(word.startswith(marker) for marker in FOLLOWUP_MARKERS if " " not in marker)
+    ]
+
+def classify_followup(question: str, previous: Optional[Dict]) -> Optional[str]:
+    """
+    이전 턴의 검색 결과를 다시 쓸 수 있는 후속 질문인지 판별
+
+    Args:
+        question: 새 질문
+        previous: 세션에 보관된 이전 턴 검색 결과 (make_retrieval_memory 결과)
+
+    Returns:
+        "reuse": 이전 답변을 가리키는 표현이 있고 새 내용어가 없음 → 이전 문서를 그대로 사용 (검색 생략)
+        "narrow": 지시어는 있지만 새 내용어가 있음 → 이전 후보 문서 id로 범위를 좁혀 검색
+        None: 새 질문 → 일반 검색
+    """
+    if not previous or not previous.get("documents"):
+        return None
+
+    normalized = _normalize(question)
+    has_marker = any(marker in normalized for marker in FOLLOWUP_MARKERS)
+    # 지시어 없이 이전 문서에 나온 단어만 쓴 짧은 질문도 새 질문일 수 있으므로 검색을 생략하지 않음
+    if not has_marker:
+        return None
+    if not get_new_words(question, previous):
+        return "reuse"
+    if previous.get("candidate_ids"):
+        return "narrow"
+    return None
+
+def get_new_words(question: str, previous: Dict) -> List[str]:
+    """이전 질문/문서 본문에 나오지 않은 질문의 내용어 (한국어 활용형에 덜 민감하도록 부분 문자열로 확인)"""
+    previous_text = previous.get("text", "")
+    return [word for word in _content_words(question) if word not in previous_text]
+
+def filter_narrowed_results(question: str, previous: Dict, results: List[Dict], content_getter, key_getter) -> List[Dict]:
+    """
+    범위를 좁힌 검색 결과 중 이전 후보 문서이면서 새 내용어를 포함한 문서만 남김
+
+    남는 문서가 없으면 이전 문서로는 답할 수 없는 새 주제이므로 빈 목록을 반환합니다
+    (호출하는 쪽에서 전체 검색으로 다시 시도).
+    """
+    allowed = set(previous.get("candidate_ids", []))
+    new_words = get_new_words(question, previous)
+    narrowed = []
+    for doc in results:
+        if key_getter(doc) not in allowed:
+            continue
+        text = _normalize(content_getter(doc)[0])
+        if not new_words or any(word in text for word in new_words):
+            narrowed.append(doc)
+    return narrowed
+
+def make_retrieval_memory(question: str, documents: List[Dict], candidate_ids: List[str],
+                          content_getter, max_text_chars: int = 20000) -> Dict:
+    """
+    다음 턴의 후속 질문 판별/재사용을 위해 세션에 보관할 검색 결과
+
+    Args:
+        documents: 컨텍스트에 사용한 최종 문서
+        candidate_ids: 재순위화 전 후보 문서 id (범위를 좁힌 검색에 사용)
+    """
+    texts = [question] + [content_getter(doc)[0] for doc in documents]
+    return {
+        "question": question,
+        "documents": [dict(doc) for doc in documents],
+        "candidate_ids": [doc_id for doc_id in candidate_ids if doc_id],
+        "text": _normalize(" ".join(texts))[:max_text_chars],
+    }
+
+def build_id_filter(ids: List[str], field: str = "id") -> str:
+    """Azure Search OData 필터: 지정한 문서 id만 검색"""
+    values = ",".join(str(doc_id).replace("'", "''") for doc_id in ids if "," not in str(doc_id))
+    return f"search.in({field}, '{values}', ',')"
+
+_ID_FILTER_PATTERN = re.compile(r"^search\.in\((\w+), '((?:[^']|'')*)', ','\)$")
+
+def parse_id_filter(search_filter: Optional[str]) -> Optional[set]:
+    """
+    build_id_filter로 만든 필터의 문서 id 집합 (로컬 인덱스에서 같은 범위로 검색할 때 사용)
+
+    Raises:
+        ValueError: 로컬 인덱스가 지원하지 않는 필터
+    """
+    if not search_filter:
+        return None
+    match = _ID_FILTER_PATTERN.match(search_filter.strip())
+    if not match:
+        raise ValueError(f"로컬 인덱스는 문서 id 필터(search.in)만 지원합니다: {search_filter}")
+    return {value.replace("''", "'") for value in match.group(2).split(",") if value}
@@ -0,0 +1,369 @@
+"""
+동시 채팅 세션 부하 테스트 CLI
+가상 사용자 N명이 관리자 화면의 채팅 흐름(대화별 세션 상태 + 이전 대화 + RAG 엔진 답변)을 동시에 반복하도록 하고,
+사용자 수를 단계적으로 늘리며 처리량, 대기(큐잉) 지연, 스레드 수, 메모리 증가를 측정해
+지연이 급격히 늘어나는 지점(knee)을 찾습니다.
+
+백엔드는 Azure 없이 스텁을 사용합니다.
+- inproc: 프로세스 안의 검색/OpenAI 스텁 (가장 가벼움)
+- http: OpenAI는 stub_server.py의 HTTP 스텁 서버에 실제 openai SDK로 호출 (연결 풀/직렬화 비용 포함)
+지연은 고정값 또는 분포(uniform:0.1,0.5 / lognormal:0.3,0.5 / normal:0.3,0.1)로 지정하고,
+--openai-capacity로 동시에 처리할 수 있는 OpenAI 호출 수를 제한해 할당량이 정해진 배포를 흉내 냅니다.
+
+사용법:
+    python load_test.py --users 1,2,4,8,16,32 --stage-seconds 20 --openai-latency lognormal:0.8,0.4
+    python load_test.py --backend http --users 4,16,64 --openai-capacity 8 --output load.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from fallback_utils import PendingAnswer
+from rag_engine import create_rag_engine
+from resilience_utils import wrap_clients
+from stub_clients import LatencyDistribution, StubOpenAIClient, StubSearchClient, load_stub_documents
+from telemetry_utils import percentile, telemetry_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUESTIONS = [
+    "휴가 신청 방법은?",
+    "연차 휴가는 어디서 신청하나요?",
+    "출장비는 언제까지 정산하나요?",
+    "숙박비 상한액은 어떻게 되나요?",
+    "사무실은 몇 시에 여나요?",
+    "주말에 사무실 출입하려면?",
+]
+FOLLOWUP_QUESTIONS = ["그거 더 자세히 알려줘", "예시를 들어줘"]
+
+# 서비스 시간으로 보는 단계 (나머지는 스레드/락/할당량 대기 등 큐잉 지연)
+SERVICE_STAGES = ["cache_lookup", "retrieve", "rerank", "context", "route", "cache_store"]
+
+class CapacityLimiter:
+    """백엔드가 동시에 처리할 수 있는 호출 수 제한 (0이면 제한 없음), 슬롯 대기 시간을 기록"""
+
+    def __init__(self, capacity: int = 0):
+        self.capacity = capacity
+        self._semaphore = threading.BoundedSemaphore(capacity) if capacity > 0 else None
+        self._local = threading.local()
+
+    def __enter__(self):
+        started = time.perf_counter()
+        if self._semaphore is not None:
+            self._semaphore.acquire()
+        self._local.wait = getattr(self._local, "wait", 0.0) + time.perf_counter() - started
+        return self
+
+    def __exit__(self, *exc):
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def pop_wait(self) -> float:
+        """현재 스레드가 지금까지 기다린 시간 (초), 읽으면 초기화"""
+        wait = getattr(self._local, "wait", 0.0)
+        self._local.wait = 0.0
+        return wait
+
+class _LimitedCompletions:
+    def __init__(self, target, limiter: CapacityLimiter):
+        self._target = target
+        self._limiter = limiter
+
+    def create(self, **kwargs):
+        with self._limiter:
+            response = self._target.create(**kwargs)
+            if not kwargs.get("stream"):
+                return response
+            # 스트리밍은 응답을 끝까지 받을 때까지 슬롯을 점유
+            return list(response)
+
+class LimitedOpenAIClient:
+    """OpenAI 클라이언트의 동시 호출 수를 제한하는 래퍼 (chat.completions / embeddings)"""
+
+    def __init__(self, client, limiter: CapacityLimiter):
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = _LimitedCompletions(client.chat.completions, limiter)
+        self.embeddings = _LimitedCompletions(client.embeddings, limiter)
+
+class LimitedSearchClient:
+    """검색 클라이언트의 동시 호출 수를 제한하는 래퍼"""
+
+    def __init__(self, client, limiter: CapacityLimiter):
+        self._client = client
+        self._limiter = limiter
+
+    def search(self, *args, **kwargs):
+        with self._limiter:
+            return self._client.search(*args, **kwargs)
+
+def get_rss_bytes() -> Optional[int]:
+    """현재 프로세스의 상주 메모리 (Linux /proc 기준, 알 수 없으면 최대 사용량)"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+    except Exception:
+        return None
+
+class LoadTest:
+    """가상 사용자들이 생각 시간(think time)을 두고 질문을 반복하는 부하 생성기"""
+
+    def __init__(self, engine, search_client, openai_client, questions: List[str],
+                 think_time: LatencyDistribution, followup_rate: float = 0.2, stream: bool = False,
+                 limiters: Optional[List[CapacityLimiter]] = None, index_name: str = "loadtest-index"):
+        self.engine = engine
+        self.search_client = search_client
+        self.openai_client = openai_client
+        self.questions = questions
+        self.think_time = think_time
+        self.followup_rate = followup_rate
+        self.stream = stream
+        self.limiters = limiters or []
+        self.index_name = index_name
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._records: List[Dict] = []
+        # 사용자 스레드에서 처음 기록되는 단계로 RAGRequest를 넘겨받음
+        # (스트리밍 답변을 여러 세션이 함께 받을 때는 total이 공유 스레드에서 기록되므로 total을 기다리지 않음)
+        engine.add_timing_hook(self._capture)
+
+    def _capture(self, stage: str, elapsed_ms: float, request):
+        if getattr(self._local, "request", None) is None:
+            self._local.request = request
+
+    def _ask(self, user_id: int, session: Dict, history: List[Dict], question: str) -> Dict:
+        self._local.request = None
+        for limiter in self.limiters:
+            limiter.pop_wait()
+        started = time.perf_counter()
+        error = None
+        try:
+            answer, sources = self.engine.answer(
+                self.search_client, self.openai_client, question,
+                index_name=self.index_name, stream=self.stream,
+                retrieval_mode="keyword", chatbot_name=f"loadtest-{user_id % 4}",
+                session=session, history=history
+            )
+            if isinstance(answer, PendingAnswer):
+                answer = "".join(answer.iter_llm())
+            elif self.stream:
+                answer = "".join(answer)
+        except Exception as e:
+            answer, error = "", str(e)
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        request = self._local.request
+        timings = request.timings if request is not None else {}
+        service_ms = sum(timings.get(stage, 0.0) for stage in SERVICE_STAGES)
+        service_ms += timings.get("generate_stream", timings.get("generate", 0.0))
+        backend_wait_ms = sum(limiter.pop_wait() for limiter in self.limiters) * 1000
+        rate_limit_wait_ms = (request.rate_limit_wait * 1000) if request is not None else 0.0
+        history.extend([{"role": "user", "content": question}, {"role": "assistant", "content": answer}])
+        return {
+            "latency_ms": latency_ms,
+            # 단계 안에서 기다린 시간(백엔드 슬롯, 할당량) + 단계 밖에서 보낸 시간(스레드 풀/락 대기 등)
+            "queue_ms": backend_wait_ms + rate_limit_wait_ms + max(0.0, latency_ms - service_ms),
+            "backend_wait_ms": backend_wait_ms,
+            "rate_limit_wait_ms": rate_limit_wait_ms,
+            "cache_hit": bool(request and request.cache_hit),
+            "error": error or (request.error if request is not None else None),
+        }
+
+    def _user_loop(self, user_id: int, stop: threading.Event, seed: int):
+        rng = random.Random(seed)
+        session: Dict = {}
+        history: List[Dict] = []
+        while not stop.is_set():
+            if history and rng.random() < self.followup_rate:
+                question = rng.choice(FOLLOWUP_QUESTIONS)
+            else:
+                question = rng.choice(self.questions)
+            record = self._ask(user_id, session, history, question)
+            if not stop.is_set():
+                with self._lock:
+                    self._records.append(record)
+            # 대화가 길어지면 새 대화 시작 (채팅 기록 삭제와 같음)
+            if len(history) > 20:
+                session, history = {}, []
+            stop.wait(self.think_time.sample())
+
+    def run_stage(self, users: int, seconds: float) -> Dict:
+        """사용자 users명으로 seconds초 동안 실행하고 단계 결과 반환"""
+        with self._lock:
+            self._records = []
+        rss_before = get_rss_bytes()
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._user_loop, args=(i, stop, i * 7919 + users), name=f"load-user-{i}", daemon=True)
+            for i in range(users)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        max_threads = threading.active_count()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            time.sleep(min(0.5, max(0.0, deadline - time.perf_counter())))
+            max_threads = max(max_threads, threading.active_count())
+        stop.set()
+        elapsed = time.perf_counter() - started
+        for thread in threads:
+            thread.join(timeout=30)
+
+        with self._lock:
+            records = list(self._records)
+        ok = [r for r in records if not r["error"]]
+        latencies = [r["latency_ms"] for r in ok]
+        queue_delays = [r["queue_ms"] for r in ok]
+        rss_after = get_rss_bytes()
+        return {
+            "users": users,
+            "requests": len(records),
+            "errors": len(records) - len(ok),
+            "throughput_rps": len(records) / elapsed if elapsed > 0 else 0.0,
+            "latency_p50_ms": percentile(latencies, 50),
+            "latency_p95_ms": percentile(latencies, 95),
+            "latency_p99_ms": percentile(latencies, 99),
+            "queue_p50_ms": percentile(queue_delays, 50),
+            "queue_p95_ms": percentile(queue_delays, 95),
+            "backend_wait_p95_ms": percentile([r["backend_wait_ms"] for r in ok], 95),
+            "rate_limit_wait_p95_ms": percentile([r["rate_limit_wait_ms"] for r in ok], 95),
+            "cache_hit_rate": sum(1 for r in ok if r["cache_hit"]) / len(ok) if ok else None,
+            "max_threads": max_threads,
+            "rss_mb": rss_after / 1024 / 1024 if rss_after else None,
+            "rss_growth_mb": (rss_after - rss_before) / 1024 / 1024 if rss_after and rss_before else None,
+        }
+
+def find_knee(stages: List[Dict], min_gain: float = 0.1) -> Optional[Dict]:
+    """사용자를 늘려도 처리량이 min_gain 이상 늘지 않고 p95 지연만 늘어나기 시작한 단계"""
+    for previous, current in zip(stages, stages[1:]):
+        if not previous["throughput_rps"] or previous["latency_p95_ms"] is None or current["latency_p95_ms"] is None:
+            continue
+        gain = current["throughput_rps"] / previous["throughput_rps"] - 1
+        if gain < min_gain and current["latency_p95_ms"] > previous["latency_p95_ms"]:
+            return previous
+    return None
+
+def _format(value, digits: int = 0) -> str:
+    return "-" if value is None else f"{value:,.{digits}f}"
+
+def print_stage(stage: Dict):
+    print(
+        f"{stage['users']:>6} {stage['requests']:>7} {stage['errors']:>5} {_format(stage['throughput_rps'], 2):>9} "
+        f"{_format(stage['latency_p50_ms']):>8} {_format(stage['latency_p95_ms']):>8} {_format(stage['latency_p99_ms']):>8} "
+        f"{_format(stage['queue_p50_ms']):>8} {_format(stage['queue_p95_ms']):>8} {stage['max_threads']:>7} "
+        f"{_format(stage['rss_mb'], 1):>8} {_format(stage['rss_growth_mb'], 1):>8}"
+    )
+
+def create_backend(args):
+    """부하 테스트용 (검색, OpenAI) 클라이언트와 동시 호출 제한기, 종료 함수 생성"""
+    search_client = StubSearchClient(load_stub_documents(args.docs), latency_seconds=args.search_latency)
+    stop = lambda: None
+    if args.backend == "http":
+        from openai import AzureOpenAI
+        from stub_server import StubOpenAIServer
+
+        server = StubOpenAIServer(latency_seconds=args.openai_latency, token_latency_seconds=args.token_latency).start()
+        openai_client = AzureOpenAI(api_key="load-test", azure_endpoint=server.url, api_version="2024-02-01",
+                                    max_retries=0)
+        stop = server.stop
+    else:
+        openai_client = StubOpenAIClient(latency_seconds=args.openai_latency, token_latency_seconds=args.token_latency)
+
+    # 복원력 계층은 헤지 요청을 별도 스레드에서 보내므로, 대기 시간이 사용자 스레드에 기록되도록 바깥에서 제한
+    search_client, openai_client = wrap_clients(search_client, openai_client)
+    search_limiter = CapacityLimiter(args.search_capacity)
+    openai_limiter = CapacityLimiter(args.openai_capacity)
+    search_client = LimitedSearchClient(search_client, search_limiter)
+    openai_client = LimitedOpenAIClient(openai_client, openai_limiter)
+    return search_client, openai_client, [search_limiter, openai_limiter], stop
+
+def main():
+    parser = argparse.ArgumentParser(description="동시 채팅 세션 부하 테스트")
+    parser.add_argument("--users", default="1,2,4,8,16,32", help="단계별 동시 사용자 수 (쉼표로 구분)")
+    parser.add_argument("--stage-seconds", type=float, default=15.0, help="단계별 실행 시간 (초)")
+    parser.add_argument("--backend", choices=["inproc", "http"], default="inproc")
+    parser.add_argument("--search-latency", default="uniform:0.02,0.08", help="검색 지연 (초 또는 분포)")
+    parser.add_argument("--openai-latency", default="lognormal:0.5,0.4", help="OpenAI 응답 지연 (초 또는 분포)")
+    parser.add_argument("--token-latency", default="0", help="스트리밍 조각 사이 지연 (초 또는 분포)")
+    parser.add_argument("--think-time", default="uniform:0.5,2.0", help="사용자 질문 사이 생각 시간 (초 또는 분포)")
+    parser.add_argument("--openai-capacity", type=int, default=0, help="동시에 처리되는 OpenAI 호출 수 (0이면 무제한)")
+    parser.add_argument("--search-capacity", type=int, default=0, help="동시에 처리되는 검색 호출 수 (0이면 무제한)")
+    parser.add_argument("--followup-rate", type=float, default=0.2, help="후속 질문 비율")
+    parser.add_argument("--stream", action="store_true", help="스트리밍 응답 사용")
+    parser.add_argument("--cache", action="store_true", help="답변 캐시 사용 (기본값: 사용 안 함)")
+    parser.add_argument("--questions", help="질문 목록 파일 (한 줄에 하나)")
+    parser.add_argument("--docs", help="스텁 문서 폴더 (없으면 샘플 문서)")
+    parser.add_argument("--output", help="단계별 결과를 저장할 JSON 파일")
+    args = parser.parse_args()
+
+    load_dotenv()
+    try:
+        users = [int(u) for u in args.users.split(",") if u.strip()]
+        for spec in (args.search_latency, args.openai_latency, args.token_latency, args.think_time):
+            LatencyDistribution.parse(spec)
+    except ValueError as e:
+        parser.error(str(e))
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()] or DEFAULT_QUESTIONS
+
+    search_client, openai_client, limiters, stop_backend = create_backend(args)
+    engine = create_rag_engine(use_cache=args.cache)
+    load_test = LoadTest(
+        engine, search_client, openai_client, questions,
+        think_time=LatencyDistribution.parse(args.think_time),
+        followup_rate=args.followup_rate, stream=args.stream, limiters=limiters
+    )
+
+    print(f"🏋️ 부하 테스트: 사용자 {users}, 단계별 {args.stage_seconds:g}초, 백엔드 {args.backend} "
+          f"(검색 {LatencyDistribution.parse(args.search_latency)!r}, OpenAI {LatencyDistribution.parse(args.openai_latency)!r}, "
+          f"OpenAI 동시 처리 {args.openai_capacity or '무제한'})")
+    print(f"{'사용자':>6} {'요청':>7} {'오류':>5} {'요청/초':>9} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'큐p50':>8} {'큐p95':>8} {'스레드':>7} {'RSS MB':>8} {'증가 MB':>8}")
+
+    stages = []
+    try:
+        for count in users:
+            stage = load_test.run_stage(count, args.stage_seconds)
+            stages.append(stage)
+            print_stage(stage)
+    except KeyboardInterrupt:
+        print("\n⏹️ 중단되었습니다.")
+    finally:
+        stop_backend()
+        telemetry_store.flush()
+
+    knee = find_knee(stages)
+    if knee is not None:
+        print(f"⚠️ 처리량 증가가 멈추고 지연이 늘기 시작한 지점: 사용자 약 {knee['users']}명 "
+              f"({knee['throughput_rps']:.2f} 요청/초, p95 {knee['latency_p95_ms']:.0f}ms)")
+    elif stages:
+        print("✅ 측정한 범위에서는 처리량이 계속 늘었습니다. 더 많은 사용자로 실행해보세요.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "stages": stages,
+                       "knee_users": knee["users"] if knee else None}, f, ensure_ascii=False, indent=2)
+        print(f"📝 결과 저장: {args.output}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,162 @@
+"""
+질문별 모델(배포) 라우팅 모듈
+"몇 시에 열어요?" 같은 짧은 사실 질문은 작고 빠른 배포로, 여러 문서를 종합해야 하는 질문은
+큰 배포로 보내고 max_tokens도 배포 등급에 맞게 제한합니다.
+판단 기준은 질문 길이, 구성된 컨텍스트 크기, 검색 신뢰도(재순위화 점수)와 종합 요청 표현입니다.
+
+배포 목록은 AZURE_OPENAI_DEPLOYMENTS 환경변수(JSON 배열)로 설정합니다. 예:
+    [{"name": "gpt-4o-mini", "tier": "small", "max_tokens": 400, "cost_per_1k_tokens": 0.15},
+     {"name": "gpt-4o", "tier": "large", "max_tokens": 1500, "cost_per_1k_tokens": 2.5, "tpm": 150000}]
+rpm/tpm을 지정하면 그 배포의 속도 제한(rate_limiter) 한도로 사용합니다.
+설정하지 않으면 기존처럼 AZURE_OPENAI_DEPLOYMENT_NAME 하나만 사용합니다.
+"""
+
+import os
+import json
+import logging
+from typing import Dict, List, Optional
+
+from context_utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+TIERS = ["small", "medium", "large"]
+
+# 여러 문서를 비교/종합해야 하는 질문 표현
+SYNTHESIS_MARKERS = [
+    "비교", "차이", "장단점", "정리", "요약", "종합", "전체", "모두", "각각", "분석", "왜", "이유", "절차 전체",
+    "compare", "difference", "summarize", "overview", "why",
+]
+
+class Deployment:
+    """라우팅 대상 채팅 배포"""
+
+    def __init__(self, name: str, tier: str = "large", max_tokens: int = 1500, cost_per_1k_tokens: float = 0.0,
+                 rpm: int = 0, tpm: int = 0):
+        if tier not in TIERS:
+            raise ValueError(f"알 수 없는 배포 등급: {tier} (사용 가능: {', '.join(TIERS)})")
+        self.name = name
+        self.tier = tier
+        self.max_tokens = max_tokens
+        self.cost_per_1k_tokens = cost_per_1k_tokens
+        # 배포별 분당 요청/토큰 한도 (0이면 OPENAI_RPM_LIMIT/OPENAI_TPM_LIMIT 사용)
+        self.rpm = rpm
+        self.tpm = tpm
+
+    def estimate_cost(self, tokens: int) -> float:
+        return tokens / 1000 * self.cost_per_1k_tokens
+
+class RoutingDecision:
+    """라우팅 결과 (선택한 배포, max_tokens, 판단 근거)"""
+
+    def __init__(self, deployment: Deployment, baseline: Deployment, reason: str, features: Dict):
+        self.deployment = deployment
+        self.baseline = baseline
+        self.reason = reason
+        self.features = features
+
+    @property
+    def max_tokens(self) -> int:
+        return self.deployment.max_tokens
+
+    def estimate_costs(self, total_tokens: int) -> Dict[str, float]:
+        """선택한 배포 비용과 항상 가장 큰 배포를 썼을 때의 비용"""
+        return {
+            "cost": self.deployment.estimate_cost(total_tokens),
+            "baseline_cost": self.baseline.estimate_cost(total_tokens),
+        }
+
+def load_deployments() -> List[Deployment]:
+    """AZURE_OPENAI_DEPLOYMENTS 설정 읽기 (없거나 잘못되면 AZURE_OPENAI_DEPLOYMENT_NAME 하나)"""
+    raw = os.getenv("AZURE_OPENAI_DEPLOYMENTS")
+    if raw:
+        try:
+            return [Deployment(**item) for item in json.loads(raw)]
+        except (ValueError, TypeError) as e:
+            logger.error(f"AZURE_OPENAI_DEPLOYMENTS 설정 오류, 기본 배포만 사용합니다: {e}")
+    return [Deployment(os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"), "large", 1500)]
+
+class ModelRouter:
+    """
+    질문 특성에 따라 배포 등급을 고르는 규칙 기반 라우터
+
+    - large: 종합 요청 표현, 긴 질문, 큰 컨텍스트(여러 문서), 낮은 검색 신뢰도
+    - small: 짧은 질문 + 작은 컨텍스트 + 높은 검색 신뢰도
+    - medium: 그 외
+    설정에 해당 등급 배포가 없으면 한 단계 큰 배포를 사용합니다.
+    """
+
+    def __init__(self, deployments: List[Deployment], small_question_tokens: int = 25,
+                 small_context_tokens: int = 1500, large_question_tokens: int = 80,
+                 large_context_tokens: int = 3000, min_confidence: float = 0.35,
+                 small_confidence: float = 0.5):
+        self.deployments = sorted(deployments, key=lambda d: TIERS.index(d.tier))
+        self.small_question_tokens = small_question_tokens
+        self.small_context_tokens = small_context_tokens
+        self.large_question_tokens = large_question_tokens
+        self.large_context_tokens = large_context_tokens
+        self.min_confidence = min_confidence
+        self.small_confidence = small_confidence
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.deployments) > 1
+
+    def _pick(self, tier: str) -> Deployment:
+        for deployment in self.deployments:
+            if TIERS.index(deployment.tier) >= TIERS.index(tier):
+                return deployment
+        return self.deployments[-1]
+
+    def route(self, question: str, context: Optional[Dict], documents: List[Dict],
+              model: Optional[str] = None) -> RoutingDecision:
+        """
+        Args:
+            question: 사용자 질문
+            context: pack_context 결과 (tokens_used, sources)
+            documents: 컨텍스트 구성에 사용한 검색 결과 (재순위화 점수 @rerank.score 가 있으면 신뢰도로 사용)
+        """
+        context = context or {}
+        question_tokens = count_tokens(question, model)
+        context_tokens = context.get("tokens_used") or 0
+        source_count = len(context.get("sources") or [])
+        scores = [doc["@rerank.score"] for doc in documents if doc.get("@rerank.score") is not None]
+        confidence = max(scores) if scores else None
+        lowered = (question or "").lower()
+        synthesis = any(marker in lowered for marker in SYNTHESIS_MARKERS)
+
+        features = {
+            "question_tokens": question_tokens,
+            "context_tokens": context_tokens,
+            "sources": source_count,
+            "confidence": round(confidence, 3) if confidence is not None else None,
+            "synthesis": synthesis,
+        }
+
+        if synthesis:
+            tier, reason = "large", "종합 요청"
+        elif question_tokens > self.large_question_tokens:
+            tier, reason = "large", "긴 질문"
+        elif context_tokens > self.large_context_tokens and source_count >= 3:
+            tier, reason = "large", "여러 문서의 큰 컨텍스트"
+        elif confidence is not None and confidence < self.min_confidence:
+            tier, reason = "large", "낮은 검색 신뢰도"
+        elif (question_tokens <= self.small_question_tokens and context_tokens <= self.small_context_tokens
+              and (confidence is None or confidence >= self.small_confidence)):
+            tier, reason = "small", "짧은 사실 질문"
+        else:
+            tier, reason = "medium", "일반 질문"
+
+        return RoutingDecision(self._pick(tier), self.deployments[-1], reason, features)
+
+def create_model_router() -> ModelRouter:
+    """환경변수 설정으로 라우터 생성 (임계값은 ROUTER_* 로 조정)"""
+    return ModelRouter(
+        load_deployments(),
+        small_question_tokens=int(os.getenv("ROUTER_SMALL_QUESTION_TOKENS", "25")),
+        small_context_tokens=int(os.getenv("ROUTER_SMALL_CONTEXT_TOKENS", "1500")),
+        large_question_tokens=int(os.getenv("ROUTER_LARGE_QUESTION_TOKENS", "80")),
+        large_context_tokens=int(os.getenv("ROUTER_LARGE_CONTEXT_TOKENS", "3000")),
+        min_confidence=float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.35")),
+        small_confidence=float(os.getenv("ROUTER_SMALL_CONFIDENCE", "0.5"))
+    )
@@ -0,0 +1,103 @@
+"""
+챗봇별 성능 프로필 모듈
+검색 문서 수(top), 컨텍스트 토큰 예산, temperature, max_tokens, 검색 모드(search_mode), 채팅 배포를
+챗봇마다 다르게 설정해, 트래픽이 많은 FAQ 챗봇은 빠르고 짧게, 긴 규정 문서 챗봇은 깊게 답하도록 조정합니다.
+프로필은 chatbots 테이블의 performance_profile 컬럼(JSON)에 저장되며, 설정하지 않은 항목은 전역 기본값을 따릅니다.
+"""
+
+import json
+import logging
+from typing import Dict, Optional
+
+from context_utils import get_context_token_budget
+from retrieval_utils import get_search_top_k
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODES = {
+    "any": "any (단어 중 하나라도 포함)",
+    "all": "all (모든 단어 포함)",
+}
+
+# 항목별 (형식, 최솟값, 최댓값, 설명)
+PROFILE_FIELDS = {
+    "top": (int, 1, 50, "검색 문서 수"),
+    "context_tokens": (int, 200, 32000, "컨텍스트 토큰 예산"),
+    "temperature": (float, 0.0, 2.0, "temperature"),
+    "max_tokens": (int, 50, 4096, "최대 답변 토큰"),
+}
+
+# 프로필이 없을 때 답변 생성에 쓰는 값 (ChatGenerator 기본값)
+DEFAULT_TEMPERATURE = 0.2
+DEFAULT_MAX_TOKENS = 1500
+
+def get_global_defaults() -> Dict:
+    """프로필 항목별 전역 기본값 (환경변수 설정 반영)"""
+    return {
+        "top": get_search_top_k(),
+        "context_tokens": get_context_token_budget(),
+        "temperature": DEFAULT_TEMPERATURE,
+        "max_tokens": DEFAULT_MAX_TOKENS,
+    }
+
+class PerformanceProfile:
+    """챗봇별 성능 프로필 (None인 항목은 전역 기본값 사용)"""
+
+    def __init__(self, top: Optional[int] = None, context_tokens: Optional[int] = None,
+                 temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                 search_mode: Optional[str] = None, deployment: Optional[str] = None):
+        values = {"top": top, "context_tokens": context_tokens, "temperature": temperature, "max_tokens": max_tokens}
+        for field, value in values.items():
+            if value is None:
+                continue
+            kind, minimum, maximum, label = PROFILE_FIELDS[field]
+            value = kind(value)
+            if not minimum <= value <= maximum:
+                raise ValueError(f"{label}({field})는 {minimum}~{maximum} 범위여야 합니다: {value}")
+            values[field] = value
+        if search_mode is not None and search_mode not in SEARCH_MODES:
+            raise ValueError(f"알 수 없는 검색 모드: {search_mode} (사용 가능: {', '.join(SEARCH_MODES)})")
+
+        self.top = values["top"]
+        self.context_tokens = values["context_tokens"]
+        self.temperature = values["temperature"]
+        self.max_tokens = values["max_tokens"]
+        self.search_mode = search_mode
+        # 지정하면 모델 라우터를 거치지 않고 이 배포로 답변 생성
+        self.deployment = deployment or None
+
+    def to_dict(self) -> Dict:
+        """설정된 항목만 담은 딕셔너리"""
+        values = {
+            "top": self.top, "context_tokens": self.context_tokens, "temperature": self.temperature,
+            "max_tokens": self.max_tokens, "search_mode": self.search_mode, "deployment": self.deployment,
+        }
+        return {key: value for key, value in values.items() if value is not None}
+
+    def to_json(self) -> Optional[str]:
+        """DB 저장용 JSON (설정된 항목이 없으면 None)"""
+        values = self.to_dict()
+        return json.dumps(values, sort_keys=True, ensure_ascii=False) if values else None
+
+    @property
+    def is_default(self) -> bool:
+        return not self.to_dict()
+
+    @classmethod
+    def from_json(cls, raw: Optional[str]) -> "PerformanceProfile":
+        """DB의 JSON 문자열로 프로필 생성 (비어 있거나 잘못되었으면 기본 프로필)"""
+        if not raw or not isinstance(raw, str):
+            return cls()
+        try:
+            values = json.loads(raw)
+            return cls(**{key: value for key, value in values.items() if key in cls._fields()})
+        except (ValueError, TypeError) as e:
+            logger.error(f"성능 프로필 설정 오류, 기본값을 사용합니다: {e}")
+            return cls()
+
+    @staticmethod
+    def _fields():
+        return list(PROFILE_FIELDS) + ["search_mode", "deployment"]
+
+# 프로필을 지정하지 않은 요청이 사용하는 기본 프로필
+DEFAULT_PROFILE = PerformanceProfile()
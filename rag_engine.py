@@ -0,0 +1,691 @@
+"""
+RAG 엔진 모듈
+관리자 화면, 팝업 챗봇, CLI가 함께 사용하는 검색 + 답변 생성 경로입니다.
+캐시 → 검색 → 재순위화 → 컨텍스트 구성 → 답변 생성 단계를 교체 가능한 객체로 구성하고,
+모든 단계의 소요 시간을 같은 타이밍 훅으로 보고합니다.
+
+사용 예:
+    engine = create_rag_engine()
+    answer, sources = engine.answer(search_client, openai_client, "휴가 신청 방법", index_name="guide-index")
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from cache_utils import answer_cache, semantic_cache, normalize_question
+from coalescing_utils import Flight, single_flight, is_coalescing_enabled, get_coalesce_timeout_seconds
+from context_utils import pack_context, count_tokens
+from embedding_utils import embed_text, is_embedding_configured
+from rate_limiter import rate_limiter, estimate_request_tokens
+from conversation_memory import conversation_memory, is_conversation_memory_enabled
+from model_router import ModelRouter, create_model_router
+from profile_utils import DEFAULT_PROFILE, DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, PerformanceProfile
+from fallback_utils import PendingAnswer, build_extractive_answer, get_answer_deadline_seconds
+from rerank_utils import is_rerank_enabled, get_rerank_candidates, rerank_documents
+from retrieval_utils import get_search_top_k, retrieve_documents, get_document_key
+from followup_utils import (
+    classify_followup, filter_narrowed_results, make_retrieval_memory, build_id_filter, is_followup_reuse_enabled
+)
+from streaming_utils import iter_completion_text, iter_static_text
+from telemetry_utils import telemetry_hook
+from traffic_capture import capture_hook
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = """당신은 제공된 문서를 바탕으로 정확하고 도움이 되는 답변을 제공하는 AI 어시스턴트입니다.
+
+규칙:
+1. 제공된 문서의 내용만을 바탕으로 답변하세요
+2. 문서에 없는 내용은 추측하지 마세요
+3. 답변할 수 없다면 솔직히 말하세요
+4. 가능한 한 구체적이고 정확한 정보를 제공하세요
+5. 한국어로 자연스럽게 답변하세요
+6. 답변의 근거가 되는 부분이 있다면 언급해주세요"""
+
+NO_DOCUMENTS_MESSAGE = "❌ 질문과 관련된 문서를 찾을 수 없습니다."
+
+_STREAM_END = object()
+
+# 마감 시간 모드에서 답변 생성을 백그라운드로 실행하는 스레드 풀
+_generation_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("GENERATION_MAX_WORKERS", "16")),
+    thread_name_prefix="generation"
+)
+
+def get_chat_deployment() -> Optional[str]:
+    """답변 생성에 사용할 채팅 배포명"""
+    return os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+
+def get_best_content(doc: Dict) -> Tuple[str, str]:
+    """문서에서 가장 좋은 텍스트 내용과 출처를 반환 (OCR 텍스트 우선)"""
+    content = (doc.get("content") or "").strip()
+    ocr_text = (doc.get("ocr_text") or "").strip()
+    filename = doc.get("metadata_storage_name", "Unknown")
+
+    # 구간 인덱스 문서는 페이지 정보를 출처에 포함
+    if doc.get("page"):
+        filename = f"{filename} p.{doc['page']}"
+
+    if ocr_text:
+        return ocr_text, f"{filename} (OCR)"
+    elif content:
+        return content, f"{filename} (원본)"
+    else:
+        return "", filename
+
+class RAGRequest:
+    """한 번의 질문 처리에 필요한 입력과 단계별 결과/소요 시간"""
+
+    def __init__(self, search_client, openai_client, question: str, index_name: Optional[str] = None,
+                 index_version: int = 0, stream: bool = False, retrieval_mode: str = "keyword",
+                 chatbot_name: Optional[str] = None, session: Optional[Dict] = None,
+                 history: Optional[List[Dict]] = None, profile: Optional[PerformanceProfile] = None):
+        self.search_client = search_client
+        self.openai_client = openai_client
+        self.question = question
+        self.index_name = index_name
+        self.index_version = index_version
+        self.stream = stream
+        self.retrieval_mode = retrieval_mode
+        self.chatbot_name = chatbot_name or index_name
+        # 챗봇별 성능 프로필 (설정하지 않은 항목은 각 단계의 기본값 사용)
+        self.profile = profile or DEFAULT_PROFILE
+        # 대화(채팅 키)별로 유지되는 상태 (이전 턴 검색 결과 등, 없으면 단발 질문)
+        self.session = session
+        # 현재 질문 이전의 대화 기록 ({"role", "content"} 목록)
+        self.history = history or []
+        # 후속 질문 처리 방식 (None, "reuse", "narrow")
+        self.followup: Optional[str] = None
+        self.search_filter: Optional[str] = None
+        self.question_embedding = None
+        self.context: Optional[Dict] = None
+        self.messages: List[Dict] = []
+        self.timings: Dict[str, float] = {}
+        # 텔레메트리용 결과 정보
+        self.cache_hit = False
+        self.coalesced = False
+        self.fallback_used = False
+        self.hit_count = 0
+        # 컨텍스트 구성에 사용한 최종 문서 id (트래픽 캡처/비교용)
+        self.document_ids: List[str] = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # 모델 라우팅 결과 (라우터를 쓰지 않으면 None)와 실제 사용한 배포
+        self.route = None
+        self.deployment: Optional[str] = None
+        self.rate_limit_tokens = 0
+        self.rate_limit_wait = 0.0
+        self.error: Optional[str] = None
+        # 스트리밍 답변을 끝까지 받지 않고 중단함 (세션 종료, 화면 이동 등)
+        self.aborted = False
+
+    def is_shareable(self) -> bool:
+        """
+        답변을 다른 대화와 공유(답변 캐시, 같은 질문 합치기)할 수 있는지
+        (후속 질문이거나 이전 대화가 프롬프트에 포함되면 대화마다 답변이 달라지므로 공유하지 않음)
+        """
+        return not self.followup and not (self.history and is_conversation_memory_enabled())
+
+class AnswerCacheStage:
+    """정확히 같은 질문(답변 캐시)과 표현만 다른 질문(시맨틱 캐시)의 답변 재사용"""
+
+    def __init__(self, exact_cache=answer_cache, semantic=semantic_cache):
+        self.exact_cache = exact_cache
+        self.semantic_cache = semantic
+
+    def lookup(self, request: RAGRequest) -> Optional[Tuple[str, List[str]]]:
+        if not request.index_name:
+            return None
+
+        cached = self.exact_cache.get(request.index_name, request.index_version, request.question)
+        if cached:
+            return cached
+
+        if self.semantic_cache is not None and is_embedding_configured():
+            try:
+                request.question_embedding = embed_text(request.openai_client, request.question)
+                return self.semantic_cache.get(request.index_name, request.index_version, request.question_embedding)
+            except Exception as e:
+                logger.warning(f"시맨틱 캐시 조회 실패 (무시): {e}")
+        return None
+
+    def store(self, request: RAGRequest, answer: str, sources: List[str]):
+        if not request.index_name or not answer:
+            return
+        self.exact_cache.set(request.index_name, request.index_version, request.question, answer, sources)
+        if self.semantic_cache is not None and request.question_embedding is not None:
+            self.semantic_cache.set(
+                request.index_name, request.index_version, request.question_embedding,
+                request.question, answer, sources
+            )
+
+class SearchRetriever:
+    """챗봇 검색 방식(키워드/하이브리드/로컬 BM25)에 따른 문서 검색"""
+
+    def __init__(self, search_mode: str = "any"):
+        self.search_mode = search_mode
+
+    def retrieve(self, request: RAGRequest, top: int):
+        return retrieve_documents(
+            request.search_client,
+            request.openai_client,
+            request.question,
+            retrieval_mode=request.retrieval_mode,
+            top=top,
+            search_mode=request.profile.search_mode or self.search_mode,
+            index_name=request.index_name,
+            search_filter=request.search_filter
+        )
+
+class PassageReranker:
+    """후보 재점수화 + 중복 제거 + MMR 선택 (rerank_utils)"""
+
+    def __init__(self, content_getter: Callable[[Dict], Tuple[str, str]] = get_best_content):
+        self.content_getter = content_getter
+
+    def rerank(self, request: RAGRequest, results, top: int) -> List[Dict]:
+        # 후보/중복 제거 수는 rerank_utils.rerank_stats에 기록됨
+        reranked = rerank_documents(results, request.question, self.content_getter, top=top, model=get_chat_deployment())
+        return reranked["documents"]
+
+class TokenBudgetContextBuilder:
+    """점수가 높은 문서/문단부터 토큰 예산 안에서 컨텍스트 구성"""
+
+    def __init__(self, content_getter: Callable[[Dict], Tuple[str, str]] = get_best_content,
+                 token_budget: Optional[int] = None):
+        self.content_getter = content_getter
+        self.token_budget = token_budget
+
+    def build(self, request: RAGRequest, results) -> Dict:
+        packed = pack_context(
+            results,
+            request.question,
+            content_getter=self.content_getter,
+            token_budget=request.profile.context_tokens or self.token_budget,
+            model=get_chat_deployment()
+        )
+        logger.info(
+            f"컨텍스트 토큰 사용량: {packed['tokens_used']}/{packed['token_budget']} (문서 {packed['documents_used']}개)"
+        )
+        return packed
+
+class ChatGenerator:
+    """Azure OpenAI 채팅 배포로 답변 생성"""
+
+    def __init__(self, system_prompt: str = SYSTEM_PROMPT, temperature: float = DEFAULT_TEMPERATURE,
+                 max_tokens: int = DEFAULT_MAX_TOKENS):
+        self.system_prompt = system_prompt
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def build_messages(self, request: RAGRequest, context: str) -> List[Dict]:
+        """시스템 프롬프트 + 이전 대화(요약 + 최근 대화) + 문서/질문"""
+        history = []
+        if request.history and is_conversation_memory_enabled():
+            history = conversation_memory.build_history(
+                request.history, request.session, model=get_chat_deployment(),
+                openai_client=request.openai_client, deployment=get_chat_deployment(),
+                chatbot_name=request.chatbot_name
+            )
+        return [
+            {"role": "system", "content": self.system_prompt},
+            *history,
+            {
+                "role": "user",
+                "content": f"다음 문서들을 바탕으로 질문에 답변해주세요.\n\n문서 내용:\n{context}\n\n질문: {request.question}"
+            }
+        ]
+
+    def generate(self, request: RAGRequest, context: str):
+        """stream=True이면 스트리밍 응답 객체를, 아니면 완료 응답 객체를 반환"""
+        request.messages = self.build_messages(request, context)
+        profile = request.profile
+        max_tokens = profile.max_tokens or self.max_tokens
+        temperature = profile.temperature if profile.temperature is not None else self.temperature
+        # 라우터가 고른 배포와 그 등급의 max_tokens 사용 (프로필에 배포가 지정되면 그 배포)
+        if request.route is not None:
+            request.deployment = request.route.deployment.name
+            max_tokens = min(max_tokens, request.route.max_tokens)
+        else:
+            request.deployment = profile.deployment or get_chat_deployment()
+        # 공유 할당량(RPM/TPM)에서 차례가 올 때까지 대기 (챗봇별 공정 큐)
+        request.rate_limit_tokens = estimate_request_tokens(request.messages, max_tokens, request.deployment)
+        request.rate_limit_wait = rate_limiter.acquire(
+            request.rate_limit_tokens, request.chatbot_name, deployment=request.deployment
+        )
+        return request.openai_client.chat.completions.create(
+            model=request.deployment,
+            messages=request.messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=request.stream
+        )
+
+# 모든 엔진에 적용되는 타이밍 훅 (hook(stage, elapsed_ms, request))
+_global_timing_hooks: List[Callable] = []
+_hooks_lock = threading.Lock()
+
+def add_timing_hook(hook: Callable[[str, float, RAGRequest], None]):
+    """프로세스 전체 타이밍 훅 등록 (같은 훅은 한 번만 등록)"""
+    with _hooks_lock:
+        if hook not in _global_timing_hooks:
+            _global_timing_hooks.append(hook)
+
+class RAGEngine:
+    """
+    교체 가능한 단계로 구성된 검색 + 답변 생성 엔진
+
+    단계 이름(타이밍 훅의 stage): cache_lookup, retrieve, rerank, context,
+    generate(응답 수신까지, 스트리밍이면 스트림 연결까지), first_token, generate_stream(스트림 전체),
+    route(모델 라우팅), fallback(추출형 답변 구성), cache_store, coalesce_wait(같은 질문의 처리 결과를 기다린 시간),
+    total (total은 항상 마지막에 한 번 보고됨)
+    """
+
+    def __init__(self, retriever=None, context_builder=None, generator=None,
+                 cache: Optional[AnswerCacheStage] = None, reranker=None,
+                 answer_deadline_seconds: float = 0.0, coalesce: bool = False,
+                 router: Optional[ModelRouter] = None, coalesce_timeout: Optional[float] = None):
+        self.retriever = retriever or SearchRetriever()
+        self.context_builder = context_builder or TokenBudgetContextBuilder()
+        self.generator = generator or ChatGenerator()
+        self.cache = cache
+        self.reranker = reranker
+        # 0보다 크면 질문 시작부터 이 시간 안에 답변 출력이 없을 때 추출형 답변을 먼저 반환
+        self.answer_deadline_seconds = answer_deadline_seconds
+        # 처리 중인 같은 질문을 한 번만 처리하고 결과를 나눠 받음
+        self.coalesce = coalesce
+        # follower가 leader의 출처/다음 답변 조각을 기다리는 최대 시간 (지나면 직접 처리)
+        self.coalesce_timeout = coalesce_timeout if coalesce_timeout is not None else get_coalesce_timeout_seconds()
+        # 질문별 배포 선택 (배포가 하나뿐이면 사용하지 않음)
+        self.router = router if router is not None and router.enabled else None
+        self._timing_hooks: List[Callable] = []
+
+    def add_timing_hook(self, hook: Callable[[str, float, RAGRequest], None]):
+        """이 엔진에만 적용되는 타이밍 훅 등록"""
+        self._timing_hooks.append(hook)
+
+    def _record(self, request: RAGRequest, stage: str, started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        request.timings[stage] = elapsed_ms
+        for hook in list(_global_timing_hooks) + self._timing_hooks:
+            try:
+                hook(stage, elapsed_ms, request)
+            except Exception as e:
+                logger.warning(f"타이밍 훅 실패 ({stage}): {e}")
+
+    def answer(self, search_client, openai_client, question: str, index_name: Optional[str] = None,
+               index_version: int = 0, stream: bool = False, retrieval_mode: str = "keyword",
+               chatbot_name: Optional[str] = None, session: Optional[Dict] = None,
+               history: Optional[List[Dict]] = None, profile: Optional[PerformanceProfile] = None):
+        """
+        질문에 대해 검색하고 답변 생성 (캐시 우선 조회)
+
+        session(대화별 상태 딕셔너리)을 넘기면 이전 턴의 검색 결과를 보관해 두고,
+        후속 질문은 검색을 건너뛰거나 이전 후보 문서로 범위를 좁혀 검색합니다.
+        history(이전 대화)를 넘기면 최근 대화와 누적 요약을 프롬프트에 포함합니다.
+        profile(챗봇별 성능 프로필)을 넘기면 검색 문서 수, 컨텍스트 예산, 생성 설정과 배포를 프로필 값으로 사용합니다.
+
+        Returns:
+            (답변, 출처 목록). stream=True이면 답변 대신 텍스트 조각 이터레이터를 반환하며,
+            답변 마감 시간을 넘기면 답변 대신 PendingAnswer(추출형 답변 + LLM 답변 대기)를 반환합니다.
+        """
+        request = RAGRequest(
+            search_client, openai_client, question, index_name, index_version, stream, retrieval_mode, chatbot_name,
+            session, history, profile
+        )
+        if session is not None and is_followup_reuse_enabled():
+            request.followup = classify_followup(question, session.get("last_retrieval"))
+            if request.followup:
+                logger.info(f"후속 질문으로 판단 ({request.followup}): {question[:50]}")
+        # 후속 질문이나 이전 대화가 들어간 답변은 대화마다 다르므로 다른 세션과 합치지 않음
+        if not self.coalesce or not index_name or not request.is_shareable():
+            return self.run(request)
+        return self._run_coalesced(request)
+
+    def _run_coalesced(self, request: RAGRequest):
+        """
+        처리 중인 같은 질문(인덱스명 + 인덱스 버전 + 성능 프로필 + 정규화된 질문)이 있으면 그 결과를 함께 받고,
+        없으면 직접 처리하면서 결과를 다른 세션과 공유
+        """
+        key = (request.index_name, request.index_version, request.profile.to_json(), normalize_question(request.question))
+        flight, is_leader = single_flight.join(key)
+
+        if not is_leader:
+            started = time.perf_counter()
+            if not flight.wait_ready(self.coalesce_timeout):
+                # leader가 결과 없이 중단되었거나(예: 세션 재실행) 마감 시간 안에 출처를 정하지 못함 → 직접 처리
+                if not flight.ready:
+                    logger.warning(f"같은 질문의 처리가 {self.coalesce_timeout:.1f}초 안에 끝나지 않아 직접 처리합니다.")
+                return self.run(request)
+            request.coalesced = True
+            request.cache_hit = True
+            if request.session is not None:
+                request.session.pop("last_retrieval", None)
+            self._record(request, "coalesce_wait", started)
+            logger.info(f"처리 중인 같은 질문의 결과를 함께 사용합니다: {request.question[:50]}")
+            return self._flight_result(request, flight, started)
+
+        try:
+            answer, sources = self.run(request)
+        except BaseException:
+            flight.finish(failed=True)
+            single_flight.forget(key, flight)
+            raise
+
+        if isinstance(answer, str):
+            flight.publish(sources)
+            flight.append(answer)
+            flight.finish()
+            single_flight.forget(key, flight)
+            return answer, sources
+
+        # 스트리밍/추출형 답변은 백그라운드에서 조각을 받아 모든 세션에 나눠줌
+        # (leader 세션이 도중에 화면을 떠나도 follower는 끝까지 받음)
+        if isinstance(answer, PendingAnswer):
+            flight.publish(sources, answer.text)
+            chunks = answer.iter_llm()
+        else:
+            flight.publish(sources)
+            chunks = answer
+
+        def _pump():
+            failed = False
+            try:
+                for chunk in chunks:
+                    flight.append(chunk)
+            except Exception as e:
+                failed = True
+                logger.warning(f"공유 답변 수신 실패: {e}")
+            finally:
+                flight.finish(failed=failed)
+                single_flight.forget(key, flight)
+
+        threading.Thread(target=_pump, name="single-flight", daemon=True).start()
+        return self._flight_result(request, flight)
+
+    def _flight_result(self, request: RAGRequest, flight: Flight, started: Optional[float] = None):
+        """
+        공유 결과를 요청 형태(일반/스트리밍/추출형)에 맞게 변환 (follower는 끝나면 total 기록)
+        follower가 첫 답변 조각을 마감 시간 안에 받지 못하면 직접 처리한 답변을 대신 반환합니다.
+        """
+        # leader 자신의 조각은 leader 스트림의 HTTP 타임아웃이 적용되므로 follower만 마감 시간 적용
+        timeout = self.coalesce_timeout if started is not None else None
+
+        def _chunks():
+            completed = False
+            rerun = False
+            received = 0
+            try:
+                try:
+                    for chunk in flight.iter_chunks(timeout):
+                        received += 1
+                        yield chunk
+                    completed = True
+                except TimeoutError as e:
+                    if received:
+                        # 이미 일부를 보여준 답변은 처음부터 다시 만들 수 없으므로 중단으로 기록
+                        logger.warning(f"공유 답변 수신 중단: {e}")
+                    else:
+                        rerun = True
+                if rerun:
+                    logger.warning(f"같은 질문의 답변이 {self.coalesce_timeout:.1f}초 안에 오지 않아 직접 처리합니다.")
+                    yield from self._rerun_chunks(request)
+            finally:
+                # 직접 처리한 경우 run()이 total을 기록
+                if started is not None and not rerun:
+                    if not completed:
+                        request.error = "답변 수신이 중단되었습니다."
+                        request.aborted = True
+                    self._record(request, "total", started)
+
+        if flight.fallback_text is not None:
+            return PendingAnswer(flight.fallback_text, _chunks()), flight.sources
+        if request.stream:
+            return _chunks(), flight.sources
+        return "".join(_chunks()), flight.sources
+
+    def _rerun_chunks(self, request: RAGRequest) -> Iterator[str]:
+        """공유 결과를 기다리다 마감 시간이 지난 follower가 직접 처리한 답변 조각"""
+        request.coalesced = False
+        request.cache_hit = False
+        answer, _ = self.run(request)
+        if isinstance(answer, PendingAnswer):
+            # 추출형 답변은 공유 결과로 이미 표시했으므로 LLM 답변만 이어서 반환
+            return answer.iter_llm()
+        if isinstance(answer, str):
+            return iter([answer])
+        return answer
+
+    def _record_usage(self, request: RAGRequest, answer: str, usage=None):
+        """토큰 사용량 기록 (스트리밍 응답처럼 usage가 없으면 직접 계산) 후 속도 제한 추정치 보정"""
+        if usage is not None and getattr(usage, "prompt_tokens", None):
+            request.prompt_tokens = usage.prompt_tokens
+            request.completion_tokens = usage.completion_tokens or 0
+        else:
+            model = request.deployment or get_chat_deployment()
+            request.prompt_tokens = sum(count_tokens(m["content"], model) for m in request.messages)
+            request.completion_tokens = count_tokens(answer, model)
+        if request.rate_limit_tokens:
+            rate_limiter.reconcile(
+                request.rate_limit_tokens, request.prompt_tokens + request.completion_tokens,
+                deployment=request.deployment
+            )
+
+    def run(self, request: RAGRequest):
+        """RAGRequest 처리 (answer()와 같은 형태의 결과 반환)"""
+        started = time.perf_counter()
+
+        def _result(answer, sources):
+            self._record(request, "total", started)
+            return (iter_static_text(answer) if request.stream else answer), sources
+
+        try:
+            # 후속 질문이나 이전 대화가 들어간 답변은 대화마다 달라지므로 캐시를 사용하지 않음
+            if self.cache is not None and request.is_shareable():
+                step = time.perf_counter()
+                cached = self.cache.lookup(request)
+                self._record(request, "cache_lookup", step)
+                if cached:
+                    request.cache_hit = True
+                    if request.session is not None:
+                        request.session.pop("last_retrieval", None)
+                    return _result(*cached)
+
+            step = time.perf_counter()
+            top = request.profile.top or get_search_top_k()
+            candidates = max(get_rerank_candidates(), top) if self.reranker else top
+            content_getter = getattr(self.context_builder, "content_getter", get_best_content)
+            previous = request.session.get("last_retrieval") if request.followup else None
+            if request.followup == "reuse":
+                results = [dict(doc) for doc in previous["documents"]]
+            elif request.followup == "narrow":
+                request.search_filter = build_id_filter(previous["candidate_ids"])
+                results = list(self.retriever.retrieve(request, candidates))
+                # 필터를 지원하지 않는 로컬 인덱스도 같은 범위가 되도록 한 번 더 거름
+                results = filter_narrowed_results(
+                    request.question, previous, results, content_getter, get_document_key
+                )
+                if not results:
+                    # 이전 문서로는 답할 수 없는 새 주제 → 일반 질문으로 전체 검색
+                    request.followup = None
+                    request.search_filter = None
+                    results = list(self.retriever.retrieve(request, candidates))
+            else:
+                # 검색 시간이 이후 단계와 섞이지 않도록 결과를 여기서 모두 받아 둠
+                # (검색 개수는 후보 수로 제한하며, pack_context의 예산 조기 종료는 컨텍스트 구성 작업만 줄임)
+                results = list(self.retriever.retrieve(request, candidates))
+            request.hit_count = len(results)
+            self._record(request, "retrieve", step)
+            candidate_ids = [get_document_key(doc) for doc in results]
+
+            if self.reranker:
+                step = time.perf_counter()
+                results = self.reranker.rerank(request, results, top)
+                self._record(request, "rerank", step)
+
+            request.document_ids = [get_document_key(doc) for doc in results]
+            if request.session is not None and request.followup != "reuse":
+                request.session["last_retrieval"] = make_retrieval_memory(
+                    request.question, results, candidate_ids, content_getter
+                )
+
+            step = time.perf_counter()
+            request.context = self.context_builder.build(request, results)
+            self._record(request, "context", step)
+            sources = request.context["sources"]
+
+            if not sources:
+                return _result(NO_DOCUMENTS_MESSAGE, [])
+
+            if self.router is not None and not request.profile.deployment:
+                step = time.perf_counter()
+                request.route = self.router.route(request.question, request.context, results, get_chat_deployment())
+                self._record(request, "route", step)
+                logger.info(
+                    f"모델 라우팅: {request.chatbot_name} → {request.route.deployment.name} "
+                    f"({request.route.deployment.tier}, {request.route.reason}) {request.route.features}"
+                )
+
+            def _store(answer):
+                if self.cache is not None and request.is_shareable():
+                    store_started = time.perf_counter()
+                    self.cache.store(request, answer, sources)
+                    self._record(request, "cache_store", store_started)
+
+            if self.answer_deadline_seconds > 0:
+                return self._generate_with_deadline(request, results, started, _store), sources
+
+            step = time.perf_counter()
+            response = self.generator.generate(request, request.context["context"])
+            self._record(request, "generate", step)
+
+            # 스트리밍 모드에서는 스트림이 끝난 뒤 캐시 저장 및 전체 시간 기록
+            if request.stream:
+                def _on_complete(answer):
+                    self._record(request, "generate_stream", step)
+                    self._record_usage(request, answer)
+                    _store(answer)
+                    self._record(request, "total", started)
+
+                # 실패하거나 중단된 스트림도 전체 시간과 텔레메트리를 기록
+                def _on_error(message, aborted):
+                    request.error = message
+                    request.aborted = aborted
+                    self._record(request, "total", started)
+
+                return iter_completion_text(
+                    response,
+                    on_complete=_on_complete,
+                    on_first_token=lambda: self._record(request, "first_token", step),
+                    on_error=_on_error
+                ), sources
+
+            answer = response.choices[0].message.content
+            self._record_usage(request, answer, getattr(response, "usage", None))
+            _store(answer)
+            self._record(request, "total", started)
+            return answer, sources
+
+        except Exception as e:
+            request.error = str(e)
+            return _result(f"❌ 검색 또는 답변 생성 실패: {e}", [])
+
+    def _generate_with_deadline(self, request: RAGRequest, results: List[Dict], started: float,
+                                store: Callable[[str], None]):
+        """
+        답변을 백그라운드에서 생성하고, 질문 시작부터 마감 시간 안에 첫 출력이 없으면
+        추출형 답변을 담은 PendingAnswer 반환 (LLM 답변은 PendingAnswer.iter_llm()으로 이어서 받음)
+        """
+        chunks: "queue.Queue" = queue.Queue()
+        usage_holder = {}
+        step = time.perf_counter()
+
+        def _pump():
+            try:
+                response = self.generator.generate(request, request.context["context"])
+                self._record(request, "generate", step)
+                if request.stream:
+                    def _on_error(message, aborted):
+                        request.error = message
+
+                    for text in iter_completion_text(
+                        response, on_first_token=lambda: self._record(request, "first_token", step),
+                        on_error=_on_error
+                    ):
+                        chunks.put(text)
+                else:
+                    usage_holder["usage"] = getattr(response, "usage", None)
+                    chunks.put(response.choices[0].message.content or "")
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                chunks.put(_STREAM_END)
+
+        _generation_executor.submit(_pump)
+
+        def _drain(first=None):
+            parts = []
+            completed = False
+            try:
+                item = chunks.get() if first is None else first
+                while item is not _STREAM_END:
+                    if isinstance(item, Exception):
+                        request.error = str(item)
+                        yield f"\n\n❌ 답변 생성 실패: {item}"
+                        break
+                    parts.append(item)
+                    yield item
+                    item = chunks.get()
+                completed = True
+            finally:
+                if not completed and not request.error:
+                    request.error = "답변 수신이 중단되었습니다."
+                    request.aborted = True
+                answer = "".join(parts)
+                if answer and not request.error:
+                    self._record(request, "generate_stream", step)
+                    self._record_usage(request, answer, usage_holder.get("usage"))
+                    store(answer)
+                self._record(request, "total", started)
+
+        remaining = self.answer_deadline_seconds - (time.perf_counter() - started)
+        try:
+            first = chunks.get(timeout=max(remaining, 0.001))
+        except queue.Empty:
+            fallback_started = time.perf_counter()
+            content_getter = getattr(self.context_builder, "content_getter", get_best_content)
+            text = build_extractive_answer(request.question, results, content_getter)
+            request.fallback_used = True
+            self._record(request, "fallback", fallback_started)
+            logger.info(f"답변 마감 시간({self.answer_deadline_seconds}초) 초과, 추출형 답변을 먼저 반환합니다.")
+            return PendingAnswer(text, _drain())
+
+        if isinstance(first, Exception):
+            raise first
+        if request.stream:
+            return _drain(first)
+        return "".join(_drain(first))
+
+def create_rag_engine(use_cache: bool = True, use_semantic_cache: bool = True) -> RAGEngine:
+    """
+    기본 단계로 구성된 엔진 생성 (재순위화는 ENABLE_RERANK, 동시 요청 합치기는
+    ENABLE_REQUEST_COALESCING 설정을 따름, 텔레메트리/트래픽 캡처 훅 등록)
+    """
+    add_timing_hook(telemetry_hook)
+    add_timing_hook(capture_hook)
+    cache = AnswerCacheStage(semantic=semantic_cache if use_semantic_cache else None) if use_cache else None
+    return RAGEngine(
+        retriever=SearchRetriever(),
+        context_builder=TokenBudgetContextBuilder(),
+        generator=ChatGenerator(),
+        cache=cache,
+        reranker=PassageReranker() if is_rerank_enabled() else None,
+        answer_deadline_seconds=get_answer_deadline_seconds(),
+        coalesce=is_coalescing_enabled(),
+        router=create_model_router()
+    )
@@ -0,0 +1,378 @@
+"""
+Azure OpenAI 호출 속도 제한(rate limit) 모듈
+모든 챗봇이 같은 배포(deployment)의 RPM/TPM 할당량을 나눠 쓰므로,
+요청 토큰 수를 미리 추정해 토큰 버킷에서 차감한 뒤 호출합니다.
+할당량은 배포마다 따로이므로 버킷과 대기열도 배포별로 둡니다
+(AZURE_OPENAI_DEPLOYMENTS 항목의 rpm/tpm, 지정하지 않은 배포는 OPENAI_RPM_LIMIT/OPENAI_TPM_LIMIT).
+대기 중인 요청은 챗봇별 가중치 공정 큐(weighted fair queuing)로 순서를 정해
+한 챗봇이 몰려도 다른 챗봇이 굶지 않도록 합니다.
+RATE_LIMIT_DB_PATH를 지정하면 버킷 상태를 SQLite에 두어 여러 프로세스(관리자 화면, 챗봇 팝업)가 함께 사용합니다.
+"""
+
+import os
+import time
+import heapq
+import sqlite3
+import logging
+import threading
+import itertools
+from typing import Dict, List, Optional
+
+from context_utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# 메시지마다 붙는 역할/구분자 토큰 근사치
+MESSAGE_OVERHEAD_TOKENS = 4
+
+class RateLimitTimeout(TimeoutError):
+    """최대 대기 시간 안에 할당량을 받지 못함"""
+
+def get_rpm_limit() -> int:
+    """분당 요청 수 한도 (0이면 제한 없음)"""
+    return int(os.getenv("OPENAI_RPM_LIMIT", "0"))
+
+def get_tpm_limit() -> int:
+    """분당 토큰 수 한도 (0이면 제한 없음)"""
+    return int(os.getenv("OPENAI_TPM_LIMIT", "0"))
+
+def get_deployment_limits() -> Dict[str, Dict[str, int]]:
+    """배포별 RPM/TPM 한도 (AZURE_OPENAI_DEPLOYMENTS 항목에 rpm/tpm을 지정한 배포만)"""
+    from model_router import load_deployments
+
+    return {
+        deployment.name: {"requests": deployment.rpm, "tokens": deployment.tpm}
+        for deployment in load_deployments() if deployment.name and (deployment.rpm or deployment.tpm)
+    }
+
+def get_max_wait_seconds() -> float:
+    """할당량을 기다리는 최대 시간 (기본값: 30초)"""
+    return float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+
+def get_chatbot_weights() -> Dict[str, float]:
+    """챗봇별 가중치 (예: RATE_LIMIT_WEIGHTS="인사봇:2,IT봇:1", 지정하지 않은 챗봇은 1)"""
+    weights = {}
+    for item in os.getenv("RATE_LIMIT_WEIGHTS", "").split(","):
+        name, _, weight = item.rpartition(":")
+        if name.strip() and weight.strip():
+            try:
+                weights[name.strip()] = max(float(weight), 0.01)
+            except ValueError:
+                logger.warning(f"잘못된 RATE_LIMIT_WEIGHTS 항목: {item}")
+    return weights
+
+def estimate_request_tokens(messages: List[Dict], max_tokens: int, model: Optional[str] = None) -> int:
+    """
+    요청이 할당량에서 차지할 토큰 수 추정
+
+    Azure OpenAI는 프롬프트 토큰과 max_tokens를 합쳐 TPM 한도를 계산하므로 같은 방식으로 추정합니다.
+    """
+    prompt_tokens = sum(count_tokens(m.get("content") or "", model) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+    return prompt_tokens + (max_tokens or 0)
+
+class _LocalBuckets:
+    """프로세스 안에서만 공유하는 요청/토큰 버킷"""
+
+    def __init__(self, limits: Dict[str, float], burst_seconds: float):
+        now = time.monotonic()
+        # name → [초당 충전량, 용량, 현재 토큰, 마지막 갱신 시각]
+        self._buckets = {
+            name: [limit / 60.0, max(limit / 60.0 * burst_seconds, 1.0), max(limit / 60.0 * burst_seconds, 1.0), now]
+            for name, limit in limits.items() if limit > 0
+        }
+
+    def capacity(self, name: str) -> Optional[float]:
+        bucket = self._buckets.get(name)
+        return bucket[1] if bucket else None
+
+    def try_acquire(self, costs: Dict[str, float]) -> float:
+        """모든 버킷에 여유가 있으면 차감하고 0, 아니면 필요한 대기 시간(초) 반환"""
+        now = time.monotonic()
+        wait = 0.0
+        for name, cost in costs.items():
+            bucket = self._buckets.get(name)
+            if bucket is None:
+                continue
+            rate, capacity, tokens, updated = bucket
+            bucket[2] = tokens = min(capacity, tokens + (now - updated) * rate)
+            bucket[3] = now
+            if tokens < cost:
+                wait = max(wait, (cost - tokens) / rate)
+        if wait > 0:
+            return wait
+        for name, cost in costs.items():
+            if name in self._buckets:
+                self._buckets[name][2] -= cost
+        return 0.0
+
+    def adjust(self, name: str, delta: float):
+        """추정치와 실제 사용량 차이 반영 (음수가 되면 그만큼 다음 요청이 기다림)"""
+        bucket = self._buckets.get(name)
+        if bucket is not None:
+            bucket[2] = min(bucket[1], bucket[2] + delta)
+
+class _SQLiteBuckets(_LocalBuckets):
+    """SQLite에 상태를 두고 여러 프로세스가 함께 쓰는 버킷"""
+
+    def __init__(self, limits: Dict[str, float], burst_seconds: float, db_path: str, prefix: str = ""):
+        super().__init__(limits, burst_seconds)
+        self.db_path = db_path
+        # 배포별 버킷을 한 테이블에 두기 위한 행 이름 접두사
+        self.prefix = prefix
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _load(self, conn: sqlite3.Connection, now: float) -> Dict[str, float]:
+        rows = {
+            name[len(self.prefix):]: (tokens, updated)
+            for name, tokens, updated in conn.execute(
+                "SELECT name, tokens, updated_at FROM rate_limit_buckets WHERE substr(name, 1, ?) = ?",
+                (len(self.prefix), self.prefix)
+            )
+        }
+        current = {}
+        for name, (rate, capacity, _, _) in self._buckets.items():
+            tokens, updated = rows.get(name, (capacity, now))
+            current[name] = min(capacity, tokens + max(now - updated, 0.0) * rate)
+        return current
+
+    def _save(self, conn: sqlite3.Connection, current: Dict[str, float], now: float):
+        conn.executemany(
+            "INSERT OR REPLACE INTO rate_limit_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+            [(self.prefix + name, tokens, now) for name, tokens in current.items()]
+        )
+
+    def try_acquire(self, costs: Dict[str, float]) -> float:
+        now = time.time()
+        conn = self._connect()
+        try:
+            # 읽기-차감-쓰기를 다른 프로세스와 겹치지 않게 쓰기 잠금으로 묶음
+            conn.execute("BEGIN IMMEDIATE")
+            current = self._load(conn, now)
+            wait = 0.0
+            for name, cost in costs.items():
+                if name in current and current[name] < cost:
+                    wait = max(wait, (cost - current[name]) / self._buckets[name][0])
+            if wait == 0:
+                for name, cost in costs.items():
+                    if name in current:
+                        current[name] -= cost
+            self._save(conn, current, now)
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            # BEGIN IMMEDIATE 자체가 실패하면 열린 트랜잭션이 없으므로 원래 오류를 그대로 전달
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def adjust(self, name: str, delta: float):
+        if name not in self._buckets:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            current = self._load(conn, now)
+            current[name] = min(self._buckets[name][1], current[name] + delta)
+            self._save(conn, current, now)
+            conn.execute("COMMIT")
+        except Exception:
+            # BEGIN IMMEDIATE 자체가 실패하면 열린 트랜잭션이 없으므로 원래 오류를 그대로 전달
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+class _DeploymentQueue:
+    """배포 하나의 버킷과 챗봇별 공정 큐 상태"""
+
+    def __init__(self, buckets: _LocalBuckets, enabled: bool):
+        self.buckets = buckets
+        self.enabled = enabled
+        self.queue = []
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+
+class RateLimiter:
+    """
+    배포별 RPM/TPM 토큰 버킷 + 챗봇별 가중치 공정 큐
+
+    각 요청에는 (챗봇의 직전 종료 태그와 현재 가상 시간 중 큰 값) + 토큰 수 / 가중치 로 종료 태그를 매기고,
+    같은 배포의 대기열에서 종료 태그가 가장 작은 요청만 버킷에서 할당량을 가져갈 수 있습니다.
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, burst_seconds: float = 10.0,
+                 db_path: Optional[str] = None, weights: Optional[Dict[str, float]] = None,
+                 max_wait_seconds: float = 30.0, deployment_limits: Optional[Dict[str, Dict[str, int]]] = None):
+        self.default_limits = {"requests": rpm, "tokens": tpm}
+        self.deployment_limits = deployment_limits or {}
+        self.enabled = rpm > 0 or tpm > 0 or any(
+            limit > 0 for limits in self.deployment_limits.values() for limit in limits.values()
+        )
+        self.burst_seconds = burst_seconds
+        self.db_path = db_path
+        self.weights = weights or {}
+        self.max_wait_seconds = max_wait_seconds
+        self.shared = bool(db_path)
+
+        self._cond = threading.Condition()
+        self._deployments: Dict[str, _DeploymentQueue] = {}
+        self._sequence = itertools.count()
+        self._stats: Dict[str, Dict] = {}
+
+    def _get_deployment(self, deployment: Optional[str]) -> _DeploymentQueue:
+        """배포별 버킷/대기열 (처음 쓰일 때 생성, self._cond를 잡은 상태에서 호출)"""
+        key = deployment or ""
+        state = self._deployments.get(key)
+        if state is None:
+            limits = self.deployment_limits.get(key) or self.default_limits
+            if self.db_path:
+                buckets = _SQLiteBuckets(limits, self.burst_seconds, self.db_path, prefix=f"{key}:" if key else "")
+            else:
+                buckets = _LocalBuckets(limits, self.burst_seconds)
+            state = _DeploymentQueue(buckets, any(limit > 0 for limit in limits.values()))
+            self._deployments[key] = state
+        return state
+
+    def _get_stats(self, name: str) -> Dict:
+        return self._stats.setdefault(name, {
+            "requests": 0, "throttled": 0, "timeouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+            "tokens": 0
+        })
+
+    def acquire(self, tokens: int, chatbot_name: Optional[str] = None, timeout: Optional[float] = None,
+                deployment: Optional[str] = None) -> float:
+        """
+        deployment 배포의 요청 1건과 토큰 할당량을 받을 때까지 대기
+
+        Returns:
+            대기한 시간 (초)
+
+        Raises:
+            RateLimitTimeout: 최대 대기 시간 안에 차례가 오지 않음
+        """
+        if not self.enabled:
+            return 0.0
+
+        name = chatbot_name or "-"
+        timeout = self.max_wait_seconds if timeout is None else timeout
+        started = time.monotonic()
+
+        with self._cond:
+            state = self._get_deployment(deployment)
+            if not state.enabled:
+                return 0.0
+            # 한 요청이 버킷 용량보다 크면 영원히 기다리지 않도록 용량으로 제한
+            token_capacity = state.buckets.capacity("tokens")
+            cost = {"requests": 1, "tokens": min(tokens, token_capacity) if token_capacity else tokens}
+            queue = state.queue
+            start_tag = max(state.virtual_time, state.last_finish.get(name, 0.0))
+            finish_tag = start_tag + max(tokens, 1) / self.weights.get(name, 1.0)
+            state.last_finish[name] = finish_tag
+            entry = (finish_tag, next(self._sequence), name)
+            heapq.heappush(queue, entry)
+            throttled = False
+            try:
+                while True:
+                    wait = None
+                    if queue[0] is entry:
+                        wait = state.buckets.try_acquire(cost)
+                        if wait <= 0:
+                            heapq.heappop(queue)
+                            state.virtual_time = max(state.virtual_time, start_tag)
+                            self._cond.notify_all()
+                            break
+                    throttled = True
+                    remaining = timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        raise RateLimitTimeout(f"OpenAI 할당량 대기 시간 초과 ({timeout:g}초, 챗봇: {name})")
+                    # 맨 앞 요청은 버킷이 찰 때까지, 나머지는 차례가 바뀔 때까지 대기
+                    # (여러 프로세스가 공유할 때는 다른 프로세스의 차감을 보기 위해 짧게 확인)
+                    poll = min(wait, 0.5) if wait is not None and self.shared else wait
+                    self._cond.wait(min(poll, remaining) if poll is not None else remaining)
+            except BaseException as e:
+                if entry in queue:
+                    queue.remove(entry)
+                    heapq.heapify(queue)
+                    self._cond.notify_all()
+                if isinstance(e, RateLimitTimeout):
+                    self._get_stats(name)["timeouts"] += 1
+                raise
+
+            waited = time.monotonic() - started
+            stats = self._get_stats(name)
+            stats["requests"] += 1
+            stats["tokens"] += tokens
+            stats["throttled"] += int(throttled)
+            stats["wait_seconds"] += waited
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+
+        if throttled:
+            logger.info(f"OpenAI 할당량 대기: {name} {waited * 1000:.0f}ms (추정 {tokens} 토큰)")
+        return waited
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int, deployment: Optional[str] = None):
+        """응답의 실제 토큰 수로 deployment 배포의 추정치 보정 (추정이 컸으면 돌려받고 작았으면 더 차감)"""
+        if not self.enabled or not actual_tokens:
+            return
+        with self._cond:
+            self._get_deployment(deployment).buckets.adjust("tokens", estimated_tokens - actual_tokens)
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict:
+        """전체/챗봇별 대기열 길이와 대기 시간"""
+        with self._cond:
+            depth: Dict[str, int] = {}
+            deployments = []
+            for key, state in sorted(self._deployments.items()):
+                for _, _, name in state.queue:
+                    depth[name] = depth.get(name, 0) + 1
+                if state.enabled:
+                    deployments.append({"deployment": key or "-", "queue_depth": len(state.queue)})
+            chatbots = []
+            for name in sorted(set(self._stats) | set(depth)):
+                stats = self._get_stats(name)
+                chatbots.append({
+                    "chatbot_name": name,
+                    "queue_depth": depth.get(name, 0),
+                    "weight": self.weights.get(name, 1.0),
+                    "requests": stats["requests"],
+                    "throttled": stats["throttled"],
+                    "timeouts": stats["timeouts"],
+                    "avg_wait_ms": stats["wait_seconds"] / max(stats["requests"], 1) * 1000,
+                    "max_wait_ms": stats["max_wait_seconds"] * 1000,
+                    "tokens": stats["tokens"],
+                })
+            return {
+                "enabled": self.enabled,
+                "shared": self.shared,
+                "queue_depth": sum(depth.values()),
+                "deployments": deployments,
+                "chatbots": chatbots,
+            }
+
+# 프로세스 전체에서 공유하는 OpenAI 속도 제한기
+rate_limiter = RateLimiter(
+    rpm=get_rpm_limit(),
+    tpm=get_tpm_limit(),
+    burst_seconds=float(os.getenv("RATE_LIMIT_BURST_SECONDS", "10")),
+    db_path=os.getenv("RATE_LIMIT_DB_PATH") or None,
+    weights=get_chatbot_weights(),
+    max_wait_seconds=get_max_wait_seconds(),
+    deployment_limits=get_deployment_limits()
+)
@@ -0,0 +1,219 @@
+"""
+검색 결과 재순위화 유틸리티 모듈
+검색 결과를 넉넉하게 가져온 뒤 CPU에서 가볍게 다시 점수를 매기고,
+MinHash로 거의 같은 구간(같은 PDF 중복 업로드, OCR/원본 텍스트 등)을 제거한 다음
+MMR(Maximal Marginal Relevance)로 다양한 구간을 골라 컨텍스트 구성에 넘깁니다.
+"""
+
+import os
+import math
+import time
+import zlib
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from text_utils import tokenize
+from context_utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 5
+MINHASH_PERMUTATIONS = 64
+# MinHash 계산에 사용할 최대 글자 수 (파일 단위 문서도 앞부분이면 중복 판단에 충분함)
+MAX_SHINGLE_CHARS = 4000
+
+_rng = np.random.default_rng(20240601)
+# multiply-shift 해시의 계수 (a는 홀수)
+_HASH_A = _rng.integers(0, 1 << 63, MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_HASH_B = _rng.integers(0, 1 << 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+def is_rerank_enabled() -> bool:
+    """재순위화 사용 여부 (기본값: 사용)"""
+    return os.getenv("ENABLE_RERANK", "true").lower() in ("1", "true", "yes")
+
+def get_rerank_candidates() -> int:
+    """재순위화 전에 검색으로 가져올 후보 수 (기본값: 20)"""
+    return int(os.getenv("RERANK_CANDIDATES", "20"))
+
+def get_duplicate_threshold() -> float:
+    """거의 같은 구간으로 판단할 MinHash Jaccard 추정치 (기본값: 0.8)"""
+    return float(os.getenv("RERANK_DUPLICATE_THRESHOLD", "0.8"))
+
+def get_mmr_lambda() -> float:
+    """MMR 관련도 가중치 (1에 가까울수록 관련도, 0에 가까울수록 다양성 우선, 기본값: 0.7)"""
+    return float(os.getenv("RERANK_MMR_LAMBDA", "0.7"))
+
+def minhash_signature(text: str) -> np.ndarray:
+    """공백을 정규화한 글자 shingle 집합의 MinHash 서명"""
+    text = " ".join(unicodedata.normalize("NFKC", text or "").lower().split())[:MAX_SHINGLE_CHARS]
+    if len(text) < SHINGLE_SIZE:
+        text = text.ljust(SHINGLE_SIZE)
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a * h + b) mod 2^64 의 상위 32비트로 순열을 근사 (uint64 오버플로는 의도된 동작)
+    with np.errstate(over="ignore"):
+        return ((_HASH_A[:, None] * hashes[None, :] + _HASH_B[:, None]) >> np.uint64(32)).min(axis=1)
+
+def estimate_jaccard(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    """두 MinHash 서명으로 Jaccard 유사도 추정"""
+    return float(np.mean(signature_a == signature_b))
+
+def _lexical_scores(question: str, texts: List[str]) -> List[float]:
+    """
+    후보 집합 안에서 계산하는 BM25 점수와 질문 단어 포함 비율을 합친 관련도 (0~1)
+    """
+    question_terms = set(tokenize(question))
+    doc_counts = [Counter(tokenize(text)) for text in texts]
+    if not question_terms or not doc_counts:
+        return [0.0] * len(texts)
+
+    n = len(doc_counts)
+    avgdl = sum(sum(c.values()) for c in doc_counts) / n or 1.0
+    df = {term: sum(1 for c in doc_counts if term in c) for term in question_terms}
+    k1, b = 1.2, 0.75
+
+    bm25 = []
+    coverage = []
+    for counts in doc_counts:
+        length = sum(counts.values())
+        score = 0.0
+        for term in question_terms:
+            tf = counts.get(term, 0)
+            if tf:
+                idf = math.log(1.0 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avgdl))
+        bm25.append(score)
+        coverage.append(sum(1 for term in question_terms if term in counts) / len(question_terms))
+
+    max_bm25 = max(bm25) or 1.0
+    return [0.6 * s / max_bm25 + 0.4 * c for s, c in zip(bm25, coverage)]
+
+def rerank_documents(
+    results,
+    question: str,
+    content_getter: Callable[[Dict], Tuple[str, str]],
+    top: int,
+    duplicate_threshold: Optional[float] = None,
+    mmr_lambda: Optional[float] = None,
+    model: Optional[str] = None
+) -> Dict:
+    """
+    검색 후보를 재점수화 → 중복 제거 → MMR 선택
+
+    검색 엔진 순위도 약하게 반영해(0.2) 로컬 점수가 비슷할 때 원래 순서를 따르도록 합니다.
+
+    Args:
+        results: 검색 결과 (넉넉하게 가져온 후보)
+        question: 사용자 질문
+        content_getter: 문서에서 (텍스트, 출처) 를 꺼내는 함수
+        top: 최종 선택할 구간 수
+
+    Returns:
+        documents, candidates, duplicates_removed, duplicate_tokens, timings(ms) 를 담은 딕셔너리
+    """
+    duplicate_threshold = duplicate_threshold if duplicate_threshold is not None else get_duplicate_threshold()
+    mmr_lambda = mmr_lambda if mmr_lambda is not None else get_mmr_lambda()
+    timings = {}
+
+    started = time.perf_counter()
+    candidates = []
+    for doc in results:
+        text, _ = content_getter(doc)
+        if text:
+            candidates.append((doc, text))
+
+    lexical = _lexical_scores(question, [text for _, text in candidates])
+    relevance = [
+        0.8 * score + 0.2 / (1 + rank)
+        for rank, score in enumerate(lexical)
+    ]
+    order = sorted(range(len(candidates)), key=lambda i: relevance[i], reverse=True)
+    timings["score_ms"] = (time.perf_counter() - started) * 1000
+
+    # 관련도 순서대로 보면서 이미 남긴 구간과 거의 같은 구간은 제거
+    step = time.perf_counter()
+    signatures = {}
+    kept = []
+    duplicate_tokens = 0
+    for i in order:
+        signature = minhash_signature(candidates[i][1])
+        if any(estimate_jaccard(signature, signatures[j]) >= duplicate_threshold for j in kept):
+            # 제거하지 않았다면 컨텍스트 자리를 차지했을 토큰 수
+            duplicate_tokens += count_tokens(candidates[i][1], model)
+            continue
+        signatures[i] = signature
+        kept.append(i)
+    timings["dedupe_ms"] = (time.perf_counter() - step) * 1000
+
+    # MMR: 관련도는 높고 이미 고른 구간과는 덜 겹치는 구간을 차례로 선택
+    step = time.perf_counter()
+    selected = []
+    remaining = list(kept)
+    while remaining and len(selected) < top:
+        def mmr(i):
+            redundancy = max((estimate_jaccard(signatures[i], signatures[j]) for j in selected), default=0.0)
+            return mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy
+        best = max(remaining, key=mmr)
+        selected.append(best)
+        remaining.remove(best)
+    timings["mmr_ms"] = (time.perf_counter() - step) * 1000
+    timings["total_ms"] = (time.perf_counter() - started) * 1000
+
+    documents = []
+    for i in selected:
+        doc = dict(candidates[i][0])
+        doc["@rerank.score"] = relevance[i]
+        documents.append(doc)
+
+    result = {
+        "documents": documents,
+        "candidates": len(candidates),
+        "duplicates_removed": len(candidates) - len(kept),
+        "duplicate_tokens": duplicate_tokens,
+        "timings": timings
+    }
+    rerank_stats.record(result)
+    logger.info(
+        f"재순위화: 후보 {result['candidates']}개 → 중복 제거 {result['duplicates_removed']}개 "
+        f"→ 선택 {len(documents)}개 ({timings['total_ms']:.1f}ms)"
+    )
+    return result
+
+class RerankStats:
+    """재순위화 단계 누적 통계 (단계별 소요 시간, 중복 제거로 아낀 토큰)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.candidates = 0
+        self.duplicates_removed = 0
+        self.duplicate_tokens = 0
+        self.timings = {"score_ms": 0.0, "dedupe_ms": 0.0, "mmr_ms": 0.0, "total_ms": 0.0}
+
+    def record(self, result: Dict):
+        with self._lock:
+            self.runs += 1
+            self.candidates += result["candidates"]
+            self.duplicates_removed += result["duplicates_removed"]
+            self.duplicate_tokens += result["duplicate_tokens"]
+            for key, value in result["timings"].items():
+                self.timings[key] = self.timings.get(key, 0.0) + value
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            runs = max(self.runs, 1)
+            return {
+                "runs": self.runs,
+                "avg_candidates": self.candidates / runs,
+                "duplicates_removed": self.duplicates_removed,
+                "duplicate_tokens": self.duplicate_tokens,
+                "avg_timings": {key: value / runs for key, value in self.timings.items()}
+            }
+
+# 프로세스 전체에서 공유하는 재순위화 통계
+rerank_stats = RerankStats()
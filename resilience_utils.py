@@ -0,0 +1,404 @@
+"""
+외부 호출 복원력(resilience) 유틸리티 모듈
+Azure Search / Azure OpenAI 클라이언트를 감싸서
+호출별 마감 시간(deadline), 429/5xx 재시도(지수 백오프 + jitter, Retry-After 준수),
+검색 중복 요청(hedging), 엔드포인트별 서킷 브레이커를 적용합니다.
+감싼 클라이언트는 원래 클라이언트와 같은 방식(search, chat.completions.create, embeddings.create)으로 사용합니다.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+from retrieval_utils import SearchResultList
+from telemetry_utils import percentile
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# 호출을 실행하는 공용 스레드 풀 (마감 시간이 지나면 세션 스레드는 결과를 기다리지 않고 돌아감)
+# 비동기 엔진 어댑터처럼 submit()으로 Future를 주는 클라이언트는 이 풀을 사용하지 않음
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RESILIENCE_MAX_WORKERS", "32")),
+    thread_name_prefix="resilience"
+)
+
+def is_resilience_enabled() -> bool:
+    """복원력 계층 사용 여부 (기본값: 사용)"""
+    return os.getenv("RESILIENCE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+class DeadlineExceeded(TimeoutError):
+    """호출 마감 시간 초과"""
+
+class CircuitOpenError(RuntimeError):
+    """서킷 브레이커가 열려 있어 호출하지 않음"""
+
+class ResiliencePolicy:
+    """호출 종류별 마감 시간/재시도 설정"""
+
+    def __init__(self, deadline_seconds: float, max_attempts: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 8.0):
+        self.deadline_seconds = deadline_seconds
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls, prefix: str, default_deadline: float) -> "ResiliencePolicy":
+        """예: prefix=SEARCH → SEARCH_TIMEOUT_SECONDS, 재시도 설정은 공통 RETRY_* 사용"""
+        return cls(
+            deadline_seconds=float(os.getenv(f"{prefix}_TIMEOUT_SECONDS", str(default_deadline))),
+            max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.5")),
+            max_delay=float(os.getenv("RETRY_MAX_DELAY_SECONDS", "8"))
+        )
+
+class CircuitBreaker:
+    """
+    엔드포인트별 서킷 브레이커
+
+    연속 실패(재시도를 모두 소진한 호출 기준)가 failure_threshold 회에 도달하면 open 상태가 되어 reset_seconds 동안
+    호출을 바로 거부하고, 이후 half_open 상태에서 시험 호출 한 번이 성공하면 다시 closed 로 돌아갑니다.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.total_failures = 0
+        self.total_successes = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = "half_open"
+            self._trial_in_flight = False
+        return self._state
+
+    def before_call(self):
+        """호출 전 확인 (open이거나 half_open 시험 호출이 진행 중이면 CircuitOpenError)"""
+        with self._lock:
+            state = self._current_state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(f"'{self.name}' 서킷 브레이커가 열려 있습니다. 잠시 후 다시 시도하세요.")
+
+    def record_success(self):
+        with self._lock:
+            self.total_successes += 1
+            self._consecutive_failures = 0
+            self._state = "closed"
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """엔드포인트 상태와 무관한 오류(400 등): 상태는 그대로 두고 half_open 시험 호출만 다시 허용"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self.total_failures += 1
+            self._consecutive_failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"[:200]
+            if self._state == "half_open" or self._consecutive_failures >= self.failure_threshold:
+                if self._state != "open":
+                    logger.warning(f"서킷 브레이커 열림: {self.name} ({self.last_error})")
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self._current_state(),
+                "consecutive_failures": self._consecutive_failures,
+                "failures": self.total_failures,
+                "successes": self.total_successes,
+                "rejected": self.rejected,
+                "last_error": self.last_error
+            }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """엔드포인트 이름별 서킷 브레이커 (프로세스 전체 공유)"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+                reset_seconds=float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+            )
+            _breakers[name] = breaker
+        return breaker
+
+def get_circuit_breaker_stats() -> List[Dict]:
+    """사이드바 표시용 전체 서킷 브레이커 상태"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.get_stats() for breaker in breakers]
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """openai / azure-core / 스텁 예외에서 HTTP 상태 코드 추출"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """응답 헤더의 Retry-After(초) 또는 retry-after-ms 값"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") or headers.get("Retry-After"):
+            return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        # HTTP 날짜 형식 등은 무시하고 백오프 사용
+        return None
+    return None
+
+def is_retryable(error: Exception) -> bool:
+    """재시도할 오류인지 판단 (429/5xx, 시간 초과, 연결 오류)"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = get_status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    # 상태 코드가 없는 SDK 연결/타임아웃 예외 (openai.APIConnectionError, azure ServiceRequestError 등)
+    name = type(error).__name__
+    return any(key in name for key in ("Timeout", "Connection", "ServiceRequest", "ServiceResponse"))
+
+class _LatencyTracker:
+    """최근 성공 호출 지연 시간 (hedging 지연 기준 p95 계산용)"""
+
+    def __init__(self, size: int = 200):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._values.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            values = list(self._values)
+        return percentile(values, 95) if len(values) >= 20 else None
+
+_latency_trackers: Dict[str, _LatencyTracker] = {}
+
+def _get_latency_tracker(name: str) -> _LatencyTracker:
+    with _breakers_lock:
+        return _latency_trackers.setdefault(name, _LatencyTracker())
+
+def _wait_first(futures: List, timeout: float):
+    """먼저 성공한 결과 반환 (모두 실패하면 마지막 예외, 시간 초과면 DeadlineExceeded)"""
+    pending = set(futures)
+    error = None
+    end = time.monotonic() + timeout
+    while pending:
+        done, pending = wait(pending, timeout=max(end - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            # 아직 시작하지 못한 호출은 취소 (이미 실행 중인 호출은 SDK 타임아웃으로 끝남)
+            for future in pending:
+                future.cancel()
+            raise DeadlineExceeded(f"{timeout:.1f}초 안에 응답이 없습니다.")
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
+
+def call_with_resilience(fn: Callable, endpoint: str, policy: ResiliencePolicy,
+                         hedge_delay: Optional[float] = None, submit: Optional[Callable[[], Future]] = None):
+    """
+    fn()을 마감 시간/재시도/서킷 브레이커를 적용해 실행
+
+    Args:
+        fn: 인자 없는 호출 (스레드 풀에서 실행됨)
+        endpoint: 서킷 브레이커/지연 통계를 구분할 엔드포인트 이름
+        policy: 마감 시간 및 재시도 설정 (마감 시간은 모든 재시도를 합친 전체 시간)
+        hedge_delay: 지정하면 첫 요청이 이 시간(초) 안에 끝나지 않을 때 같은 요청을 한 번 더 보냄
+        submit: 호출을 시작하고 Future를 반환하는 함수 (비동기 엔진 어댑터처럼 스스로 Future를 만드는 클라이언트용,
+                없으면 fn을 스레드 풀에서 실행)
+    """
+    start = submit or (lambda: _executor.submit(fn))
+    breaker = get_circuit_breaker(endpoint)
+    tracker = _get_latency_tracker(endpoint)
+    deadline = time.monotonic() + policy.deadline_seconds
+    attempt = 0
+
+    while True:
+        attempt += 1
+        breaker.before_call()
+        remaining = deadline - time.monotonic()
+        started = time.monotonic()
+        try:
+            futures = [start()]
+            if hedge_delay is not None and hedge_delay < remaining:
+                done, _ = wait(futures, timeout=hedge_delay)
+                if not done:
+                    logger.info(f"응답 지연으로 중복 요청 전송: {endpoint} ({hedge_delay * 1000:.0f}ms)")
+                    futures.append(start())
+            result = _wait_first(futures, deadline - time.monotonic())
+        except Exception as e:
+            if not is_retryable(e):
+                # 400 등 요청 자체의 오류는 엔드포인트 장애도 정상 응답도 아님 (half_open 상태를 닫지 않음)
+                breaker.release_trial()
+                raise
+
+            retry_after = get_retry_after(e)
+            backoff = random.uniform(0, min(policy.max_delay, policy.base_delay * (2 ** (attempt - 1))))
+            delay = max(retry_after or 0.0, backoff)
+            if attempt >= policy.max_attempts or time.monotonic() + delay >= deadline:
+                # 재시도를 모두 소진한 호출 하나를 실패 한 번으로 계산
+                breaker.record_failure(e)
+                raise
+            logger.warning(f"{endpoint} 호출 실패, {delay:.2f}초 후 재시도 ({attempt}/{policy.max_attempts}): {e}")
+            time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        tracker.add(time.monotonic() - started)
+        return result
+
+def get_hedge_delay(endpoint: str) -> Optional[float]:
+    """검색 hedging 지연 (HEDGE_DELAY_MS 고정값, 없으면 최근 p95, 통계가 부족하면 사용 안 함)"""
+    if os.getenv("HEDGE_SEARCH_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    fixed = os.getenv("HEDGE_DELAY_MS")
+    if fixed:
+        return float(fixed) / 1000
+    return _get_latency_tracker(endpoint).p95()
+
+class ResilientSearchClient:
+    """SearchClient 호환 래퍼 (결과는 마감 시간 안에 모두 받아 SearchResultList로 반환)"""
+
+    def __init__(self, inner, endpoint: str, policy: Optional[ResiliencePolicy] = None):
+        self._inner = inner
+        self.endpoint = endpoint
+        self.policy = policy or ResiliencePolicy.from_env("SEARCH", 10.0)
+        # Azure SDK 클라이언트는 요청별 연결/읽기 타임아웃을 지원 (마감 시간이 지난 호출이 스레드 풀에 남지 않도록 함)
+        self.native_timeout = type(inner).__module__.startswith("azure.")
+
+    def search(self, search_text=None, **kwargs) -> SearchResultList:
+        include_total_count = kwargs.get("include_total_count", False)
+        if self.native_timeout:
+            kwargs.setdefault("connection_timeout", min(self.policy.deadline_seconds, 5.0))
+            kwargs.setdefault("read_timeout", self.policy.deadline_seconds)
+
+        def _call():
+            # Azure SearchClient.search는 지연 실행되므로 여기서 페이지를 모두 받아야 마감 시간이 적용됨
+            results = self._inner.search(search_text=search_text, **kwargs)
+            documents = list(results)
+            count = results.get_count() if include_total_count and hasattr(results, "get_count") else None
+            return SearchResultList(documents, count)
+
+        submit = getattr(self._inner, "submit", None)
+        return call_with_resilience(
+            _call, self.endpoint, self.policy, hedge_delay=get_hedge_delay(self.endpoint),
+            submit=(lambda: submit(search_text=search_text, **kwargs)) if submit is not None else None
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+class _ResilientCompletions:
+    def __init__(self, client: "ResilientOpenAIClient"):
+        self._client = client
+
+    def create(self, **kwargs):
+        client = self._client
+        # SDK가 지원하면 HTTP 타임아웃도 마감 시간에 맞춤 (스트리밍 청크 사이 대기에도 적용됨)
+        if client.native_timeout:
+            kwargs.setdefault("timeout", client.completion_policy.deadline_seconds)
+        submit = getattr(client.inner.chat.completions, "submit", None)
+        return call_with_resilience(
+            lambda: client.inner.chat.completions.create(**kwargs),
+            client.endpoint,
+            client.completion_policy,
+            submit=(lambda: submit(**kwargs)) if submit is not None else None
+        )
+
+class _ResilientEmbeddings:
+    def __init__(self, client: "ResilientOpenAIClient"):
+        self._client = client
+
+    def create(self, **kwargs):
+        client = self._client
+        if client.native_timeout:
+            kwargs.setdefault("timeout", client.embedding_policy.deadline_seconds)
+        submit = getattr(client.inner.embeddings, "submit", None)
+        return call_with_resilience(
+            lambda: client.inner.embeddings.create(**kwargs),
+            client.endpoint,
+            client.embedding_policy,
+            submit=(lambda: submit(**kwargs)) if submit is not None else None
+        )
+
+class ResilientOpenAIClient:
+    """AzureOpenAI 호환 래퍼 (chat.completions.create, embeddings.create)"""
+
+    def __init__(self, inner, endpoint: str, completion_policy: Optional[ResiliencePolicy] = None,
+                 embedding_policy: Optional[ResiliencePolicy] = None):
+        # SDK 자체 재시도와 중복되지 않도록 SDK 재시도는 끔
+        if hasattr(inner, "with_options"):
+            inner = inner.with_options(max_retries=0)
+            self.native_timeout = True
+        else:
+            self.native_timeout = False
+        self.inner = inner
+        self.endpoint = endpoint
+        self.completion_policy = completion_policy or ResiliencePolicy.from_env("OPENAI", 60.0)
+        self.embedding_policy = embedding_policy or ResiliencePolicy.from_env("EMBEDDING", 10.0)
+        self.chat = SimpleNamespace(completions=_ResilientCompletions(self))
+        self.embeddings = _ResilientEmbeddings(self)
+
+def wrap_clients(search_client, openai_client):
+    """
+    검색/OpenAI 클라이언트에 복원력 계층 적용 (RESILIENCE_ENABLED=false면 그대로 반환)
+    OpenAI 클라이언트가 엔드포인트 풀이면 풀이 엔드포인트별 시간 초과/전환을 담당하므로 감싸지 않습니다.
+    (두 계층이 겹치면 재시도 횟수 × 엔드포인트 수만큼 호출하고 하나의 브레이커에 실패가 몰림)
+    """
+    if not is_resilience_enabled():
+        return search_client, openai_client
+
+    search_endpoint = f"search:{os.getenv('AZURE_SEARCH_SERVICE_NAME') or type(search_client).__name__}"
+    if getattr(openai_client, "handles_failover", False):
+        return ResilientSearchClient(search_client, search_endpoint), openai_client
+    openai_endpoint = f"openai:{os.getenv('AZURE_OPENAI_ENDPOINT') or type(openai_client).__name__}"
+    return (
+        ResilientSearchClient(search_client, search_endpoint),
+        ResilientOpenAIClient(openai_client, openai_endpoint)
+    )
@@ -0,0 +1,171 @@
+"""
+검색 유틸리티 모듈
+키워드 검색과 벡터 검색을 동시에 실행하고 Reciprocal Rank Fusion(RRF)으로 합칩니다.
+Azure Search 호출이 실패하면 로컬 인덱스(BM25/벡터)로 대체 검색합니다.
+"""
+
+import os
+import logging
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from embedding_utils import embed_text, is_embedding_configured
+
+logger = logging.getLogger(__name__)
+
+VECTOR_FIELD_NAME = "content_vector"
+
+RETRIEVAL_MODES = {
+    "keyword": "🔤 키워드 검색",
+    "hybrid": "🧬 하이브리드 (키워드 + 벡터)",
+    "bm25": "📚 로컬 BM25 (오프라인)",
+}
+
+# 키워드/벡터 질의를 동시에 보내기 위한 공용 스레드 풀
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RETRIEVAL_MAX_WORKERS", "8")),
+    thread_name_prefix="retrieval"
+)
+
+class SearchResultList(list):
+    """SearchClient.search 결과와 같은 방식으로 사용할 수 있는 결과 목록 (get_count 지원)"""
+
+    def __init__(self, documents: List[Dict], count: Optional[int] = None):
+        super().__init__(documents)
+        self._count = count
+
+    def get_count(self) -> Optional[int]:
+        return self._count
+
+def get_search_top_k() -> int:
+    """검색 결과 개수 (기본값: 3)"""
+    return int(os.getenv("SEARCH_TOP_K", "3"))
+
+def get_document_key(doc: Dict) -> str:
+    """결과 병합에 사용할 문서 식별자"""
+    return doc.get("id") or doc.get("metadata_storage_path") or doc.get("metadata_storage_name") or str(id(doc))
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], k: int = 60, top: Optional[int] = None) -> List[Dict]:
+    """
+    여러 검색 결과 목록을 순위 기반으로 병합
+
+    각 문서의 점수는 sum(1 / (k + rank)) 이며, 병합 점수는 '@search.rrf_score'에 기록됩니다.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Dict] = {}
+
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = get_document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+
+    fused = []
+    for key in sorted(scores, key=scores.get, reverse=True):
+        doc = dict(documents[key])
+        doc["@search.rrf_score"] = scores[key]
+        fused.append(doc)
+
+    return fused[:top] if top else fused
+
+def keyword_search(search_client, question: str, top: int, search_mode: str = "any",
+                   search_filter: Optional[str] = None) -> List[Dict]:
+    """전문(full-text) 키워드 검색"""
+    return list(search_client.search(search_text=question, top=top, search_mode=search_mode, filter=search_filter))
+
+def vector_search(search_client, openai_client, question: str, top: int,
+                  search_filter: Optional[str] = None) -> List[Dict]:
+    """질문 임베딩으로 벡터 필드 최근접 검색"""
+    from azure.search.documents.models import VectorizedQuery
+
+    embedding = embed_text(openai_client, question)
+    vector_query = VectorizedQuery(
+        vector=embedding.tolist(),
+        k_nearest_neighbors=top,
+        fields=VECTOR_FIELD_NAME
+    )
+    return list(search_client.search(search_text=None, vector_queries=[vector_query], top=top, filter=search_filter))
+
+def hybrid_search(search_client, openai_client, question: str, top: int, search_mode: str = "any",
+                  search_filter: Optional[str] = None) -> List[Dict]:
+    """키워드/벡터 검색을 동시에 실행하고 RRF로 병합 (벡터 검색 실패 시 키워드 결과만 사용)"""
+    # 병합 품질을 위해 각 질의는 최종 개수보다 넉넉하게 가져옴
+    candidates = top * 2
+    keyword_future = _executor.submit(keyword_search, search_client, question, candidates, search_mode, search_filter)
+    vector_future = _executor.submit(vector_search, search_client, openai_client, question, candidates, search_filter)
+
+    keyword_results = keyword_future.result()
+    try:
+        vector_results = vector_future.result()
+    except Exception as e:
+        logger.warning(f"벡터 검색 실패, 키워드 결과만 사용합니다: {e}")
+        return keyword_results[:top]
+
+    return reciprocal_rank_fusion([keyword_results, vector_results], top=top)
+
+def get_local_search_client(index_name: str):
+    """인덱스명에 해당하는 로컬 검색기 반환 (없으면 None)"""
+    from bm25_index import get_local_bm25_index
+    return get_local_bm25_index(index_name)
+
+def local_search(openai_client, question: str, index_name: Optional[str], top: int,
+                 search_mode: str = "any", search_filter: Optional[str] = None) -> Optional[List[Dict]]:
+    """
+    로컬 BM25/벡터 인덱스로 검색 (둘 다 있으면 RRF로 병합, search_filter는 문서 id 필터만 지원)
+
+    Returns:
+        검색 결과 목록 (사용할 수 있는 로컬 인덱스가 없으면 None)
+    """
+    from vector_index import get_local_vector_index
+
+    result_lists = []
+    bm25_index = get_local_search_client(index_name)
+    if bm25_index is not None:
+        result_lists.append(list(bm25_index.search(
+            search_text=question, top=top * 2, search_mode=search_mode, filter=search_filter
+        )))
+
+    vector_index = get_local_vector_index(index_name)
+    if vector_index is not None and is_embedding_configured():
+        try:
+            query = SimpleNamespace(vector=embed_text(openai_client, question), k_nearest_neighbors=top * 2)
+            result_lists.append(list(vector_index.search(vector_queries=[query], top=top * 2, filter=search_filter)))
+        except Exception as e:
+            logger.warning(f"로컬 벡터 검색 실패 ({index_name}): {e}")
+
+    if not result_lists:
+        return None
+    if len(result_lists) == 1:
+        return result_lists[0][:top]
+    return reciprocal_rank_fusion(result_lists, top=top)
+
+def retrieve_documents(search_client, openai_client, question: str, retrieval_mode: str = "keyword",
+                       top: Optional[int] = None, search_mode: str = "any", index_name: Optional[str] = None,
+                       search_filter: Optional[str] = None):
+    """
+    챗봇별 검색 방식에 따라 관련 문서 검색
+
+    retrieval_mode가 bm25이면 로컬 인덱스만 사용하고, 그 외에는 Azure Search가
+    실패했을 때 로컬 인덱스(BM25/벡터)가 있으면 대체 검색합니다.
+    search_filter(OData)는 Azure Search에 그대로 전달하고, 로컬 인덱스에서는 문서 id 필터(search.in)만 적용합니다.
+    """
+    top = top or get_search_top_k()
+
+    if retrieval_mode == "bm25":
+        results = local_search(openai_client, question, index_name, top, search_mode, search_filter)
+        if results is not None:
+            return results
+        return search_client.search(search_text=question, top=top, search_mode=search_mode, filter=search_filter)
+
+    try:
+        if retrieval_mode == "hybrid" and is_embedding_configured():
+            return hybrid_search(search_client, openai_client, question, top, search_mode, search_filter)
+        # 대체 검색이 가능하도록 여기서 결과를 받아 둠 (top 개수만큼이라 한 번의 응답으로 끝남)
+        return keyword_search(search_client, question, top, search_mode, search_filter)
+    except Exception as e:
+        results = local_search(openai_client, question, index_name, top, search_mode, search_filter)
+        if results is None:
+            raise
+        logger.warning(f"Azure Search 실패, 로컬 인덱스로 대체 검색합니다 ({index_name}): {e}")
+        return results
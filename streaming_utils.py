@@ -0,0 +1,73 @@
+"""
+스트리밍 응답 유틸리티 모듈
+chat.completions.create(stream=True) 응답을 텍스트 토큰 단위로 풀어주고,
+스트림이 끝나면 전체 답변으로 후처리(캐시 저장 등)를 수행합니다.
+"""
+
+import os
+import logging
+from typing import Callable, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+def is_streaming_enabled() -> bool:
+    """스트리밍 답변 모드 사용 여부 (기본값: 사용)"""
+    return os.getenv("ENABLE_ANSWER_STREAMING", "true").lower() not in ("0", "false", "no")
+
+def iter_completion_text(response, on_complete: Optional[Callable[[str], None]] = None,
+                         on_first_token: Optional[Callable[[], None]] = None,
+                         on_error: Optional[Callable[[str, bool], None]] = None) -> Iterator[str]:
+    """
+    스트리밍 응답에서 텍스트 조각만 순서대로 반환
+
+    Args:
+        response: stream=True로 생성한 chat completion 응답
+        on_complete: 스트림이 정상 종료되면 전체 답변으로 호출되는 콜백
+        on_first_token: 첫 텍스트 조각을 받았을 때 호출되는 콜백 (첫 토큰 지연 측정용)
+        on_error: 스트림이 실패하거나 끝까지 받지 않고 중단되면 (오류 메시지, 중단 여부)로 호출되는 콜백
+    """
+    parts = []
+    error: Optional[str] = None
+    completed = False
+    try:
+        for chunk in response:
+            # Azure는 첫 청크에 choices 없이 콘텐츠 필터 결과만 보내는 경우가 있음
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts and on_first_token:
+                    on_first_token()
+                parts.append(delta)
+                yield delta
+        completed = True
+    except Exception as e:
+        logger.error(f"스트리밍 답변 수신 실패: {e}")
+        error = str(e)
+    finally:
+        # 받는 쪽이 끝까지 읽지 않고 닫음 (세션 종료, 화면 이동 등)
+        if not completed and error is None:
+            _notify(on_error, "스트리밍 답변 수신이 중단되었습니다.", True)
+
+    if error is not None:
+        _notify(on_error, error, False)
+        yield f"\n\n❌ 답변 생성이 중단되었습니다: {error}"
+        return
+
+    if on_complete:
+        try:
+            on_complete("".join(parts))
+        except Exception as e:
+            logger.error(f"스트리밍 완료 후처리 실패: {e}")
+
+def _notify(callback: Optional[Callable[[str, bool], None]], message: str, aborted: bool):
+    if callback is None:
+        return
+    try:
+        callback(message, aborted)
+    except Exception as e:
+        logger.error(f"스트리밍 오류 후처리 실패: {e}")
+
+def iter_static_text(text: str) -> Iterable[str]:
+    """이미 완성된 답변(캐시 히트, 오류 메시지)을 스트림 형태로 반환"""
+    return iter([text])
@@ -0,0 +1,291 @@
+"""
+로컬 스텁 클라이언트 모듈
+Azure Search / Azure OpenAI 없이 채팅 경로를 실행할 수 있도록
+SearchClient, AzureOpenAI와 같은 인터페이스의 인메모리 스텁을 제공합니다.
+USE_STUB_CLIENTS=true 로 설정하면 채팅 화면에서 스텁을 사용합니다.
+STUB_FAULT_* 설정으로 오류/응답 지연을 주입해 복원력 계층을 시험할 수 있습니다.
+STUB_*_LATENCY_SECONDS 에는 고정값(0.2) 외에 분포(uniform:0.1,0.5 / lognormal:0.3,0.5 / normal:0.3,0.1)도 쓸 수 있습니다.
+"""
+
+import os
+import math
+import time
+import random
+import hashlib
+import logging
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+from text_utils import tokenize
+from embedding_utils import normalize_rows
+from retrieval_utils import SearchResultList
+
+logger = logging.getLogger(__name__)
+
+STUB_EMBEDDING_DIMENSIONS = 256
+
+SAMPLE_DOCUMENTS = [
+    {
+        "metadata_storage_name": "휴가규정.txt",
+        "content": "연차 휴가는 인사 시스템에서 신청합니다.\n\n휴가 신청은 사용 예정일 3일 전까지 팀장 승인을 받아야 합니다."
+    },
+    {
+        "metadata_storage_name": "출장안내.txt",
+        "content": "출장비는 출장 종료 후 7일 이내에 정산합니다.\n\n숙박비는 1박 기준 상한액 안에서 실비로 지급합니다."
+    },
+    {
+        "metadata_storage_name": "사무실이용.txt",
+        "content": "사무실은 평일 오전 8시에 열고 오후 10시에 닫습니다.\n\n주말 출입은 사전 신청이 필요합니다."
+    },
+]
+
+class LatencyDistribution:
+    """
+    스텁 응답 지연 분포
+
+    - constant: 항상 value초
+    - uniform: low~high초 균등 분포
+    - lognormal: 중앙값 median초, 로그 표준편차 sigma (긴 꼬리 지연)
+    - normal: 평균 mean초, 표준편차 std (0 미만은 0)
+    """
+
+    KINDS = ("constant", "uniform", "lognormal", "normal")
+
+    def __init__(self, kind: str = "constant", a: float = 0.0, b: float = 0.0, seed: Optional[int] = None):
+        if kind not in self.KINDS:
+            raise ValueError(f"알 수 없는 지연 분포: {kind} (사용 가능: {', '.join(self.KINDS)})")
+        self.kind = kind
+        self.a = a
+        self.b = b
+        self._random = random.Random(seed)
+
+    @classmethod
+    def parse(cls, spec: Union[str, float, None]) -> "LatencyDistribution":
+        """'0.2', 'uniform:0.1,0.5', 'lognormal:0.3,0.5', 'normal:0.3,0.1' 형식 해석"""
+        if isinstance(spec, LatencyDistribution):
+            return spec
+        if spec is None or spec == "":
+            return cls()
+        if isinstance(spec, (int, float)):
+            return cls("constant", float(spec))
+        kind, _, params = str(spec).partition(":")
+        if not params:
+            return cls("constant", float(kind))
+        values = [float(v) for v in params.split(",")]
+        return cls(kind, values[0], values[1] if len(values) > 1 else 0.0)
+
+    def sample(self) -> float:
+        if self.kind == "constant":
+            return self.a
+        if self.kind == "uniform":
+            return self._random.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return self._random.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+        return max(0.0, self._random.gauss(self.a, self.b))
+
+    def __bool__(self) -> bool:
+        return self.kind != "constant" or self.a > 0
+
+    def __repr__(self) -> str:
+        return f"{self.kind}({self.a:g}, {self.b:g})" if self.kind != "constant" else f"{self.a:g}s"
+
+class StubServiceError(Exception):
+    """HTTP 오류 응답을 흉내 내는 예외 (status_code, response.headers 제공)"""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"스텁 서비스 오류 (HTTP {status_code})")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+class FaultInjector:
+    """
+    스텁 호출에 장애를 주입 (복원력 계층 테스트용)
+
+    error_rate 확률로 status_code 오류를, hang_rate 확률로 hang_seconds 동안 응답 지연을 발생시킵니다.
+    """
+
+    def __init__(self, error_rate: float = 0.0, status_code: int = 503, retry_after: Optional[float] = None,
+                 hang_rate: float = 0.0, hang_seconds: float = 30.0, seed: Optional[int] = None):
+        self.error_rate = error_rate
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self._random = random.Random(seed)
+        self.injected_errors = 0
+        self.injected_hangs = 0
+
+    @classmethod
+    def from_env(cls) -> "FaultInjector":
+        retry_after = os.getenv("STUB_FAULT_RETRY_AFTER")
+        return cls(
+            error_rate=float(os.getenv("STUB_FAULT_ERROR_RATE", "0")),
+            status_code=int(os.getenv("STUB_FAULT_STATUS", "503")),
+            retry_after=float(retry_after) if retry_after else None,
+            hang_rate=float(os.getenv("STUB_FAULT_HANG_RATE", "0")),
+            hang_seconds=float(os.getenv("STUB_FAULT_HANG_SECONDS", "30"))
+        )
+
+    def maybe_fail(self):
+        roll = self._random.random()
+        if roll < self.error_rate:
+            self.injected_errors += 1
+            raise StubServiceError(self.status_code, self.retry_after)
+        if roll < self.error_rate + self.hang_rate:
+            self.injected_hangs += 1
+            time.sleep(self.hang_seconds)
+
+def is_stub_mode() -> bool:
+    """스텁 클라이언트 사용 여부 (기본값: 사용 안 함)"""
+    return os.getenv("USE_STUB_CLIENTS", "false").lower() in ("1", "true", "yes")
+
+def stub_embedding(texts: List[str], dimensions: int = STUB_EMBEDDING_DIMENSIONS) -> np.ndarray:
+    """토큰 해시 기반 결정적 임베딩 (같은 단어/글자 bigram을 공유하면 유사도가 높아짐)"""
+    vectors = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in tokenize(text):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            vectors[row, int.from_bytes(digest[:4], "little") % dimensions] += 1.0
+    return normalize_rows(vectors)
+
+def load_stub_documents(folder: Optional[str] = None) -> List[Dict]:
+    """로컬 폴더의 텍스트 파일을 스텁 문서로 로드 (폴더가 없으면 샘플 문서 사용)"""
+    documents = []
+    if folder and os.path.isdir(folder):
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path) and name.lower().endswith((".txt", ".md", ".csv", ".json", ".html")):
+                with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                    documents.append({"metadata_storage_name": name, "content": f.read()})
+    if not documents:
+        documents = [dict(doc) for doc in SAMPLE_DOCUMENTS]
+
+    for i, doc in enumerate(documents):
+        doc.setdefault("id", f"stub-{i}")
+        doc.setdefault("metadata_storage_path", f"stub://{doc['metadata_storage_name']}")
+    return documents
+
+class StubSearchClient:
+    """SearchClient.search() 를 흉내 내는 인메모리 검색 스텁 (키워드 + 벡터)"""
+
+    def __init__(self, documents: Optional[List[Dict]] = None,
+                 latency_seconds: Union[float, str, LatencyDistribution] = 0.0,
+                 faults: Optional[FaultInjector] = None):
+        self.documents = documents if documents is not None else load_stub_documents()
+        self.latency = LatencyDistribution.parse(latency_seconds)
+        self.faults = faults
+        self._doc_terms = [set(tokenize(doc.get("content", ""))) for doc in self.documents]
+        self._doc_vectors = stub_embedding([doc.get("content", "") for doc in self.documents])
+
+    def search(self, search_text: Optional[str] = None, top: int = 50, search_mode: str = "any",
+               vector_queries=None, include_total_count: bool = False, **kwargs) -> SearchResultList:
+        if self.faults:
+            self.faults.maybe_fail()
+        if self.latency:
+            time.sleep(self.latency.sample())
+
+        if vector_queries:
+            query = vector_queries[0]
+            vector = np.asarray(query.vector, dtype=np.float32)
+            if vector.shape[0] != self._doc_vectors.shape[1]:
+                raise ValueError("스텁 벡터 차원이 일치하지 않습니다.")
+            scores = self._doc_vectors @ vector
+            ranked = [(float(scores[i]), i) for i in np.argsort(-scores)[:query.k_nearest_neighbors or top]]
+        elif not search_text or search_text.strip() == "*":
+            ranked = [(1.0, i) for i in range(len(self.documents))]
+        else:
+            query_terms = set(tokenize(search_text))
+            ranked = []
+            for i, terms in enumerate(self._doc_terms):
+                matched = len(query_terms & terms)
+                if matched and (search_mode != "all" or matched == len(query_terms)):
+                    ranked.append((matched / len(query_terms), i))
+            ranked.sort(key=lambda item: item[0], reverse=True)
+
+        results = []
+        for score, i in ranked[:top]:
+            doc = dict(self.documents[i])
+            doc["@search.score"] = score
+            results.append(doc)
+
+        return SearchResultList(results, len(ranked) if include_total_count else None)
+
+class _StubEmbeddings:
+    def __init__(self, client: "StubOpenAIClient"):
+        self._client = client
+
+    def create(self, model: str = None, input=None, dimensions: Optional[int] = None, **kwargs):
+        self._client._sleep()
+        texts = [input] if isinstance(input, str) else list(input)
+        vectors = stub_embedding(texts, dimensions or STUB_EMBEDDING_DIMENSIONS)
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=vector.tolist()) for i, vector in enumerate(vectors)],
+            usage=SimpleNamespace(prompt_tokens=sum(len(t) for t in texts), total_tokens=sum(len(t) for t in texts))
+        )
+
+class _StubCompletions:
+    def __init__(self, client: "StubOpenAIClient"):
+        self._client = client
+
+    def create(self, model: str = None, messages=None, stream: bool = False, **kwargs):
+        self._client._sleep()
+        question = messages[-1]["content"].rsplit("질문:", 1)[-1].strip() if messages else ""
+        answer = f"[스텁 답변] '{question}'에 대한 문서 기반 답변입니다."
+        usage = SimpleNamespace(
+            prompt_tokens=sum(len(m.get("content", "")) for m in messages or []),
+            completion_tokens=len(answer),
+            total_tokens=0
+        )
+
+        if stream:
+            return self._stream(answer)
+
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=answer), finish_reason="stop")],
+            usage=usage,
+            model=model
+        )
+
+    def _stream(self, answer: str) -> Iterator:
+        for word in answer.split(" "):
+            if self._client.token_latency:
+                time.sleep(self._client.token_latency.sample())
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+class StubOpenAIClient:
+    """AzureOpenAI 의 chat.completions / embeddings 를 흉내 내는 스텁"""
+
+    def __init__(self, latency_seconds: Union[float, str, LatencyDistribution] = 0.0,
+                 token_latency_seconds: Union[float, str, LatencyDistribution] = 0.0,
+                 faults: Optional[FaultInjector] = None):
+        self.latency = LatencyDistribution.parse(latency_seconds)
+        self.token_latency = LatencyDistribution.parse(token_latency_seconds)
+        self.faults = faults
+        self.chat = SimpleNamespace(completions=_StubCompletions(self))
+        self.embeddings = _StubEmbeddings(self)
+
+    def _sleep(self):
+        if self.faults:
+            self.faults.maybe_fail()
+        if self.latency:
+            time.sleep(self.latency.sample())
+
+def create_stub_clients(index_name: str = None):
+    """채팅 화면용 (검색 스텁, OpenAI 스텁) 생성"""
+    documents = load_stub_documents(os.getenv("STUB_DOCS_DIR"))
+    logger.info(f"스텁 클라이언트 사용 (인덱스: {index_name}, 문서 {len(documents)}개)")
+    return (
+        StubSearchClient(
+            documents,
+            latency_seconds=os.getenv("STUB_SEARCH_LATENCY_SECONDS", "0"),
+            faults=FaultInjector.from_env()
+        ),
+        StubOpenAIClient(
+            latency_seconds=os.getenv("STUB_OPENAI_LATENCY_SECONDS", "0"),
+            token_latency_seconds=os.getenv("STUB_TOKEN_LATENCY_SECONDS", "0"),
+            faults=FaultInjector.from_env()
+        )
+    )
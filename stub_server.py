@@ -0,0 +1,213 @@
+"""
+로컬 Azure OpenAI 스텁 HTTP 서버
+Azure OpenAI REST API(chat/completions, embeddings)와 같은 형식으로 응답하는 서버를 띄워,
+실제 openai SDK 클라이언트와 엔드포인트 풀(AZURE_OPENAI_ENDPOINTS)을 Azure 없이 시험합니다.
+응답 지연(고정값 또는 uniform:/lognormal:/normal: 분포), 오류(429/5xx) 비율,
+분당 토큰 한도(x-ratelimit-remaining-* 헤더)를 주입할 수 있습니다.
+
+사용법:
+    python stub_server.py --port 8101 --latency 0.2
+    python stub_server.py --port 8102 --latency lognormal:0.8,0.5 --error-rate 0.2 --status 429 --tpm 50000
+"""
+
+import json
+import time
+import uuid
+import random
+import logging
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Union
+
+from stub_clients import StubOpenAIClient, LatencyDistribution, stub_embedding, STUB_EMBEDDING_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+class StubOpenAIServer:
+    """스레드에서 실행되는 Azure OpenAI 스텁 서버"""
+
+    def __init__(self, port: int = 0, host: str = "127.0.0.1",
+                 latency_seconds: Union[float, str, LatencyDistribution] = 0.0,
+                 token_latency_seconds: Union[float, str, LatencyDistribution] = 0.0,
+                 error_rate: float = 0.0, status_code: int = 503,
+                 retry_after: Optional[float] = None, tpm: int = 0, seed: Optional[int] = None):
+        self.latency = LatencyDistribution.parse(latency_seconds)
+        self.token_latency = LatencyDistribution.parse(token_latency_seconds)
+        self.error_rate = error_rate
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.tpm = tpm
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._usage = deque()
+        self._client = StubOpenAIClient()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-openai-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _remaining_tokens(self, used: int = 0) -> Optional[int]:
+        """최근 1분 사용량 기준 남은 토큰 수 (한도가 없으면 None)"""
+        if not self.tpm:
+            return None
+        now = time.time()
+        with self._lock:
+            while self._usage and now - self._usage[0][0] > 60:
+                self._usage.popleft()
+            if used:
+                self._usage.append((now, used))
+            return max(0, self.tpm - sum(tokens for _, tokens in self._usage))
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def _send_json(self, status: int, body: dict, headers: Optional[dict] = None):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, str(value))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _quota_headers(self, used: int = 0) -> dict:
+                remaining = server._remaining_tokens(used)
+                return {} if remaining is None else {"x-ratelimit-remaining-tokens": remaining}
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                # /openai/deployments/{deployment}/chat/completions?api-version=...
+                path = self.path.split("?", 1)[0].rstrip("/")
+                parts = path.split("/")
+                deployment = parts[3] if len(parts) > 3 else body.get("model")
+
+                if server.latency:
+                    time.sleep(server.latency.sample())
+
+                remaining = server._remaining_tokens()
+                if server._should_fail() or remaining == 0:
+                    status = 429 if remaining == 0 else server.status_code
+                    headers = {"Retry-After": server.retry_after} if server.retry_after else {}
+                    self._send_json(status, {"error": {"code": str(status), "message": "스텁 서버 오류 주입"}}, headers)
+                    return
+
+                if path.endswith("/chat/completions"):
+                    self._chat(deployment, body)
+                elif path.endswith("/embeddings"):
+                    self._embeddings(deployment, body)
+                else:
+                    self._send_json(404, {"error": {"code": "404", "message": f"지원하지 않는 경로: {path}"}})
+
+            def _chat(self, deployment: str, body: dict):
+                response = server._client.chat.completions.create(model=deployment, messages=body.get("messages"))
+                answer = response.choices[0].message.content
+                usage = {
+                    "prompt_tokens": response.usage.prompt_tokens,
+                    "completion_tokens": response.usage.completion_tokens,
+                    "total_tokens": response.usage.prompt_tokens + response.usage.completion_tokens,
+                }
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                created = int(time.time())
+                headers = self._quota_headers(usage["total_tokens"])
+
+                if not body.get("stream"):
+                    self._send_json(200, {
+                        "id": completion_id, "object": "chat.completion", "created": created, "model": deployment,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                                     "finish_reason": "stop"}],
+                        "usage": usage,
+                    }, headers)
+                    return
+
+                # 스트리밍: SSE 형식으로 단어 단위 전송
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                for key, value in headers.items():
+                    self.send_header(key, str(value))
+                self.end_headers()
+                words = answer.split(" ")
+                for i, word in enumerate(words):
+                    if server.token_latency:
+                        time.sleep(server.token_latency.sample())
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": deployment,
+                        "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")},
+                                     "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _embeddings(self, deployment: str, body: dict):
+                texts = body.get("input")
+                texts = [texts] if isinstance(texts, str) else list(texts or [])
+                vectors = stub_embedding(texts, body.get("dimensions") or STUB_EMBEDDING_DIMENSIONS)
+                tokens = sum(len(text) for text in texts)
+                self._send_json(200, {
+                    "object": "list",
+                    "data": [{"object": "embedding", "index": i, "embedding": vector.tolist()}
+                             for i, vector in enumerate(vectors)],
+                    "model": deployment,
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                }, self._quota_headers(tokens))
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 Azure OpenAI 스텁 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--latency", default="0", help="응답 전 지연 (초 또는 uniform:0.1,0.5 같은 분포)")
+    parser.add_argument("--token-latency", default="0", help="스트리밍 조각 사이 지연 (초 또는 분포)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="오류 응답 비율 (0~1)")
+    parser.add_argument("--status", type=int, default=503, help="오류 응답 상태 코드")
+    parser.add_argument("--retry-after", type=float, default=None, help="오류 응답의 Retry-After (초)")
+    parser.add_argument("--tpm", type=int, default=0, help="분당 토큰 한도 (0이면 제한 없음)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = StubOpenAIServer(
+        port=args.port, host=args.host, latency_seconds=args.latency, token_latency_seconds=args.token_latency,
+        error_rate=args.error_rate, status_code=args.status, retry_after=args.retry_after, tpm=args.tpm
+    )
+    print(f"스텁 OpenAI 서버 실행 중: {server.url} (종료: Ctrl+C)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
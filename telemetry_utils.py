@@ -0,0 +1,272 @@
+"""
+질문 처리 텔레메트리 모듈
+RAG 엔진의 단계별 소요 시간과 토큰 사용량을 질문 단위로 모아
+백그라운드 스레드에서 SQLite(chatbots.db 옆의 telemetry.db)에 기록합니다.
+관리자 화면에서 챗봇/단계별 p50/p95/p99 지연 시간을 조회할 때 사용합니다.
+"""
+
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 대시보드에 표시할 지표 (컬럼명: 표시명)
+LATENCY_STAGES = {
+    "search_ms": "검색",
+    "rerank_ms": "재순위화",
+    "context_ms": "컨텍스트 구성",
+    "ttft_ms": "첫 토큰",
+    "generate_ms": "답변 생성",
+    "total_ms": "전체",
+}
+TOKEN_METRICS = {
+    "context_tokens": "컨텍스트 토큰",
+    "prompt_tokens": "프롬프트 토큰",
+    "completion_tokens": "답변 토큰",
+}
+
+_COLUMNS = [
+    "created_at", "chatbot_name", "index_name", "retrieval_mode", "cache_hit", "hit_count",
+    "search_ms", "rerank_ms", "context_ms", "ttft_ms", "generate_ms", "total_ms",
+    "context_tokens", "prompt_tokens", "completion_tokens", "error",
+    "deployment", "route_tier", "route_reason", "cost", "baseline_cost", "status"
+]
+
+# 기존 telemetry.db에 없을 수 있는 컬럼 (컬럼명: 타입)
+_ADDED_COLUMNS = {
+    "deployment": "TEXT",
+    "route_tier": "TEXT",
+    "route_reason": "TEXT",
+    "cost": "REAL",
+    "baseline_cost": "REAL",
+    "status": "TEXT",
+}
+
+def is_telemetry_enabled() -> bool:
+    """텔레메트리 기록 여부 (기본값: 사용)"""
+    return os.getenv("ENABLE_TELEMETRY", "true").lower() in ("1", "true", "yes")
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """p(0~100) 백분위수 (값이 없으면 None)"""
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return float(np.percentile(np.asarray(values, dtype=np.float64), p))
+
+class TelemetryStore:
+    """질문 단위 텔레메트리를 비동기로 SQLite에 기록하고 조회"""
+
+    def __init__(self, db_path: str = "telemetry.db", max_queue: int = 10000, batch_size: int = 200):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=max_queue)
+        self._init_database()
+        self._thread = threading.Thread(target=self._writer_loop, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_database(self):
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS query_telemetry (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    chatbot_name TEXT,
+                    index_name TEXT,
+                    retrieval_mode TEXT,
+                    cache_hit INTEGER DEFAULT 0,
+                    hit_count INTEGER,
+                    search_ms REAL,
+                    rerank_ms REAL,
+                    context_ms REAL,
+                    ttft_ms REAL,
+                    generate_ms REAL,
+                    total_ms REAL,
+                    context_tokens INTEGER,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    error TEXT
+                )
+            ''')
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(query_telemetry)")}
+            for column, column_type in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE query_telemetry ADD COLUMN {column} {column_type}")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_query_telemetry_time ON query_telemetry (created_at, chatbot_name)"
+            )
+
+    def record(self, row: Dict):
+        """기록 요청을 큐에 넣음 (요청 경로를 막지 않도록 큐가 가득 차면 버림)"""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _writer_loop(self):
+        while True:
+            row = self._queue.get()
+            if row is None:
+                return
+            batch = [row]
+            # 쌓여 있는 기록은 한 트랜잭션으로 묶어서 기록
+            while len(batch) < self.batch_size:
+                try:
+                    row = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is None:
+                    self._write(batch)
+                    return
+                batch.append(row)
+            self._write(batch)
+
+    def _write(self, batch: List[Dict]):
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    f"INSERT INTO query_telemetry ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    [tuple(row.get(column) for column in _COLUMNS) for row in batch]
+                )
+        except Exception as e:
+            logger.error(f"텔레메트리 기록 실패 ({len(batch)}건): {e}")
+
+    def flush(self, timeout: float = 5.0):
+        """큐에 남은 기록을 모두 쓰고 기록 스레드 종료"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def get_rows(self, window_seconds: Optional[float] = None, chatbot_name: Optional[str] = None) -> List[Dict]:
+        """기간/챗봇 조건에 맞는 기록 조회"""
+        query = f"SELECT {', '.join(_COLUMNS)} FROM query_telemetry WHERE 1=1"
+        params = []
+        if window_seconds:
+            query += " AND created_at >= ?"
+            params.append(time.time() - window_seconds)
+        if chatbot_name:
+            query += " AND chatbot_name = ?"
+            params.append(chatbot_name)
+
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def get_chatbot_names(self) -> List[str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT chatbot_name FROM query_telemetry WHERE chatbot_name IS NOT NULL ORDER BY chatbot_name"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_summary(self, window_seconds: Optional[float] = None, chatbot_name: Optional[str] = None) -> List[Dict]:
+        """
+        챗봇별 x 지표별 p50/p95/p99 요약
+
+        캐시 히트 질문은 검색/생성 단계가 없으므로 전체 시간(total_ms)에만 포함됩니다.
+        """
+        rows = self.get_rows(window_seconds, chatbot_name)
+        by_chatbot: Dict[str, List[Dict]] = {}
+        for row in rows:
+            by_chatbot.setdefault(row["chatbot_name"] or "-", []).append(row)
+
+        summary = []
+        for name in sorted(by_chatbot):
+            group = by_chatbot[name]
+            for column, label in {**LATENCY_STAGES, **TOKEN_METRICS}.items():
+                values = [row[column] for row in group if row[column] is not None]
+                if not values:
+                    continue
+                summary.append({
+                    "chatbot_name": name,
+                    "metric": label,
+                    "count": len(values),
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                    "p99": percentile(values, 99),
+                })
+        return summary
+
+    def get_routing_summary(self, window_seconds: Optional[float] = None,
+                            chatbot_name: Optional[str] = None) -> List[Dict]:
+        """
+        챗봇 x 배포별 질문 수, 지연 시간, 비용과 절감액
+
+        절감액은 같은 토큰을 가장 큰 배포로 처리했을 때의 비용(baseline_cost)과의 차이입니다.
+        """
+        groups: Dict[tuple, List[Dict]] = {}
+        for row in self.get_rows(window_seconds, chatbot_name):
+            if row["deployment"] and not row["cache_hit"]:
+                groups.setdefault((row["chatbot_name"] or "-", row["deployment"]), []).append(row)
+
+        summary = []
+        for (name, deployment), group in sorted(groups.items()):
+            cost = sum(row["cost"] or 0.0 for row in group)
+            baseline = sum(row["baseline_cost"] or 0.0 for row in group)
+            summary.append({
+                "chatbot_name": name,
+                "deployment": deployment,
+                "route_tier": group[-1]["route_tier"],
+                "count": len(group),
+                "p50_total_ms": percentile([row["total_ms"] for row in group], 50),
+                "p95_total_ms": percentile([row["total_ms"] for row in group], 95),
+                "cost": cost,
+                "savings": baseline - cost,
+            })
+        return summary
+
+def _build_row(request) -> Dict:
+    """RAGRequest의 단계별 결과를 텔레메트리 행으로 변환"""
+    timings = request.timings
+    context = request.context or {}
+    row = {
+        "created_at": time.time(),
+        "chatbot_name": request.chatbot_name,
+        "index_name": request.index_name,
+        "retrieval_mode": request.retrieval_mode,
+        "cache_hit": int(request.cache_hit),
+        "hit_count": None if request.cache_hit else request.hit_count,
+        "search_ms": timings.get("retrieve"),
+        "rerank_ms": timings.get("rerank"),
+        "context_ms": timings.get("context"),
+        # 스트리밍이 아니면 첫 토큰 시점 = 응답 수신 시점
+        "ttft_ms": timings.get("first_token", timings.get("generate")),
+        "generate_ms": timings.get("generate_stream", timings.get("generate")),
+        "total_ms": timings.get("total"),
+        "context_tokens": context.get("tokens_used"),
+        "prompt_tokens": request.prompt_tokens or None,
+        "completion_tokens": request.completion_tokens or None,
+        "error": request.error,
+        # ok / error / aborted (스트리밍 답변을 끝까지 받지 않고 중단)
+        "status": "aborted" if getattr(request, "aborted", False) else ("error" if request.error else "ok"),
+        "deployment": request.deployment,
+    }
+    route = getattr(request, "route", None)
+    if route is not None:
+        row.update(route.estimate_costs((request.prompt_tokens or 0) + (request.completion_tokens or 0)))
+        row["route_tier"] = route.deployment.tier
+        row["route_reason"] = route.reason
+    return row
+
+def telemetry_hook(stage: str, elapsed_ms: float, request):
+    """RAG 엔진 타이밍 훅: 질문 처리가 끝나면(total) 한 행을 기록"""
+    if stage == "total" and is_telemetry_enabled():
+        telemetry_store.record(_build_row(request))
+
+# 프로세스 전체에서 공유하는 텔레메트리 저장소
+telemetry_store = TelemetryStore(db_path=os.getenv("TELEMETRY_DB_PATH", "telemetry.db"))
+atexit.register(telemetry_store.flush)
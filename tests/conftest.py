@@ -0,0 +1,69 @@
+"""
+pytest 공통 설정
+저장소 루트의 모듈을 import할 수 있도록 경로를 추가하고, Azure 없이 stub_clients로 테스트합니다.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_utils import AnswerCache
+from rag_engine import AnswerCacheStage, RAGEngine
+from stub_clients import StubOpenAIClient, StubSearchClient
+
+class FakeClock:
+    """time.monotonic 대체용 수동 시계"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+class RecordingOpenAIClient(StubOpenAIClient):
+    """chat.completions.create 호출 인자를 기록하는 OpenAI 스텁"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+        create = self.chat.completions.create
+
+        def _create(**call_kwargs):
+            self.calls.append(call_kwargs)
+            return create(**call_kwargs)
+
+        self.chat.completions.create = _create
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic을 수동으로 진행하는 시계로 바꿈"""
+    fake = FakeClock()
+    monkeypatch.setattr("time.monotonic", fake)
+    return fake
+
+@pytest.fixture
+def search_client():
+    return StubSearchClient()
+
+@pytest.fixture
+def openai_client():
+    return RecordingOpenAIClient()
+
+@pytest.fixture
+def answer_cache(tmp_path):
+    """테스트마다 새 SQLite 파일을 쓰는 답변 캐시"""
+    return AnswerCache(db_path=str(tmp_path / "answer_cache.db"))
+
+@pytest.fixture
+def make_engine(answer_cache):
+    """기본 단계 + 테스트용 답변 캐시로 엔진 생성 (전역 텔레메트리/캡처 훅은 등록하지 않음)"""
+    def _make(**kwargs):
+        kwargs.setdefault("cache", AnswerCacheStage(exact_cache=answer_cache, semantic=None))
+        return RAGEngine(**kwargs)
+    return _make
@@ -0,0 +1,37 @@
+import pytest
+
+from bm25_index import LocalBM25Index, make_documents
+from followup_utils import build_id_filter
+from stub_clients import load_stub_documents
+
+def test_search_ranks_matching_documents_first():
+    index = LocalBM25Index().build(load_stub_documents())
+
+    results = list(index.search(search_text="출장비 정산", top=2, include_total_count=True))
+
+    assert results[0]["metadata_storage_name"] == "출장안내.txt"
+    assert results[0]["@search.score"] > 0
+
+def test_search_mode_all_requires_every_term():
+    index = LocalBM25Index().build(load_stub_documents())
+
+    assert [doc["metadata_storage_name"] for doc in index.search(search_text="출장비 휴가", search_mode="all")] == []
+    assert len(list(index.search(search_text="출장비 휴가", search_mode="any"))) == 2
+
+def test_saved_index_loads_with_same_results(tmp_path):
+    index = LocalBM25Index().build(make_documents([("guide.txt", "연차 휴가는 인사 시스템에서 신청합니다.")], 0))
+    index.save(str(tmp_path / "bm25"))
+
+    loaded = LocalBM25Index.load(str(tmp_path / "bm25"))
+
+    assert loaded.document_count == 1
+    assert list(loaded.search(search_text="연차")) == list(index.search(search_text="연차"))
+
+def test_id_filter_limits_results_and_other_filters_are_rejected():
+    index = LocalBM25Index().build(load_stub_documents())
+
+    results = list(index.search(search_text="신청", filter=build_id_filter(["stub-2"])))
+
+    assert [doc["id"] for doc in results] == ["stub-2"]
+    with pytest.raises(ValueError):
+        index.search(search_text="신청", filter="category eq 'hr'")
@@ -0,0 +1,75 @@
+import numpy as np
+
+from cache_utils import AnswerCache, SemanticAnswerCache, make_cache_key, normalize_question
+
+def test_question_normalization_ignores_case_punctuation_and_spacing():
+    assert normalize_question("  연차 휴가,   신청 방법은?? ") == "연차 휴가 신청 방법은"
+    assert make_cache_key("guide", 3, "Leave POLICY?") == "guide:3:leave policy"
+
+def test_l2_entries_survive_a_new_process(answer_cache):
+    answer_cache.set("guide", 1, "연차 휴가 신청", "인사 시스템에서 신청합니다.", ["휴가규정.txt"])
+
+    restarted = AnswerCache(db_path=answer_cache.db_path)
+
+    assert restarted.get("guide", 1, "연차 휴가 신청?") == ("인사 시스템에서 신청합니다.", ["휴가규정.txt"])
+    assert restarted.get_stats()["l2_hits"] == 1
+
+def test_index_version_is_part_of_the_key(answer_cache):
+    answer_cache.set("guide", 1, "연차 휴가 신청", "v1 답변", [])
+
+    assert answer_cache.get("guide", 2, "연차 휴가 신청") is None
+    assert answer_cache.get("guide", 1, "연차 휴가 신청") == ("v1 답변", [])
+
+def test_invalidate_keeps_only_the_current_version(answer_cache):
+    answer_cache.set("guide", 1, "q", "old", [])
+    answer_cache.set("guide", 2, "q", "new", [])
+    answer_cache.set("other", 1, "q", "other", [])
+
+    removed = answer_cache.invalidate_index("guide", keep_version=2)
+
+    assert removed == 1
+    assert answer_cache.get("guide", 1, "q") is None
+    assert answer_cache.get("guide", 2, "q") == ("new", [])
+    assert answer_cache.get("other", 1, "q") == ("other", [])
+
+def test_l1_evicts_least_recently_used(tmp_path):
+    cache = AnswerCache(db_path=str(tmp_path / "cache.db"), max_entries=2)
+    cache.set("guide", 1, "a", "A", [])
+    cache.set("guide", 1, "b", "B", [])
+    cache.get("guide", 1, "a")
+    cache.set("guide", 1, "c", "C", [])
+
+    assert cache.get_stats()["l1_entries"] == 2
+    assert "guide:1:b" not in cache._l1
+
+def _unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def test_semantic_cache_returns_answer_for_similar_question():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.set("guide", 1, _unit(1, 0, 0), "연차 신청 방법", "인사 시스템에서 신청합니다.", ["휴가규정.txt"])
+
+    assert cache.get("guide", 1, _unit(1, 0.1, 0)) == ("인사 시스템에서 신청합니다.", ["휴가규정.txt"])
+    assert cache.get("guide", 1, _unit(0, 1, 0)) is None
+    assert cache.get_stats()["hits"] == 1
+
+def test_semantic_cache_is_per_index_and_version():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.set("guide", 1, _unit(1, 0), "q", "v1", [])
+
+    assert cache.get("other", 1, _unit(1, 0)) is None
+    assert cache.get("guide", 2, _unit(1, 0)) is None
+    # 새 버전 조회로 저장소가 교체되어 이전 버전 답변은 더 이상 쓰지 않음
+    assert cache.get("guide", 1, _unit(1, 0)) is None
+
+def test_semantic_cache_overwrites_least_recently_used_when_full():
+    cache = SemanticAnswerCache(threshold=0.99, max_entries_per_index=2)
+    cache.set("guide", 1, _unit(1, 0, 0), "a", "A", [])
+    cache.set("guide", 1, _unit(0, 1, 0), "b", "B", [])
+    cache.get("guide", 1, _unit(1, 0, 0))
+    cache.set("guide", 1, _unit(0, 0, 1), "c", "C", [])
+
+    assert cache.get("guide", 1, _unit(1, 0, 0)) == ("A", [])
+    assert cache.get("guide", 1, _unit(0, 1, 0)) is None
+    assert cache.get_stats()["entries"] == 2
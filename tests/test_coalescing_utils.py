@@ -0,0 +1,60 @@
+import threading
+
+from coalescing_utils import SingleFlight
+
+def test_first_caller_leads_and_concurrent_callers_follow():
+    flights = SingleFlight()
+
+    leader_flight, is_leader = flights.join(("idx", "연차 휴가"))
+    follower_flight, follower_is_leader = flights.join(("idx", "연차 휴가"))
+    other_flight, other_is_leader = flights.join(("idx", "출장비"))
+
+    assert is_leader and not follower_is_leader and other_is_leader
+    assert follower_flight is leader_flight
+    assert other_flight is not leader_flight
+    assert leader_flight.followers == 1
+    assert flights.get_stats() == {"leaders": 2, "followers": 1, "in_flight": 2}
+
+def test_follower_receives_sources_and_all_chunks():
+    flights = SingleFlight()
+    key = ("idx", "연차 휴가")
+    flight, _ = flights.join(key)
+    follower, _ = flights.join(key)
+    received = {}
+
+    def follow():
+        received["ready"] = follower.wait_ready(timeout=5)
+        received["text"] = follower.text()
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    flight.append("연차는 ")
+    flight.publish(["휴가규정.txt"])
+    flight.append("인사 시스템에서 신청합니다.")
+    flight.finish()
+    thread.join(timeout=5)
+
+    assert received == {"ready": True, "text": "연차는 인사 시스템에서 신청합니다."}
+    assert follower.sources == ["휴가규정.txt"]
+
+def test_failed_leader_is_reported_to_followers():
+    flights = SingleFlight()
+    flight, _ = flights.join(("idx", "q"))
+    flight.finish(failed=True)
+
+    assert flight.wait_ready(timeout=1) is False
+
+def test_finished_flight_starts_a_new_leader():
+    flights = SingleFlight()
+    key = ("idx", "q")
+    first, _ = flights.join(key)
+    first.finish()
+
+    second, is_leader = flights.join(key)
+    flights.forget(key, first)
+
+    assert is_leader and second is not first
+    # 이미 교체된 Flight를 forget해도 새 Flight는 남아 있음
+    assert flights.get_stats()["in_flight"] == 1
+    flights.forget(key, second)
+    assert flights.get_stats()["in_flight"] == 0
@@ -0,0 +1,45 @@
+from context_utils import count_tokens, pack_context
+
+def _content(doc):
+    return doc["content"], doc["source"]
+
+def test_context_stays_within_token_budget():
+    results = [{"content": "연차 휴가 규정 " * 80, "source": f"doc{i}.txt"} for i in range(10)]
+
+    packed = pack_context(results, "연차 휴가", _content, token_budget=300)
+
+    assert packed["tokens_used"] <= 300
+    assert count_tokens(packed["context"]) <= 300
+    assert 0 < packed["documents_used"] < 10
+
+def test_most_relevant_paragraphs_are_kept_in_document_order():
+    text = "사무실은 8시에 엽니다.\n\n연차 휴가는 인사 시스템에서 신청합니다.\n\n주차는 지하 2층입니다."
+    budget = count_tokens("[출처: guide.txt]") + count_tokens("연차 휴가는 인사 시스템에서 신청합니다.") + 10
+
+    packed = pack_context([{"content": text, "source": "guide.txt"}], "연차 휴가 신청", _content, token_budget=budget)
+
+    assert packed["context"] == "[출처: guide.txt]\n연차 휴가는 인사 시스템에서 신청합니다."
+
+def test_sources_are_listed_once_per_file():
+    results = [
+        {"content": "연차 휴가 신청", "source": "휴가규정.txt"},
+        {"content": "연차 휴가 승인", "source": "휴가규정.txt"},
+        {"content": "출장비 정산", "source": "출장안내.txt"},
+    ]
+
+    packed = pack_context(results, "연차", _content, token_budget=1000)
+
+    assert packed["sources"] == ["휴가규정.txt", "출장안내.txt"]
+    assert packed["documents_used"] == 3
+
+def test_results_are_not_consumed_after_the_budget_is_full():
+    consumed = []
+
+    def results():
+        for i in range(100):
+            consumed.append(i)
+            yield {"content": "연차 휴가 규정 " * 50, "source": f"doc{i}.txt"}
+
+    pack_context(results(), "연차 휴가", _content, token_budget=200)
+
+    assert len(consumed) < 100
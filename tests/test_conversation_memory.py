@@ -0,0 +1,53 @@
+import time
+
+from context_utils import count_tokens
+from conversation_memory import ConversationMemory
+from stub_clients import StubOpenAIClient
+
+def _history(turns):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"질문 {i}: 연차 휴가 규정 알려줘"})
+        messages.append({"role": "assistant", "content": f"답변 {i}: 인사 시스템에서 신청합니다."})
+    return messages
+
+def test_recent_messages_fill_the_token_budget():
+    history = _history(10)
+    budget = sum(count_tokens(m["content"]) for m in history[-4:])
+    memory = ConversationMemory(history_token_budget=budget)
+
+    messages = memory.build_history(history, session=None)
+
+    assert messages == history[-4:]
+
+def test_latest_message_longer_than_budget_is_truncated():
+    memory = ConversationMemory(history_token_budget=10)
+
+    messages = memory.build_history([{"role": "user", "content": "연차 휴가 규정 " * 100}], session=None)
+
+    assert len(messages) == 1
+    assert count_tokens(messages[0]["content"]) <= 10
+
+def test_existing_summary_is_prepended():
+    memory = ConversationMemory(history_token_budget=1000)
+    session = {"summary": {"text": "사용자는 연차 휴가를 묻고 있음", "messages": 2}}
+
+    messages = memory.build_history(_history(2), session)
+
+    assert messages[0] == {"role": "system", "content": "이전 대화 요약:\n사용자는 연차 휴가를 묻고 있음"}
+    assert messages[1:] == _history(2)
+
+def test_older_messages_are_summarized_in_the_background():
+    history = _history(6)
+    memory = ConversationMemory(history_token_budget=count_tokens(history[-1]["content"]), summary_min_messages=4)
+    session = {}
+
+    memory.build_history(history, session, openai_client=StubOpenAIClient())
+    for _ in range(100):
+        if session.get("summary") and not session.get("summary_pending"):
+            break
+        time.sleep(0.02)
+
+    assert session["summary"]["messages"] == len(history) - 1
+    assert session["summary"]["text"]
+    assert session["summary_pending"] is False
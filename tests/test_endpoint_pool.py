@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from conftest import RecordingOpenAIClient
+from endpoint_pool import EndpointPool, PoolMember
+from resilience_utils import get_circuit_breaker_stats, wrap_clients
+from stub_clients import FaultInjector, StubOpenAIClient, StubSearchClient, StubServiceError
+
+MESSAGES = [{"role": "user", "content": "질문: 연차 휴가"}]
+
+def _failing_client(status_code=503):
+    return StubOpenAIClient(faults=FaultInjector(error_rate=1.0, status_code=status_code))
+
+def test_retryable_error_fails_over_and_cools_the_member():
+    healthy = RecordingOpenAIClient()
+    pool = EndpointPool([
+        PoolMember("kr", _failing_client(), deployment="gpt-4o-kr", model="gpt-4o"),
+        PoolMember("jp", healthy, deployment="gpt-4o-jp", model="gpt-4o"),
+    ])
+
+    response = pool.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+
+    assert response.choices[0].message.content.startswith("[스텁 답변]")
+    assert healthy.calls[0]["model"] == "gpt-4o-jp"
+    assert pool.failovers == 1
+    stats = {member["name"]: member for member in pool.get_stats()}
+    assert stats["kr"]["state"] == "cooling" and stats["kr"]["failures"] == 1
+    assert stats["jp"]["state"] == "healthy" and stats["jp"]["successes"] == 1
+
+def test_cooling_member_is_tried_last():
+    failing = _failing_client()
+    healthy = RecordingOpenAIClient()
+    pool = EndpointPool([PoolMember("kr", failing, model="gpt-4o"), PoolMember("jp", healthy, model="gpt-4o")])
+
+    pool.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+    pool.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+
+    assert failing.faults.injected_errors == 1
+    assert len(healthy.calls) == 2
+
+def test_request_errors_are_not_failed_over():
+    healthy = RecordingOpenAIClient()
+    pool = EndpointPool([PoolMember("kr", _failing_client(400), model="gpt-4o"), PoolMember("jp", healthy, model="gpt-4o")])
+    with pytest.raises(StubServiceError):
+        pool.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+    assert healthy.calls == []
+
+def test_unmatched_model_is_sent_unchanged():
+    client = RecordingOpenAIClient()
+    pool = EndpointPool([PoolMember("kr", client, deployment="gpt-4o-kr", model="gpt-4o")])
+
+    pool.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+    assert client.calls[0]["model"] == "gpt-4o-mini"
+
+def test_member_with_less_request_quota_left_is_avoided():
+    busy, idle = RecordingOpenAIClient(), RecordingOpenAIClient()
+    pool = EndpointPool([PoolMember("busy", busy, model="gpt-4o", rpm=2), PoolMember("idle", idle, model="gpt-4o", rpm=100)])
+    for member in pool.members:
+        member.record_success(0.5, {}, 10)
+
+    pool.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+
+    assert len(idle.calls) == 1 and busy.calls == []
+
+class HangingOpenAIClient(RecordingOpenAIClient):
+    """release가 설정될 때까지 응답하지 않는 엔드포인트"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        record = self.chat.completions.create
+
+        def _create(**kwargs):
+            record(**kwargs)
+            self.release.wait(5)
+            raise StubServiceError(503)
+
+        self.chat.completions.create = _create
+
+def test_hung_member_is_attempted_once_and_pool_is_not_rewrapped(monkeypatch):
+    monkeypatch.setenv("RESILIENCE_ENABLED", "true")
+    monkeypatch.delenv("AZURE_OPENAI_ENDPOINT", raising=False)
+    hanging, healthy = HangingOpenAIClient(), RecordingOpenAIClient()
+    pool = EndpointPool(
+        [PoolMember("kr", hanging, model="gpt-4o"), PoolMember("jp", healthy, model="gpt-4o")], attempt_timeout=0.2
+    )
+    _, openai_client = wrap_clients(StubSearchClient(), pool)
+
+    try:
+        openai_client.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+        openai_client.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+    finally:
+        hanging.release.set()
+
+    assert openai_client is pool
+    assert len(hanging.calls) == 1
+    assert len(healthy.calls) == 2
+    assert pool.failovers == 1
+    assert "openai:EndpointPool" not in [stats["name"] for stats in get_circuit_breaker_stats()]
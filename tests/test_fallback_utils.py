@@ -0,0 +1,48 @@
+from fallback_utils import EXTRACTIVE_ANSWER_HEADER, PendingAnswer, build_extractive_answer, replace_with_llm_answer
+
+def _content(doc):
+    return doc["content"], doc["source"]
+
+class FakePlaceholder:
+    """st.empty() 대체 (표시된 내용을 순서대로 기록)"""
+
+    def __init__(self):
+        self.shown = []
+
+    def markdown(self, text):
+        self.shown.append(text)
+
+    def write_stream(self, chunks):
+        text = "".join(chunks)
+        self.shown.append(text)
+        return text
+
+def test_extractive_answer_picks_matching_sentences_with_sources():
+    results = [
+        {"content": "사무실은 8시에 엽니다. 연차 휴가는 인사 시스템에서 신청합니다.", "source": "휴가규정.txt"},
+        {"content": "출장비는 7일 이내에 정산합니다.", "source": "출장안내.txt"},
+    ]
+
+    answer = build_extractive_answer("연차 휴가 신청", results, _content, max_sentences=1)
+
+    assert answer.startswith(EXTRACTIVE_ANSWER_HEADER)
+    assert answer.endswith("- 연차 휴가는 인사 시스템에서 신청합니다. (휴가규정.txt)")
+
+def test_extractive_answer_without_matches_says_so():
+    answer = build_extractive_answer("연차", [{"content": "출장비 정산", "source": "a"}], _content)
+
+    assert "관련 문장을 찾지 못했습니다" in answer
+
+def test_placeholder_keeps_extractive_answer_until_llm_answer_arrives():
+    placeholder = FakePlaceholder()
+
+    final = replace_with_llm_answer(placeholder, PendingAnswer("추출형", iter(["LLM ", "답변"])))
+
+    assert placeholder.shown == ["추출형", "LLM 답변"]
+    assert final == "LLM 답변"
+
+def test_placeholder_keeps_extractive_answer_without_llm_answer():
+    placeholder = FakePlaceholder()
+
+    assert replace_with_llm_answer(placeholder, PendingAnswer("추출형", iter([]))) == "추출형"
+    assert placeholder.shown == ["추출형"]
@@ -0,0 +1,38 @@
+from followup_utils import build_id_filter, classify_followup, make_retrieval_memory, parse_id_filter
+
+def _content(doc):
+    return doc["content"], doc["id"]
+
+PREVIOUS = make_retrieval_memory(
+    "연차 휴가 신청 방법",
+    [{"id": "stub-0", "content": "연차 휴가는 인사 시스템에서 신청합니다. 팀장 승인 후 확정됩니다."}],
+    ["stub-0", "stub-1"],
+    _content,
+)
+
+def test_marker_without_new_words_reuses_previous_documents():
+    assert classify_followup("그거 더 자세히 알려줘", PREVIOUS) == "reuse"
+
+def test_marker_with_new_words_narrows_to_previous_candidates():
+    assert classify_followup("그럼 반차는 어떻게 신청해?", PREVIOUS) == "narrow"
+
+def test_short_question_without_marker_searches_again():
+    # 이전 문서에 나온 단어만 쓴 짧은 질문이라도 지시어가 없으면 새 질문으로 봄
+    assert classify_followup("연차 휴가", PREVIOUS) is None
+    assert classify_followup("출장비 정산 기한은?", PREVIOUS) is None
+
+def test_no_previous_retrieval_is_not_a_followup():
+    assert classify_followup("그거 더 자세히", None) is None
+    assert classify_followup("그거 더 자세히", {"documents": []}) is None
+
+def test_marker_with_new_words_and_no_candidates_searches_again():
+    previous = dict(PREVIOUS, candidate_ids=[])
+
+    assert classify_followup("그럼 반차는?", previous) is None
+
+def test_id_filter_round_trip():
+    search_filter = build_id_filter(["stub-0", "o'neil", "a,b"])
+
+    assert search_filter == "search.in(id, 'stub-0,o''neil', ',')"
+    assert parse_id_filter(search_filter) == {"stub-0", "o'neil"}
+    assert parse_id_filter(None) is None
@@ -0,0 +1,42 @@
+import pytest
+
+from model_router import Deployment, ModelRouter
+
+DEPLOYMENTS = [
+    Deployment("gpt-4o", "large", max_tokens=1500, cost_per_1k_tokens=2.5),
+    Deployment("gpt-4o-mini", "small", max_tokens=400, cost_per_1k_tokens=0.15),
+]
+
+def _context(tokens, sources=1):
+    return {"tokens_used": tokens, "sources": [f"doc{i}.txt" for i in range(sources)]}
+
+def test_short_confident_question_goes_to_small_deployment():
+    decision = ModelRouter(DEPLOYMENTS).route("사무실 몇 시에 열어요?", _context(200), [{"@rerank.score": 0.9}])
+
+    assert decision.deployment.name == "gpt-4o-mini"
+    assert decision.max_tokens == 400
+    assert decision.baseline.name == "gpt-4o"
+
+@pytest.mark.parametrize("question, context, documents", [
+    ("연차와 병가의 차이를 비교해줘", _context(200), []),
+    ("사무실 몇 시에 열어요?", _context(200), [{"@rerank.score": 0.1}]),
+    ("휴가 규정", _context(5000, sources=4), []),
+])
+def test_synthesis_low_confidence_and_large_context_go_to_large_deployment(question, context, documents):
+    assert ModelRouter(DEPLOYMENTS).route(question, context, documents).deployment.name == "gpt-4o"
+
+def test_missing_tier_uses_next_larger_deployment():
+    router = ModelRouter(DEPLOYMENTS)
+
+    # medium 등급 배포가 없으면 large 사용
+    assert router.route("휴가 규정", _context(2000), []).deployment.name == "gpt-4o"
+
+def test_single_deployment_disables_routing():
+    assert not ModelRouter(DEPLOYMENTS[:1]).enabled
+    with pytest.raises(ValueError):
+        Deployment("gpt-4o", "huge")
+
+def test_cost_estimate_compares_with_largest_deployment():
+    decision = ModelRouter(DEPLOYMENTS).route("사무실 몇 시에 열어요?", _context(200), [])
+
+    assert decision.estimate_costs(1000) == {"cost": pytest.approx(0.15), "baseline_cost": pytest.approx(2.5)}
@@ -0,0 +1,36 @@
+import pytest
+
+from profile_utils import DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, PerformanceProfile, get_global_defaults
+
+def test_values_are_converted_and_range_checked():
+    profile = PerformanceProfile(top="5", temperature=1)
+
+    assert profile.top == 5 and profile.temperature == 1.0
+    with pytest.raises(ValueError):
+        PerformanceProfile(top=0)
+    with pytest.raises(ValueError):
+        PerformanceProfile(temperature=2.5)
+    with pytest.raises(ValueError):
+        PerformanceProfile(search_mode="fuzzy")
+
+def test_json_round_trip_keeps_only_set_fields():
+    profile = PerformanceProfile(top=3, max_tokens=400, search_mode="all", deployment="gpt-4o-mini")
+
+    restored = PerformanceProfile.from_json(profile.to_json())
+
+    assert restored.to_dict() == {"top": 3, "max_tokens": 400, "search_mode": "all", "deployment": "gpt-4o-mini"}
+    assert PerformanceProfile().to_json() is None
+    assert PerformanceProfile().is_default
+
+def test_invalid_json_falls_back_to_default_profile():
+    assert PerformanceProfile.from_json("{not json").is_default
+    assert PerformanceProfile.from_json('{"top": 999}').is_default
+    assert PerformanceProfile.from_json('{"top": 4, "unknown": 1}').top == 4
+
+def test_global_defaults_follow_environment(monkeypatch):
+    monkeypatch.setenv("SEARCH_TOP_K", "7")
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGET", "2500")
+
+    assert get_global_defaults() == {
+        "top": 7, "context_tokens": 2500, "temperature": DEFAULT_TEMPERATURE, "max_tokens": DEFAULT_MAX_TOKENS,
+    }
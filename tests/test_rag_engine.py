@@ -0,0 +1,246 @@
+"""RAGEngine을 stub_clients로 끝까지 실행하는 테스트"""
+
+import threading
+
+import pytest
+
+from cache_utils import SemanticAnswerCache, normalize_question
+from coalescing_utils import single_flight
+from conftest import RecordingOpenAIClient
+from endpoint_pool import EndpointPool, PoolMember
+from fallback_utils import EXTRACTIVE_ANSWER_HEADER, PendingAnswer, replace_with_llm_answer
+from model_router import Deployment, ModelRouter
+from profile_utils import PerformanceProfile
+from rag_engine import NO_DOCUMENTS_MESSAGE, AnswerCacheStage
+from stub_clients import FaultInjector, StubOpenAIClient, StubSearchClient
+from test_fallback_utils import FakePlaceholder
+
+QUESTION = "연차 휴가 신청 방법"
+
+def test_repeated_question_is_served_from_the_answer_cache(make_engine, search_client, openai_client):
+    engine = make_engine()
+
+    first, sources = engine.answer(search_client, openai_client, QUESTION, index_name="guide", index_version=1)
+    second, cached_sources = engine.answer(
+        search_client, openai_client, "연차 휴가 신청 방법?", index_name="guide", index_version=1
+    )
+
+    assert first.startswith("[스텁 답변]")
+    assert (second, cached_sources) == (first, sources)
+    assert sources[0] == "휴가규정.txt (원본)"
+    assert len(openai_client.calls) == 1
+
+def test_index_version_bump_invalidates_cached_answers(make_engine, search_client, openai_client, answer_cache):
+    engine = make_engine()
+    engine.answer(search_client, openai_client, QUESTION, index_name="guide", index_version=1)
+
+    engine.answer(search_client, openai_client, QUESTION, index_name="guide", index_version=2)
+    answer_cache.invalidate_index("guide", keep_version=2)
+    engine.answer(search_client, openai_client, QUESTION, index_name="guide", index_version=2)
+
+    assert len(openai_client.calls) == 2
+    assert answer_cache.get("guide", 1, QUESTION) is None
+
+def test_cache_is_keyed_by_index(make_engine, search_client, openai_client):
+    engine = make_engine()
+
+    engine.answer(search_client, openai_client, QUESTION, index_name="guide", index_version=1)
+    engine.answer(search_client, openai_client, QUESTION, index_name="other-guide", index_version=1)
+
+    assert len(openai_client.calls) == 2
+
+def test_failed_answers_and_empty_results_are_not_cached(make_engine, search_client, openai_client, answer_cache):
+    engine = make_engine()
+
+    answer, sources = engine.answer(search_client, openai_client, "존재하지않는단어", index_name="guide")
+
+    assert (answer, sources) == (NO_DOCUMENTS_MESSAGE, [])
+    assert answer_cache.get_stats()["stores"] == 0
+    assert openai_client.calls == []
+
+def test_semantic_cache_answers_reworded_question(make_engine, search_client, openai_client, answer_cache, monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", "stub-embedding")
+    engine = make_engine(cache=AnswerCacheStage(exact_cache=answer_cache, semantic=SemanticAnswerCache(threshold=0.8)))
+
+    first, _ = engine.answer(search_client, openai_client, "연차 휴가 신청 방법", index_name="guide")
+    second, _ = engine.answer(search_client, openai_client, "연차 휴가 신청 방법은?", index_name="guide")
+
+    assert second == first
+    assert len(openai_client.calls) == 1
+
+def test_streamed_answer_is_cached_after_the_stream_ends(make_engine, search_client, openai_client):
+    engine = make_engine()
+
+    chunks, sources = engine.answer(search_client, openai_client, QUESTION, index_name="guide", stream=True)
+    streamed = "".join(chunks)
+    cached, cached_sources = engine.answer(search_client, openai_client, QUESTION, index_name="guide", stream=True)
+
+    assert openai_client.calls[0]["stream"] is True
+    assert streamed.startswith("[스텁 답변]")
+    assert "".join(cached) == streamed
+    assert cached_sources == sources
+    assert len(openai_client.calls) == 1
+
+def test_abandoned_stream_is_not_cached(make_engine, search_client, openai_client, answer_cache):
+    engine = make_engine()
+
+    chunks, _ = engine.answer(search_client, openai_client, QUESTION, index_name="guide", stream=True)
+    next(chunks)
+    chunks.close()
+
+    assert answer_cache.get("guide", 0, QUESTION) is None
+
+def test_slow_answer_falls_back_to_extractive_answer_then_llm_answer(make_engine, search_client, answer_cache):
+    openai_client = RecordingOpenAIClient(latency_seconds=0.3)
+    engine = make_engine(answer_deadline_seconds=0.05)
+    placeholder = FakePlaceholder()
+
+    pending, sources = engine.answer(search_client, openai_client, QUESTION, index_name="guide")
+    final = replace_with_llm_answer(placeholder, pending)
+
+    assert isinstance(pending, PendingAnswer)
+    assert placeholder.shown[0] == pending.text
+    assert pending.text.startswith(EXTRACTIVE_ANSWER_HEADER)
+    assert "휴가규정.txt" in pending.text
+    assert final.startswith("[스텁 답변]")
+    assert placeholder.shown[-1] == final
+    # LLM 답변을 끝까지 받은 뒤에는 캐시에 저장됨
+    assert answer_cache.get("guide", 0, QUESTION) == (final, sources)
+
+def test_fast_answer_within_deadline_is_returned_directly(make_engine, search_client, openai_client):
+    engine = make_engine(answer_deadline_seconds=5)
+
+    answer, _ = engine.answer(search_client, openai_client, QUESTION, index_name="guide")
+
+    assert isinstance(answer, str) and answer.startswith("[스텁 답변]")
+
+def test_identical_concurrent_questions_share_one_completion(make_engine, search_client):
+    openai_client = RecordingOpenAIClient(latency_seconds=0.2)
+    engine = make_engine(cache=None, coalesce=True)
+    answers = []
+
+    threads = [
+        threading.Thread(target=lambda: answers.append(
+            engine.answer(search_client, openai_client, QUESTION, index_name="guide")
+        ))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(answers) == 3
+    assert len({answer for answer, _ in answers}) == 1
+    assert len(openai_client.calls) == 1
+
+def test_followup_with_marker_reuses_previous_documents(make_engine, openai_client):
+    search_client = StubSearchClient()
+    searches = []
+    search = search_client.search
+    search_client.search = lambda **kwargs: searches.append(kwargs) or search(**kwargs)
+    engine = make_engine()
+    session = {}
+
+    _, sources = engine.answer(search_client, openai_client, QUESTION, index_name="guide", session=session)
+    _, followup_sources = engine.answer(
+        search_client, openai_client, "그거 더 자세히 알려줘", index_name="guide", session=session
+    )
+    engine.answer(search_client, openai_client, "연차 휴가", index_name="guide", session=session)
+
+    assert followup_sources == sources
+    # 지시어가 없는 짧은 질문은 다시 검색함
+    assert len(searches) == 2
+
+def test_answers_with_history_are_not_shared_through_the_cache(make_engine, search_client, openai_client):
+    engine = make_engine()
+    history = [{"role": "user", "content": "출장 규정 알려줘"}, {"role": "assistant", "content": "출장비는 7일 안에 정산합니다."}]
+
+    engine.answer(search_client, openai_client, QUESTION, index_name="guide", history=history)
+    engine.answer(search_client, openai_client, QUESTION, index_name="guide", history=history)
+    engine.answer(search_client, openai_client, QUESTION, index_name="guide")
+
+    assert len(openai_client.calls) == 3
+    assert openai_client.calls[0]["messages"][1:3] == history
+
+def test_router_picks_deployment_and_caps_max_tokens(make_engine, search_client, openai_client):
+    engine = make_engine(router=ModelRouter([Deployment("gpt-4o", "large"), Deployment("gpt-4o-mini", "small", 400)]))
+
+    engine.answer(search_client, openai_client, "사무실 몇 시에 열어요?", index_name="guide")
+    engine.answer(search_client, openai_client, "연차와 출장 규정을 비교해줘", index_name="guide")
+
+    assert [(call["model"], call["max_tokens"]) for call in openai_client.calls] == [
+        ("gpt-4o-mini", 400), ("gpt-4o", 1500)
+    ]
+
+def test_engine_answers_through_pool_failover(make_engine, search_client):
+    healthy = RecordingOpenAIClient()
+    pool = EndpointPool([
+        PoolMember("kr", StubOpenAIClient(faults=FaultInjector(error_rate=1.0)), model="gpt-4o"),
+        PoolMember("jp", healthy, deployment="gpt-4o-jp", model="gpt-4o"),
+    ])
+
+    answer, _ = make_engine().answer(
+        search_client, pool, QUESTION, index_name="guide", profile=PerformanceProfile(deployment="gpt-4o")
+    )
+
+    assert answer.startswith("[스텁 답변]")
+    assert healthy.calls[0]["model"] == "gpt-4o-jp"
+    assert pool.failovers == 1
+
+def test_profile_values_reach_generation(make_engine, search_client, openai_client):
+    make_engine().answer(
+        search_client, openai_client, QUESTION, index_name="guide",
+        profile=PerformanceProfile(temperature=0.7, max_tokens=300)
+    )
+
+    assert openai_client.calls[0]["temperature"] == 0.7
+    assert openai_client.calls[0]["max_tokens"] == 300
+
+
+def test_profile_deployment_skips_routing(make_engine, search_client, openai_client):
+    engine = make_engine(router=ModelRouter([Deployment("gpt-4o", "large"), Deployment("gpt-4o-mini", "small", 400)]))
+
+    engine.answer(
+        search_client, openai_client, "사무실 몇 시에 열어요?", index_name="guide",
+        profile=PerformanceProfile(deployment="gpt-4o")
+    )
+
+    assert openai_client.calls[0]["model"] == "gpt-4o"
+
+def _stalled_flight(question, index_name="guide"):
+    """출처도 답변 조각도 보내지 않는 leader의 Flight"""
+    key = (index_name, 0, PerformanceProfile().to_json(), normalize_question(question))
+    flight, is_leader = single_flight.join(key)
+    assert is_leader
+    return key, flight
+
+def test_follower_of_a_leader_that_never_publishes_answers_itself(make_engine, search_client, openai_client):
+    key, flight = _stalled_flight(QUESTION)
+    try:
+        answer, sources = make_engine(cache=None, coalesce=True, coalesce_timeout=0.2).answer(
+            search_client, openai_client, QUESTION, index_name="guide"
+        )
+    finally:
+        flight.finish(failed=True)
+        single_flight.forget(key, flight)
+
+    assert answer.startswith("[스텁 답변]")
+    assert sources[0] == "휴가규정.txt (원본)"
+    assert len(openai_client.calls) == 1
+
+def test_follower_of_a_leader_that_never_streams_answers_itself(make_engine, search_client, openai_client):
+    key, flight = _stalled_flight(QUESTION)
+    flight.publish(["휴가규정.txt"])
+    engine = make_engine(cache=None, coalesce=True, coalesce_timeout=0.2)
+    try:
+        answer, _ = engine.answer(search_client, openai_client, QUESTION, index_name="guide")
+        chunks, _ = engine.answer(search_client, openai_client, QUESTION, index_name="guide", stream=True)
+        streamed = "".join(chunks)
+    finally:
+        flight.finish(failed=True)
+        single_flight.forget(key, flight)
+
+    assert answer.startswith("[스텁 답변]")
+    assert streamed.startswith("[스텁 답변]")
+    assert len(openai_client.calls) == 2
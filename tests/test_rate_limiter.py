@@ -0,0 +1,95 @@
+import sqlite3
+
+import pytest
+
+from rate_limiter import RateLimiter, RateLimitTimeout, _LocalBuckets, _SQLiteBuckets
+
+def test_bucket_allows_burst_then_reports_wait(clock):
+    # 분당 60건, 10초 버스트 → 용량 10건, 초당 1건 충전
+    buckets = _LocalBuckets({"requests": 60}, burst_seconds=10)
+
+    assert buckets.capacity("requests") == 10
+    assert all(buckets.try_acquire({"requests": 1}) == 0 for _ in range(10))
+    assert buckets.try_acquire({"requests": 1}) == pytest.approx(1.0)
+
+    clock.advance(2.5)
+    assert buckets.try_acquire({"requests": 2}) == 0
+    assert buckets.try_acquire({"requests": 1}) == pytest.approx(0.5)
+
+def test_bucket_refill_is_capped_at_capacity(clock):
+    buckets = _LocalBuckets({"tokens": 600}, burst_seconds=1)
+
+    clock.advance(3600)
+
+    assert buckets.try_acquire({"tokens": 10}) == 0
+    assert buckets.try_acquire({"tokens": 1}) == pytest.approx(0.1)
+
+def test_bucket_checks_every_limit_before_charging(clock):
+    buckets = _LocalBuckets({"requests": 600, "tokens": 60}, burst_seconds=10)
+
+    # 토큰이 모자라면 요청 버킷도 차감하지 않음
+    assert buckets.try_acquire({"requests": 1, "tokens": 20}) == pytest.approx(10.0)
+    assert buckets.try_acquire({"requests": 1, "tokens": 10}) == 0
+    assert buckets.try_acquire({"requests": 1, "tokens": 1}) == pytest.approx(1.0)
+
+def test_adjust_charges_underestimated_usage(clock):
+    buckets = _LocalBuckets({"tokens": 60}, burst_seconds=10)
+    assert buckets.try_acquire({"tokens": 5}) == 0
+
+    buckets.adjust("tokens", -10)
+
+    assert buckets.try_acquire({"tokens": 1}) == pytest.approx(6.0)
+
+def test_limiter_without_limits_never_waits():
+    limiter = RateLimiter()
+
+    assert limiter.acquire(10000, "faq") == 0
+
+def test_limiter_times_out_when_quota_is_exhausted():
+    limiter = RateLimiter(rpm=6, burst_seconds=10)
+
+    limiter.acquire(1, "faq")
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(1, "faq", timeout=0.05)
+    stats = {row["chatbot_name"]: row for row in limiter.get_stats()["chatbots"]}
+    assert stats["faq"]["timeouts"] == 1
+
+def test_sqlite_buckets_share_quota_between_processes(tmp_path):
+    db_path = str(tmp_path / "rate_limit.db")
+    first = RateLimiter(rpm=6, burst_seconds=10, db_path=db_path)
+    second = RateLimiter(rpm=6, burst_seconds=10, db_path=db_path)
+
+    first.acquire(1, "faq")
+
+    with pytest.raises(RateLimitTimeout):
+        second.acquire(1, "policy", timeout=0.05)
+
+def test_each_deployment_has_its_own_quota():
+    limiter = RateLimiter(rpm=6, burst_seconds=10, deployment_limits={"gpt-4o": {"requests": 60}})
+
+    limiter.acquire(1, "faq", deployment="gpt-4o-mini")
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(1, "faq", timeout=0.05, deployment="gpt-4o-mini")
+    assert limiter.acquire(1, "faq", deployment="gpt-4o") < 0.05
+
+def test_sqlite_lock_error_is_not_masked_by_rollback(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "rate_limit.db")
+    buckets = _SQLiteBuckets({"requests": 60}, burst_seconds=10, db_path=db_path)
+    connect = buckets._connect
+
+    def _connect_without_busy_wait():
+        conn = connect()
+        conn.execute("PRAGMA busy_timeout=0")
+        return conn
+
+    monkeypatch.setattr(buckets, "_connect", _connect_without_busy_wait)
+    holder = sqlite3.connect(db_path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            buckets.try_acquire({"requests": 1})
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            buckets.adjust("requests", 1)
+    finally:
+        holder.rollback()
+        holder.close()
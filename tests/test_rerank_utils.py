@@ -0,0 +1,62 @@
+from rerank_utils import rerank_documents
+
+BASE = "연차 휴가는 인사 시스템에서 신청하며 팀장 승인 후 확정됩니다. 사용 예정일 3일 전까지 신청해야 합니다."
+
+def _content(doc):
+    return doc["content"], doc["id"]
+
+def test_near_duplicates_are_removed():
+    results = [
+        {"id": "a", "content": BASE},
+        {"id": "a-copy", "content": BASE + " "},
+        {"id": "b", "content": "출장비는 출장 종료 후 7일 이내에 정산합니다."},
+    ]
+
+    reranked = rerank_documents(results, "연차 휴가 신청", _content, top=3, duplicate_threshold=0.8, mmr_lambda=0.7)
+
+    ids = [doc["id"] for doc in reranked["documents"]]
+    assert reranked["candidates"] == 3
+    assert reranked["duplicates_removed"] == 1
+    assert reranked["duplicate_tokens"] > 0
+    assert ids == ["a", "b"]
+
+def test_empty_content_is_skipped():
+    results = [{"id": "empty", "content": ""}, {"id": "a", "content": BASE}]
+
+    reranked = rerank_documents(results, "연차 휴가", _content, top=2)
+
+    assert reranked["candidates"] == 1
+    assert [doc["id"] for doc in reranked["documents"]] == ["a"]
+
+def test_mmr_prefers_diverse_passage_over_overlapping_one():
+    # a와 a-variant는 많이 겹치지만 중복 기준(0.95)에는 못 미치고, b는 관련도가 조금 낮지만 내용이 다름
+    results = [
+        {"id": "a", "content": BASE},
+        {"id": "a-variant", "content": BASE + " 반차도 같은 방식으로 연차 휴가 신청합니다."},
+        {"id": "b", "content": "연차 휴가 잔여 일수는 매년 1월에 정산됩니다."},
+    ]
+    question = "연차 휴가 신청 방법"
+
+    by_relevance = rerank_documents(results, question, _content, top=2, duplicate_threshold=0.95, mmr_lambda=1.0)
+    diverse = rerank_documents(results, question, _content, top=2, duplicate_threshold=0.95, mmr_lambda=0.3)
+
+    relevance_ids = [doc["id"] for doc in by_relevance["documents"]]
+    diverse_ids = [doc["id"] for doc in diverse["documents"]]
+    assert by_relevance["duplicates_removed"] == 0
+    assert "b" not in relevance_ids
+    assert diverse_ids[0] == relevance_ids[0]
+    assert "b" in diverse_ids
+
+def test_scores_are_attached_in_selection_order():
+    results = [
+        {"id": "a", "content": "연차 휴가는 인사 시스템에서 신청합니다."},
+        {"id": "b", "content": "출장비는 출장 종료 후 7일 이내에 정산합니다."},
+        {"id": "c", "content": "연차 휴가 잔여 일수는 매년 1월에 정산됩니다."},
+        {"id": "d", "content": "사무실은 평일 오전 8시에 열고 오후 10시에 닫습니다."},
+    ]
+
+    reranked = rerank_documents(results, "연차 휴가", _content, top=3, mmr_lambda=1.0)
+
+    scores = [doc["@rerank.score"] for doc in reranked["documents"]]
+    assert len(scores) == 3
+    assert scores == sorted(scores, reverse=True)
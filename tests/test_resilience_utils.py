@@ -0,0 +1,105 @@
+import pytest
+
+from resilience_utils import (
+    CircuitBreaker, CircuitOpenError, ResiliencePolicy, call_with_resilience, get_circuit_breaker
+)
+from stub_clients import StubServiceError
+
+def _open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure(RuntimeError("503"))
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("search", failure_threshold=3, reset_seconds=30)
+
+    breaker.record_failure(RuntimeError("503"))
+    breaker.record_success()
+    breaker.record_failure(RuntimeError("503"))
+    breaker.record_failure(RuntimeError("503"))
+    assert breaker.state == "closed"
+
+    breaker.record_failure(RuntimeError("503"))
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.get_stats()["rejected"] == 1
+
+def test_half_open_allows_a_single_trial(clock):
+    breaker = CircuitBreaker("search", failure_threshold=2, reset_seconds=30)
+    _open_breaker(breaker)
+
+    clock.advance(29)
+    assert breaker.state == "open"
+    clock.advance(1)
+    assert breaker.state == "half_open"
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+def test_failed_trial_reopens(clock):
+    breaker = CircuitBreaker("openai", failure_threshold=2, reset_seconds=30)
+    _open_breaker(breaker)
+    clock.advance(30)
+
+    breaker.before_call()
+    breaker.record_failure(TimeoutError("timeout"))
+
+    assert breaker.state == "open"
+    assert breaker.get_stats()["last_error"] == "TimeoutError: timeout"
+    clock.advance(30)
+    assert breaker.state == "half_open"
+
+def test_released_trial_keeps_half_open(clock):
+    # 400처럼 엔드포인트 상태와 무관한 오류는 시험 호출만 풀고 닫지 않음
+    breaker = CircuitBreaker("openai", failure_threshold=2, reset_seconds=30)
+    _open_breaker(breaker)
+    clock.advance(30)
+
+    breaker.before_call()
+    breaker.release_trial()
+
+    assert breaker.state == "half_open"
+    breaker.before_call()
+
+def _flaky(*errors):
+    """errors를 차례로 던진 뒤 "ok"를 반환하는 호출과 호출 횟수"""
+    calls = []
+
+    def _call():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    return _call, calls
+
+def test_retryable_errors_are_retried_until_success():
+    fn, calls = _flaky(StubServiceError(503), StubServiceError(429))
+    policy = ResiliencePolicy(deadline_seconds=5, max_attempts=3, base_delay=0, max_delay=0)
+
+    assert call_with_resilience(fn, "test:retry-success", policy) == "ok"
+    assert len(calls) == 3
+    assert get_circuit_breaker("test:retry-success").state == "closed"
+
+def test_request_errors_are_not_retried():
+    fn, calls = _flaky(StubServiceError(400))
+    policy = ResiliencePolicy(deadline_seconds=5, max_attempts=3, base_delay=0, max_delay=0)
+
+    with pytest.raises(StubServiceError):
+        call_with_resilience(fn, "test:no-retry", policy)
+    assert len(calls) == 1
+    assert get_circuit_breaker("test:no-retry").get_stats()["failures"] == 0
+
+def test_exhausted_retries_count_as_one_breaker_failure():
+    fn, calls = _flaky(*[StubServiceError(503)] * 3)
+    policy = ResiliencePolicy(deadline_seconds=5, max_attempts=2, base_delay=0, max_delay=0)
+
+    with pytest.raises(StubServiceError):
+        call_with_resilience(fn, "test:exhausted", policy)
+    assert len(calls) == 2
+    assert get_circuit_breaker("test:exhausted").get_stats()["failures"] == 1
@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import pytest
+
+import bm25_index
+import vector_index
+from bm25_index import LocalBM25Index, get_bm25_index_path
+from embedding_utils import embed_text
+from followup_utils import build_id_filter
+from retrieval_utils import get_document_key, hybrid_search, local_search, reciprocal_rank_fusion, retrieve_documents
+from stub_clients import FaultInjector, StubOpenAIClient, StubSearchClient, load_stub_documents
+from vector_index import build_vector_index
+
+@pytest.fixture
+def local_indexes(tmp_path, monkeypatch, request):
+    """stub 문서로 같은 인덱스명의 로컬 BM25/벡터 인덱스 생성"""
+    monkeypatch.setattr(bm25_index, "LOCAL_INDEX_ROOT", str(tmp_path))
+    monkeypatch.setattr(vector_index, "LOCAL_INDEX_ROOT", str(tmp_path))
+    monkeypatch.setenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", "stub-embedding")
+    index_name = f"test-{request.node.name}"
+    openai_client = StubOpenAIClient()
+
+    bm25 = LocalBM25Index().build(load_stub_documents())
+    bm25.save(get_bm25_index_path(index_name))
+    vectors = build_vector_index(index_name, openai_client)
+    yield index_name, openai_client, bm25, vectors
+    bm25_index._loaded_indexes.pop(index_name, None)
+    vector_index._loaded_indexes.pop(index_name, None)
+
+def test_rrf_scores_documents_by_rank_across_lists():
+    keyword = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+    vector = [{"id": "c"}, {"id": "a"}, {"id": "d"}]
+
+    fused = reciprocal_rank_fusion([keyword, vector], k=60)
+
+    assert [doc["id"] for doc in fused] == ["a", "c", "b", "d"]
+    assert fused[0]["@search.rrf_score"] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[-1]["@search.rrf_score"] == pytest.approx(1 / 63)
+    assert len(reciprocal_rank_fusion([keyword, vector], top=2)) == 2
+
+def test_hybrid_search_fuses_keyword_and_vector_results(search_client, openai_client, monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", "stub-embedding")
+
+    results = hybrid_search(search_client, openai_client, "출장비 정산", top=2)
+
+    assert results[0]["metadata_storage_name"] == "출장안내.txt"
+    assert all("@search.rrf_score" in doc for doc in results)
+    assert len({get_document_key(doc) for doc in results}) == len(results)
+
+def test_hybrid_mode_without_embeddings_uses_keyword_search(search_client, openai_client, monkeypatch):
+    monkeypatch.delenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", raising=False)
+
+    results = retrieve_documents(search_client, openai_client, "출장비 정산", retrieval_mode="hybrid", top=2)
+
+    assert results[0]["metadata_storage_name"] == "출장안내.txt"
+    assert all("@search.rrf_score" not in doc for doc in results)
+
+def test_local_search_fuses_bm25_and_vector_results(local_indexes):
+    index_name, openai_client, bm25, vectors = local_indexes
+    question = "출장비 정산"
+
+    results = local_search(openai_client, question, index_name, top=2)
+
+    keyword = list(bm25.search(search_text=question, top=4))
+    query = SimpleNamespace(vector=embed_text(openai_client, question), k_nearest_neighbors=4)
+    expected = reciprocal_rank_fusion([keyword, list(vectors.search(vector_queries=[query], top=4))], top=2)
+    assert [get_document_key(doc) for doc in results] == [get_document_key(doc) for doc in expected]
+    assert results[0]["metadata_storage_name"] == "출장안내.txt"
+    assert all("@search.rrf_score" in doc for doc in results)
+
+def test_local_search_uses_bm25_only_without_embeddings(local_indexes, monkeypatch):
+    index_name, openai_client, _, _ = local_indexes
+    monkeypatch.delenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME")
+
+    results = local_search(openai_client, "출장비 정산", index_name, top=2)
+
+    assert results[0]["metadata_storage_name"] == "출장안내.txt"
+    assert all("@search.rrf_score" not in doc for doc in results)
+
+def test_local_search_without_index_returns_none(tmp_path, monkeypatch):
+    monkeypatch.setattr(bm25_index, "LOCAL_INDEX_ROOT", str(tmp_path))
+    monkeypatch.setattr(vector_index, "LOCAL_INDEX_ROOT", str(tmp_path))
+
+    assert local_search(StubOpenAIClient(), "출장비", "missing", top=3) is None
+
+def test_keyword_mode_falls_back_to_local_index_when_azure_fails(local_indexes, monkeypatch):
+    index_name, openai_client, _, _ = local_indexes
+    monkeypatch.delenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME")
+    failing = StubSearchClient(faults=FaultInjector(error_rate=1.0))
+
+    results = retrieve_documents(failing, openai_client, "출장비 정산", top=2, index_name=index_name)
+
+    assert failing.faults.injected_errors == 1
+    assert results[0]["metadata_storage_name"] == "출장안내.txt"
+
+def test_local_search_applies_id_filter(local_indexes):
+    index_name, openai_client, bm25, _ = local_indexes
+    allowed = get_document_key(bm25.documents[0])
+
+    results = local_search(openai_client, "출장비 정산", index_name, top=3, search_filter=build_id_filter([allowed]))
+
+    assert [get_document_key(doc) for doc in results] == [allowed]
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from streaming_utils import iter_completion_text
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+def _stream(*texts, error=None):
+    # 콘텐츠 필터 결과만 담은 첫 청크
+    yield SimpleNamespace(choices=[])
+    for text in texts:
+        yield _chunk(text)
+    if error is not None:
+        raise error
+
+def test_yields_text_and_reports_completion():
+    events = []
+
+    chunks = list(iter_completion_text(
+        _stream("연차는 ", None, "인사 시스템에서 신청합니다."),
+        on_complete=lambda answer: events.append(("complete", answer)),
+        on_first_token=lambda: events.append(("first_token",)),
+        on_error=lambda message, aborted: events.append(("error", message, aborted))
+    ))
+
+    assert chunks == ["연차는 ", "인사 시스템에서 신청합니다."]
+    assert events == [("first_token",), ("complete", "연차는 인사 시스템에서 신청합니다.")]
+
+def test_empty_stream_still_completes():
+    completed = []
+
+    assert list(iter_completion_text(_stream(), on_complete=completed.append)) == []
+    assert completed == [""]
+
+def test_failure_mid_stream_reports_error_instead_of_completion():
+    events = []
+
+    chunks = list(iter_completion_text(
+        _stream("연차는 ", error=ConnectionError("reset")),
+        on_complete=lambda answer: events.append(("complete", answer)),
+        on_error=lambda message, aborted: events.append(("error", message, aborted))
+    ))
+
+    assert chunks[0] == "연차는 "
+    assert "reset" in chunks[-1]
+    assert events == [("error", "reset", False)]
+
+def test_closing_the_stream_early_is_reported_as_aborted():
+    events = []
+    chunks = iter_completion_text(
+        _stream("a", "b", "c"),
+        on_complete=lambda answer: events.append(("complete", answer)),
+        on_error=lambda message, aborted: events.append(("error", aborted))
+    )
+
+    assert next(chunks) == "a"
+    chunks.close()
+
+    assert events == [("error", True)]
@@ -0,0 +1,28 @@
+import numpy as np
+
+from embedding_utils import normalize_rows
+from vector_index import LocalVectorIndex, write_vector_index
+
+def _documents(count):
+    return [{"id": f"doc-{i}", "content": f"문서 {i}"} for i in range(count)]
+
+def test_exact_search_returns_nearest_documents_in_order(tmp_path):
+    vectors = normalize_rows(np.random.RandomState(0).rand(50, 8).astype(np.float32))
+    write_vector_index(str(tmp_path / "vector"), _documents(50), vectors)
+    index = LocalVectorIndex.load(str(tmp_path / "vector"))
+
+    hits = index.search_vectors(vectors[7], 3)[0]
+
+    expected = np.argsort(-(vectors @ vectors[7]))[:3]
+    assert [index.get_document(row)["id"] for _, row in hits] == [f"doc-{i}" for i in expected]
+    assert hits[0][0] >= hits[1][0] >= hits[2][0]
+
+def test_ivf_index_finds_the_query_document(tmp_path):
+    vectors = normalize_rows(np.random.RandomState(1).rand(200, 8).astype(np.float32))
+    write_vector_index(str(tmp_path / "vector"), _documents(200), vectors, ivf_lists=8)
+    index = LocalVectorIndex.load(str(tmp_path / "vector"))
+
+    assert index.is_ivf
+    for row in (0, 57, 199):
+        _, best = index.search_vectors(vectors[row], 1)[0][0]
+        assert index.get_document(best)["id"] == f"doc-{row}"
@@ -0,0 +1,94 @@
+"""
+텍스트 처리 유틸리티 모듈
+한국어 문서/질문을 위한 토큰화, 문단/문장 분리 기능을 제공합니다.
+"""
+
+import re
+import unicodedata
+from typing import List
+
+_WORD_PATTERN = re.compile(r"[0-9A-Za-z]+|[가-힣]+")
+_HANGUL_PATTERN = re.compile(r"^[가-힣]+$")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?。])\s+|(?<=다\.)\s*|\n+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    검색/유사도 계산용 토큰화
+
+    영문/숫자는 소문자 단어 단위로, 한글은 조사/어미 변화에 덜 민감하도록
+    단어 자체와 글자 bigram을 함께 사용합니다.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    tokens = []
+    for word in _WORD_PATTERN.findall(text):
+        if _HANGUL_PATTERN.match(word) and len(word) > 2:
+            tokens.append(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+def split_paragraphs(text: str, max_chars: int = 1200) -> List[str]:
+    """빈 줄 기준으로 문단을 나누고, 너무 긴 문단은 문장 단위로 다시 나눔"""
+    paragraphs = []
+    for block in re.split(r"\n\s*\n", text or ""):
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) <= max_chars:
+            paragraphs.append(block)
+            continue
+
+        current = ""
+        for sentence in split_sentences(block):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                paragraphs.append(current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+        if current:
+            paragraphs.append(current)
+    return paragraphs
+
+def split_sentences(text: str) -> List[str]:
+    """문장 단위 분리 (마침표/물음표/느낌표, '~다.' 종결, 줄바꿈 기준)"""
+    return [sentence.strip() for sentence in _SENTENCE_PATTERN.split(text or "") if sentence and sentence.strip()]
+
+def split_passages(text: str, passage_chars: int = 1000, overlap_chars: int = 200) -> List[dict]:
+    """
+    문서를 겹치는 구간(passage)으로 분리
+
+    구간 경계는 가능하면 문장/공백 위치에 맞추며, 페이지 번호는
+    추출된 텍스트의 페이지 구분 문자(\\f) 개수로 계산합니다.
+
+    Returns:
+        content, offset, page 를 담은 딕셔너리 리스트
+    """
+    text = text or ""
+    passages = []
+    start = 0
+    length = len(text)
+
+    while start < length:
+        end = min(start + passage_chars, length)
+        if end < length:
+            # 구간 뒤쪽 절반 안에서 가장 마지막 문장/공백 경계에서 자름
+            window = text[start + passage_chars // 2:end]
+            boundary = max(window.rfind(". "), window.rfind("다."), window.rfind("\n"))
+            if boundary < 0:
+                boundary = window.rfind(" ")
+            if boundary >= 0:
+                end = start + passage_chars // 2 + boundary + 1
+
+        content = text[start:end].strip()
+        if content:
+            passages.append({
+                "content": content,
+                "offset": start,
+                "page": text.count("\f", 0, start) + 1
+            })
+
+        if end >= length:
+            break
+        start = max(end - overlap_chars, start + 1)
+
+    return passages
@@ -0,0 +1,210 @@
+"""
+운영 트래픽 캡처 모듈
+채팅 경로의 질문마다 질문, 챗봇, 검색된 문서 id, 설정(검색 방식, 성능 프로필, top, 컨텍스트 예산, 배포, 캐시)과
+단계별 소요 시간, 토큰 사용량을 gzip 압축 JSONL로 기록합니다. traffic_replay.py로 다른 설정에 다시 실행해
+지연 시간 분포와 토큰 사용량을 비교하는 데 사용합니다.
+
+ENABLE_TRAFFIC_CAPTURE=true 로 설정할 때만 기록하며(기본값: 사용 안 함), 기록은 백그라운드 스레드에서 합니다.
+파일은 TRAFFIC_CAPTURE_DIR(기본값: traffic_captures) 아래 traffic-{시각}.jsonl.gz 로 만들어지고,
+TRAFFIC_CAPTURE_MAX_BYTES 또는 TRAFFIC_CAPTURE_ROTATE_SECONDS를 넘으면 새 파일로 교체되며
+가장 최근 TRAFFIC_CAPTURE_MAX_FILES개만 유지됩니다.
+"""
+
+import os
+import glob
+import gzip
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from retrieval_utils import get_search_top_k
+
+logger = logging.getLogger(__name__)
+
+def is_traffic_capture_enabled() -> bool:
+    """트래픽 캡처 여부 (기본값: 사용 안 함)"""
+    return os.getenv("ENABLE_TRAFFIC_CAPTURE", "false").lower() in ("1", "true", "yes")
+
+def get_capture_sample_rate() -> float:
+    """기록할 질문 비율 (기본값: 1.0, 전체)"""
+    return float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0"))
+
+def get_capture_dir() -> str:
+    return os.getenv("TRAFFIC_CAPTURE_DIR", "traffic_captures")
+
+class TrafficRecorder:
+    """캡처 항목을 큐에 모아 백그라운드 스레드에서 압축 파일에 기록 (크기/시간 기준 파일 교체)"""
+
+    def __init__(self, directory: str = "traffic_captures", max_bytes: int = 50 * 1024 * 1024,
+                 rotate_seconds: float = 3600.0, max_files: int = 48, max_queue: int = 10000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.max_files = max_files
+        self.dropped = 0
+        self.recorded = 0
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = 0.0
+
+    def record(self, entry: Dict):
+        """기록 요청을 큐에 넣음 (요청 경로를 막지 않도록 큐가 가득 차면 버림)"""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._writer_loop, name="traffic-capture", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"traffic-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl.gz")
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self._file_bytes = 0
+        self._file_opened = time.time()
+        logger.info(f"트래픽 캡처 파일: {path}")
+        self._remove_old_files()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _remove_old_files(self):
+        files = sorted(glob.glob(os.path.join(self.directory, "traffic-*.jsonl.gz")), key=os.path.getmtime)
+        for path in files[:-self.max_files] if self.max_files > 0 else []:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"오래된 캡처 파일 삭제 실패 ({path}): {e}")
+
+    def _write(self, batch: List[Dict]):
+        try:
+            if self._file is not None and (
+                self._file_bytes >= self.max_bytes or time.time() - self._file_opened >= self.rotate_seconds
+            ):
+                self._close()
+            if self._file is None:
+                self._open()
+            for entry in batch:
+                line = json.dumps(entry, ensure_ascii=False) + "\n"
+                self._file.write(line)
+                self._file_bytes += len(line)
+            self._file.flush()
+            self.recorded += len(batch)
+        except Exception as e:
+            logger.error(f"트래픽 캡처 기록 실패 ({len(batch)}건): {e}")
+
+    def _writer_loop(self):
+        while True:
+            entry = self._queue.get()
+            batch = [] if entry is None else [entry]
+            while entry is not None and len(batch) < 200:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is not None:
+                    batch.append(entry)
+            if batch:
+                self._write(batch)
+            if entry is None:
+                self._close()
+                return
+
+    def flush(self, timeout: float = 5.0):
+        """큐에 남은 기록을 모두 쓰고 파일을 닫음"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+def build_capture_entry(request) -> Dict:
+    """RAGRequest를 캡처 항목으로 변환 (다시 실행하는 데 필요한 입력 + 비교할 결과)"""
+    context = request.context or {}
+    profile = request.profile.to_dict() if getattr(request, "profile", None) is not None else {}
+    route = getattr(request, "route", None)
+    now = time.time()
+    return {
+        "captured_at": now,
+        # 재실행 시 원래 간격을 재현하기 위한 질문 시작 시각
+        "started_at": now - request.timings.get("total", 0.0) / 1000,
+        "chatbot_name": request.chatbot_name,
+        "index_name": request.index_name,
+        "index_version": request.index_version,
+        "question": request.question,
+        "config": {
+            "retrieval_mode": request.retrieval_mode,
+            "profile": profile,
+            "top": profile.get("top") or get_search_top_k(),
+            "context_token_budget": context.get("token_budget"),
+            "deployment": request.deployment,
+            "route_tier": route.deployment.tier if route is not None else None,
+            "stream": request.stream,
+            "followup": request.followup,
+            "history_messages": len(request.history),
+        },
+        "document_ids": list(request.document_ids),
+        "sources": list(context.get("sources") or []),
+        "timings": {stage: round(ms, 1) for stage, ms in request.timings.items()},
+        "tokens": {
+            "context": context.get("tokens_used"),
+            "prompt": request.prompt_tokens,
+            "completion": request.completion_tokens,
+        },
+        "cache_hit": request.cache_hit,
+        "coalesced": request.coalesced,
+        "fallback_used": request.fallback_used,
+        "error": request.error,
+    }
+
+def capture_hook(stage: str, elapsed_ms: float, request):
+    """RAG 엔진 타이밍 훅: 질문 처리가 끝나면(total) 캡처 항목 한 줄을 기록"""
+    if stage != "total" or not is_traffic_capture_enabled():
+        return
+    if random.random() >= get_capture_sample_rate():
+        return
+    traffic_recorder.record(build_capture_entry(request))
+
+def load_captured(paths: List[str]) -> List[Dict]:
+    """캡처 파일(또는 디렉터리)들의 항목을 기록 시각 순서로 읽음 (기록 중이라 끝이 잘린 파일도 읽은 곳까지 사용)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "traffic-*.jsonl.gz")))
+        else:
+            files.extend(glob.glob(path))
+
+    entries = []
+    for path in sorted(set(files)):
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except (EOFError, OSError) as e:
+            logger.warning(f"캡처 파일을 끝까지 읽지 못했습니다 ({path}): {e}")
+    entries.sort(key=lambda entry: entry.get("started_at") or entry.get("captured_at") or 0)
+    return entries
+
+# 프로세스 전체에서 공유하는 트래픽 기록기
+traffic_recorder = TrafficRecorder(
+    directory=get_capture_dir(),
+    max_bytes=int(os.getenv("TRAFFIC_CAPTURE_MAX_BYTES", str(50 * 1024 * 1024))),
+    rotate_seconds=float(os.getenv("TRAFFIC_CAPTURE_ROTATE_SECONDS", "3600")),
+    max_files=int(os.getenv("TRAFFIC_CAPTURE_MAX_FILES", "48"))
+)
+atexit.register(traffic_recorder.flush)
@@ -0,0 +1,254 @@
+"""
+캡처한 운영 트래픽 재실행 CLI
+traffic_capture.py가 기록한 질문들을 원래 간격(또는 --speed 배속)으로 다른 설정(top, 컨텍스트 예산, 배포,
+생성 설정, 검색 방식, 캐시 사용 여부)에 다시 보내고, 캡처 당시와 재실행 결과의
+지연 시간 분포, 토큰 사용량, 검색 문서 겹침 정도를 나란히 비교합니다.
+채팅 경로(RAG 엔진) 변경을 배포하기 전에 실제 트래픽으로 확인하는 데 사용합니다.
+
+사용법:
+    python traffic_replay.py traffic_captures/ --speed 10 --top 3 --context-tokens 1500
+    USE_STUB_CLIENTS=true python traffic_replay.py traffic_captures/ --speed 0 --no-cache --output replay.jsonl
+
+후속 질문은 이전 대화 없이 단발 질문으로 다시 실행됩니다.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from batch_query import BatchRunner, resolve_chatbot
+from profile_utils import PerformanceProfile
+from rag_engine import create_rag_engine
+from telemetry_utils import percentile, telemetry_store
+from traffic_capture import load_captured
+
+logger = logging.getLogger(__name__)
+
+# 비교할 단계 (타이밍 훅 stage 이름: 표시명)
+COMPARE_STAGES = {
+    "retrieve": "검색",
+    "rerank": "재순위화",
+    "context": "컨텍스트 구성",
+    "generate": "답변 생성",
+    "total": "전체",
+}
+
+def build_replay_profile(captured: Dict, overrides: Dict) -> PerformanceProfile:
+    """캡처 당시 성능 프로필에 명령행에서 지정한 값을 덮어쓴 프로필"""
+    values = dict(captured or {})
+    values.update({key: value for key, value in overrides.items() if value is not None})
+    return PerformanceProfile(**values)
+
+def _summarize(records: List[Dict]) -> Dict:
+    """캡처/재실행 결과 한쪽의 지연 백분위수와 토큰/캐시/오류 통계"""
+    ok = [r for r in records if not r.get("error")]
+    summary = {"questions": len(records), "errors": len(records) - len(ok)}
+    for stage in COMPARE_STAGES:
+        values = [(r.get("timings") or {}).get(stage) for r in ok]
+        for p in (50, 95):
+            summary[f"{stage}_p{p}_ms"] = percentile(values, p)
+    for kind in ("context", "prompt", "completion"):
+        values = [(r.get("tokens") or {}).get(kind) for r in ok]
+        values = [v for v in values if v]
+        summary[f"{kind}_tokens_avg"] = sum(values) / len(values) if values else None
+        summary[f"{kind}_tokens_total"] = sum(values)
+    summary["cache_hit_rate"] = sum(1 for r in ok if r.get("cache_hit")) / len(ok) if ok else None
+    summary["fallbacks"] = sum(1 for r in ok if r.get("fallback_used"))
+    return summary
+
+def document_overlap(captured: List[Dict], replayed: List[Dict]) -> Optional[float]:
+    """같은 질문의 캡처/재실행 검색 문서 id 평균 자카드 유사도 (둘 다 검색한 질문만)"""
+    scores = []
+    for before, after in zip(captured, replayed):
+        a, b = set(before.get("document_ids") or []), set(after.get("document_ids") or [])
+        if a and b:
+            scores.append(len(a & b) / len(a | b))
+    return sum(scores) / len(scores) if scores else None
+
+def compare(captured: List[Dict], replayed: List[Dict]) -> Dict:
+    """캡처 당시와 재실행 결과 비교표"""
+    return {
+        "captured": _summarize(captured),
+        "replayed": _summarize(replayed),
+        "document_overlap": document_overlap(captured, replayed),
+    }
+
+def _format(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3f}" if value < 1 else f"{value:,.1f}"
+    return f"{value:,}"
+
+def print_comparison(report: Dict):
+    captured, replayed = report["captured"], report["replayed"]
+    rows = [("질문 수", "questions"), ("오류", "errors")]
+    for stage, label in COMPARE_STAGES.items():
+        rows.append((f"{label} p50 (ms)", f"{stage}_p50_ms"))
+        rows.append((f"{label} p95 (ms)", f"{stage}_p95_ms"))
+    rows += [
+        ("컨텍스트 토큰 평균", "context_tokens_avg"),
+        ("프롬프트 토큰 합계", "prompt_tokens_total"),
+        ("답변 토큰 합계", "completion_tokens_total"),
+        ("캐시 적중률", "cache_hit_rate"),
+        ("추출형 답변", "fallbacks"),
+    ]
+
+    print("=" * 72)
+    print(f"{'지표':<22}{'캡처':>16}{'재실행':>16}{'변화':>16}")
+    print("-" * 72)
+    for label, key in rows:
+        before, after = captured.get(key), replayed.get(key)
+        change = "-"
+        if isinstance(before, (int, float)) and isinstance(after, (int, float)) and before:
+            change = f"{(after - before) / before * 100:+.1f}%"
+        print(f"{label:<22}{_format(before):>16}{_format(after):>16}{change:>16}")
+    print("-" * 72)
+    print(f"검색 문서 겹침 (자카드 평균): {_format(report['document_overlap'])}")
+
+class TrafficReplayer:
+    """캡처 항목을 원래 시작 간격 / speed 배속으로 제한된 동시성 안에서 다시 실행"""
+
+    def __init__(self, engine, overrides: Dict, retrieval_mode: Optional[str] = None,
+                 concurrency: int = 8, speed: float = 1.0):
+        self.engine = engine
+        self.overrides = overrides
+        self.retrieval_mode = retrieval_mode
+        self.concurrency = max(1, concurrency)
+        self.speed = speed
+        self._runners: Dict[str, BatchRunner] = {}
+        self._lock = threading.Lock()
+
+    def _get_runner(self, entry: Dict) -> BatchRunner:
+        name = entry.get("chatbot_name") or entry.get("index_name")
+        with self._lock:
+            if name not in self._runners:
+                retrieval_mode = self.retrieval_mode or (entry.get("config") or {}).get("retrieval_mode")
+                try:
+                    target = resolve_chatbot(chatbot_name=name, retrieval_mode=retrieval_mode)
+                except ValueError:
+                    # 등록되지 않은 챗봇(인덱스명으로 기록된 경우)은 인덱스로 직접 실행
+                    target = resolve_chatbot(index_name=entry.get("index_name"), retrieval_mode=retrieval_mode)
+                self._runners[name] = BatchRunner(self.engine, target, concurrency=self.concurrency)
+            return self._runners[name]
+
+    def _replay_one(self, i: int, entry: Dict, scheduled: float) -> Dict:
+        try:
+            runner = self._get_runner(entry)
+            profile = build_replay_profile((entry.get("config") or {}).get("profile"), self.overrides)
+            return runner.ask(str(i), entry["question"], scheduled, profile=profile)
+        except Exception as e:
+            return {"id": str(i), "question": entry.get("question"), "error": str(e)}
+
+    def run(self, entries: List[Dict]) -> List[Dict]:
+        """재실행 결과를 입력과 같은 순서로 반환"""
+        results: List[Optional[Dict]] = [None] * len(entries)
+        first = entries[0].get("started_at") or entries[0].get("captured_at") or 0
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="traffic-replay") as executor:
+            futures = []
+            for i, entry in enumerate(entries):
+                offset = 0.0
+                if self.speed > 0:
+                    offset = ((entry.get("started_at") or entry.get("captured_at") or first) - first) / self.speed
+                    delay = started + offset - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                futures.append((i, executor.submit(self._replay_one, i, entry, started + offset)))
+
+            for done, (i, future) in enumerate(futures, 1):
+                results[i] = future.result()
+                status = "❌" if results[i].get("error") else "✅"
+                print(f"[{done}/{len(entries)}] {status} {results[i].get('latency_ms', 0):.0f}ms "
+                      f"{entries[i].get('question', '')[:40]}")
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description="캡처한 트래픽을 다른 설정으로 다시 실행해 비교")
+    parser.add_argument("captures", nargs="+", help="캡처 파일 또는 디렉터리 (traffic-*.jsonl.gz)")
+    parser.add_argument("--chatbot", help="이 챗봇의 트래픽만 재실행")
+    parser.add_argument("--limit", type=int, default=0, help="재실행할 최대 질문 수 (0이면 전체)")
+    parser.add_argument("--speed", type=float, default=1.0, help="재생 배속 (1=원래 간격, 10=10배 빠르게, 0=간격 없이)")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시에 처리할 최대 질문 수")
+    parser.add_argument("--include-cache-hits", action="store_true", help="캡처 당시 캐시 적중 질문도 재실행")
+    # 비교할 설정
+    parser.add_argument("--top", type=int, help="검색 문서 수")
+    parser.add_argument("--context-tokens", type=int, help="컨텍스트 토큰 예산")
+    parser.add_argument("--temperature", type=float)
+    parser.add_argument("--max-tokens", type=int)
+    parser.add_argument("--search-mode", choices=["any", "all"])
+    parser.add_argument("--deployment", help="채팅 배포 (지정하면 모델 라우팅 생략)")
+    parser.add_argument("--retrieval-mode", choices=["keyword", "hybrid", "bm25"])
+    parser.add_argument("--no-cache", action="store_true", help="답변 캐시를 사용하지 않음")
+    parser.add_argument("--output", help="재실행 결과 JSONL 파일")
+    parser.add_argument("--report", help="비교 결과를 저장할 JSON 파일")
+    args = parser.parse_args()
+
+    load_dotenv()
+    # 재실행한 질문이 다시 캡처되지 않도록 함
+    os.environ["ENABLE_TRAFFIC_CAPTURE"] = "false"
+
+    entries = [
+        entry for entry in load_captured(args.captures)
+        if entry.get("question")
+        and (not args.chatbot or entry.get("chatbot_name") == args.chatbot)
+        and (args.include_cache_hits or not entry.get("cache_hit"))
+    ]
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        print("❌ 재실행할 캡처 항목이 없습니다.")
+        sys.exit(1)
+
+    overrides = {
+        "top": args.top, "context_tokens": args.context_tokens, "temperature": args.temperature,
+        "max_tokens": args.max_tokens, "search_mode": args.search_mode, "deployment": args.deployment,
+    }
+    try:
+        build_replay_profile({}, overrides)
+    except ValueError as e:
+        parser.error(str(e))
+
+    span = (entries[-1].get("started_at") or 0) - (entries[0].get("started_at") or 0)
+    pacing = f"{args.speed:g}배속, 원래 {span:.0f}초" if args.speed > 0 else "간격 없이"
+    print(f"🔁 캡처 {len(entries)}건 재실행 ({pacing}, 동시 최대 {args.concurrency}개)")
+    changed = {key: value for key, value in overrides.items() if value is not None}
+    if changed or args.retrieval_mode or args.no_cache:
+        print(f"⚙️ 변경한 설정: {changed}, 검색 방식 {args.retrieval_mode or '캡처 당시'}, "
+              f"캐시 {'사용 안 함' if args.no_cache else '사용'}")
+
+    engine = create_rag_engine(use_cache=not args.no_cache)
+    replayer = TrafficReplayer(engine, overrides, args.retrieval_mode, args.concurrency, args.speed)
+    try:
+        replayed = replayer.run(entries)
+    except KeyboardInterrupt:
+        print("\n⏹️ 중단되었습니다.")
+        sys.exit(130)
+    finally:
+        telemetry_store.flush()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for record in replayed:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"📝 재실행 결과 저장: {args.output}")
+
+    report = compare(entries, replayed)
+    print_comparison(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📝 비교 결과 저장: {args.report}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
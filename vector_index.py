@@ -0,0 +1,365 @@
+"""
+로컬 벡터 검색 인덱스 모듈
+임베딩을 NumPy memmap(.npy) 파일로 저장하고 문서 id/메타데이터는 별도 파일로 보관합니다.
+로드 시 배열과 문서 목록을 모두 메모리 매핑하므로 시작 시간이 문서 수와 무관하며,
+여러 Streamlit 워커가 같은 페이지 캐시를 공유합니다.
+
+문서 수가 많으면 coarse quantizer(IVF) 모드로 만들어 가까운 군집만 탐색할 수 있습니다.
+
+사용 예:
+    python vector_index.py --index-name guide-index                      # 로컬 BM25 인덱스의 구간 사용
+    python vector_index.py --folder ./docs --index-name guide-index --ivf-lists 256
+    python vector_index.py --index-name guide-index --query "휴가 신청 방법"
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from embedding_utils import embed_texts, embed_text, get_embedding_deployment
+from followup_utils import parse_id_filter
+from retrieval_utils import SearchResultList, get_document_key
+
+logger = logging.getLogger(__name__)
+
+LOCAL_INDEX_ROOT = os.getenv("LOCAL_INDEX_DIR", "local_indexes")
+
+# 한 번의 행렬 곱에서 처리할 벡터 행 수 (메모리 사용량 상한)
+SEARCH_BLOCK_ROWS = int(os.getenv("VECTOR_SEARCH_BLOCK_ROWS", "65536"))
+
+# 문서 id 필터가 있을 때 필터 전에 더 가져올 배수
+FILTER_OVERFETCH = 4
+
+class LocalVectorIndex:
+    """
+    memmap 기반 벡터 인덱스
+
+    IVF 모드에서는 벡터를 군집 순서로 재배치해 저장하므로 군집 하나가
+    파일의 연속 구간이 되고, 탐색한 군집의 페이지만 읽게 됩니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.meta: Dict = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.doc_offsets = np.zeros(1, dtype=np.int64)
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+        self.nprobe = int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+        self._documents_file = None
+        self._file_lock = threading.Lock()
+
+    @property
+    def document_count(self) -> int:
+        return int(self.vectors.shape[0])
+
+    @property
+    def dimensions(self) -> int:
+        return int(self.meta.get("dimensions", 0))
+
+    @property
+    def is_ivf(self) -> bool:
+        return self.centroids is not None
+
+    @classmethod
+    def load(cls, path: str) -> "LocalVectorIndex":
+        """저장된 인덱스 로드 (벡터와 문서 오프셋은 메모리 매핑, 문서는 조회 시 읽음)"""
+        index = cls(path)
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            index.meta = json.load(f)
+        index.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        index.doc_offsets = np.load(os.path.join(path, "doc_offsets.npy"), mmap_mode="r")
+
+        ivf_path = os.path.join(path, "ivf.npz")
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                index.centroids = ivf["centroids"]
+                index.list_offsets = ivf["list_offsets"]
+        return index
+
+    def get_document(self, row: int) -> Dict:
+        """행 번호에 해당하는 문서 메타데이터 (documents.jsonl에서 해당 줄만 읽음)"""
+        with self._file_lock:
+            if self._documents_file is None:
+                self._documents_file = open(os.path.join(self.path, "documents.jsonl"), "rb")
+            self._documents_file.seek(int(self.doc_offsets[row]))
+            line = self._documents_file.readline()
+        return json.loads(line.decode("utf-8"))
+
+    def _candidate_ranges(self, queries: np.ndarray) -> List[List[tuple]]:
+        """질의별로 탐색할 (시작 행, 끝 행) 구간 목록"""
+        if not self.is_ivf:
+            return [[(0, self.document_count)]] * len(queries)
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        nearest = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        return [
+            [(int(self.list_offsets[c]), int(self.list_offsets[c + 1])) for c in sorted(row)]
+            for row in nearest
+        ]
+
+    def search_vectors(self, queries: np.ndarray, top: int) -> List[List[tuple]]:
+        """
+        여러 질의 벡터의 top-k 검색 (정규화된 벡터의 내적 = 코사인 유사도)
+
+        Returns:
+            질의별 (점수, 행 번호) 목록
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.document_count == 0 or top <= 0:
+            return [[] for _ in queries]
+        if queries.shape[1] != self.vectors.shape[1]:
+            raise ValueError(
+                f"질의 벡터 차원({queries.shape[1]})이 인덱스 차원({self.vectors.shape[1]})과 다릅니다."
+            )
+
+        best_scores = np.full((len(queries), top), -np.inf, dtype=np.float32)
+        best_rows = np.full((len(queries), top), -1, dtype=np.int64)
+
+        # 같은 구간을 탐색하는 질의를 묶어 한 번의 행렬 곱으로 처리
+        groups: Dict[tuple, List[int]] = {}
+        for q, ranges in enumerate(self._candidate_ranges(queries)):
+            for rng in ranges:
+                if rng[1] > rng[0]:
+                    groups.setdefault(rng, []).append(q)
+
+        for (start, end), members in groups.items():
+            members = np.asarray(members)
+            for block_start in range(start, end, SEARCH_BLOCK_ROWS):
+                block_end = min(block_start + SEARCH_BLOCK_ROWS, end)
+                scores = queries[members] @ self.vectors[block_start:block_end].T
+                rows = np.broadcast_to(np.arange(block_start, block_end), scores.shape)
+
+                merged_scores = np.concatenate([best_scores[members], scores], axis=1)
+                merged_rows = np.concatenate([best_rows[members], rows], axis=1)
+                keep = np.argpartition(-merged_scores, top - 1, axis=1)[:, :top]
+                best_scores[members] = np.take_along_axis(merged_scores, keep, axis=1)
+                best_rows[members] = np.take_along_axis(merged_rows, keep, axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append([(float(scores[i]), int(rows[i])) for i in order if rows[i] >= 0])
+        return results
+
+    def search(self, search_text: Optional[str] = None, top: int = 50, vector_queries=None,
+               include_total_count: bool = False, **kwargs) -> SearchResultList:
+        """
+        SearchClient.search(vector_queries=...) 와 같은 방식의 벡터 검색 (텍스트 검색은 지원하지 않음)
+
+        filter(build_id_filter 형식의 문서 id 필터)를 주면 넉넉하게 가져온 근접 문서 중 해당 id만 남깁니다
+        (문서는 조회 시에만 읽으므로 id로 행을 바로 찾지 않음).
+        """
+        if not vector_queries:
+            raise ValueError("로컬 벡터 인덱스는 vector_queries 검색만 지원합니다.")
+
+        allowed_ids = parse_id_filter(kwargs.get("filter"))
+        query = vector_queries[0]
+        k = min(getattr(query, "k_nearest_neighbors", None) or top, top)
+        if allowed_ids is not None:
+            k = max(k, len(allowed_ids)) * FILTER_OVERFETCH
+        hits = self.search_vectors(np.asarray(query.vector, dtype=np.float32), min(k, self.document_count))[0]
+
+        results = []
+        for score, row in hits:
+            doc = self.get_document(row)
+            if allowed_ids is not None and get_document_key(doc) not in allowed_ids:
+                continue
+            doc["@search.score"] = score
+            results.append(doc)
+            if len(results) >= top:
+                break
+        return SearchResultList(results, len(results) if include_total_count else None)
+
+def _kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 10, sample_size: int = 100000,
+            seed: int = 0) -> np.ndarray:
+    """구형(spherical) k-means로 IVF 군집 중심 계산 (표본 사용)"""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > sample_size:
+        sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    sample = np.asarray(sample, dtype=np.float32)
+
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = sample[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+            else:
+                # 빈 군집은 임의의 표본으로 다시 시작
+                centroids[c] = sample[rng.integers(len(sample))]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids /= norms
+    return centroids
+
+def _assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """전체 벡터를 블록 단위로 가장 가까운 군집에 배정"""
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+        assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+def write_vector_index(path: str, documents: List[Dict], vectors: np.ndarray, ivf_lists: int = 0) -> LocalVectorIndex:
+    """
+    문서와 임베딩으로 인덱스 파일 생성
+
+    Args:
+        path: 인덱스 디렉터리
+        documents: 문서 메타데이터 목록 (vectors와 같은 순서)
+        vectors: (문서 수, 차원) 정규화된 float32 배열
+        ivf_lists: IVF 군집 수 (0이면 전수 탐색)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if len(documents) != len(vectors):
+        raise ValueError("문서 수와 벡터 수가 다릅니다.")
+
+    os.makedirs(path, exist_ok=True)
+    order = np.arange(len(documents))
+    ivf_path = os.path.join(path, "ivf.npz")
+
+    if ivf_lists and len(vectors) > ivf_lists:
+        centroids = _kmeans(vectors, ivf_lists)
+        assign = _assign_lists(vectors, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=ivf_lists)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        np.savez(ivf_path, centroids=centroids, list_offsets=list_offsets)
+    elif os.path.exists(ivf_path):
+        os.remove(ivf_path)
+
+    # 군집 순서대로 재배치한 벡터를 memmap 파일에 직접 기록
+    stored = np.lib.format.open_memmap(
+        os.path.join(path, "vectors.npy"), mode="w+", dtype=np.float32, shape=vectors.shape
+    )
+    for start in range(0, len(order), SEARCH_BLOCK_ROWS):
+        rows = order[start:start + SEARCH_BLOCK_ROWS]
+        stored[start:start + len(rows)] = vectors[rows]
+    stored.flush()
+    del stored
+
+    offsets = np.zeros(len(order), dtype=np.int64)
+    with open(os.path.join(path, "documents.jsonl"), "wb") as f:
+        for row, doc_no in enumerate(order):
+            offsets[row] = f.tell()
+            doc = {key: value for key, value in documents[doc_no].items() if not key.startswith("@search.")}
+            f.write((json.dumps(doc, ensure_ascii=False) + "\n").encode("utf-8"))
+    np.save(os.path.join(path, "doc_offsets.npy"), offsets)
+
+    # meta.json을 마지막에 기록해 로더가 완성된 인덱스만 보도록 함
+    meta = {
+        "dimensions": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "count": len(documents),
+        "embedding_deployment": get_embedding_deployment(),
+        "ivf_lists": int(ivf_lists) if os.path.exists(ivf_path) else 0,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    logger.info(f"벡터 인덱스 저장 완료: {path} (문서 {len(documents)}개, IVF 군집 {meta['ivf_lists']}개)")
+    return LocalVectorIndex.load(path)
+
+def get_vector_index_path(index_name: str) -> str:
+    """인덱스명에 해당하는 로컬 벡터 인덱스 경로"""
+    return os.path.join(LOCAL_INDEX_ROOT, index_name, "vector")
+
+def build_vector_index(index_name: str, openai_client, documents: Optional[List[Dict]] = None,
+                       ivf_lists: Optional[int] = None, batch_size: int = 16) -> LocalVectorIndex:
+    """
+    문서 구간을 임베딩해 로컬 벡터 인덱스 생성
+
+    documents를 지정하지 않으면 같은 인덱스명의 로컬 BM25 인덱스 구간을 사용하므로
+    두 로컬 인덱스의 문서 id가 일치해 RRF 병합이 가능합니다.
+    """
+    if documents is None:
+        from bm25_index import get_local_bm25_index
+        bm25 = get_local_bm25_index(index_name)
+        if bm25 is None:
+            raise RuntimeError(f"'{index_name}' 로컬 BM25 인덱스가 없습니다. 문서를 먼저 지정하세요.")
+        documents = bm25.documents
+
+    if ivf_lists is None:
+        ivf_lists = int(os.getenv("VECTOR_IVF_LISTS", "0"))
+
+    vectors = embed_texts(openai_client, [doc.get("content", "") for doc in documents], batch_size=batch_size)
+    index = write_vector_index(get_vector_index_path(index_name), documents, vectors, ivf_lists)
+    _loaded_indexes.pop(index_name, None)
+    return index
+
+_loaded_indexes: Dict[str, tuple] = {}
+_load_lock = threading.Lock()
+
+def get_local_vector_index(index_name: str) -> Optional[LocalVectorIndex]:
+    """저장된 로컬 벡터 인덱스 조회 (프로세스 내 캐시, 파일이 갱신되면 다시 로드)"""
+    if not index_name:
+        return None
+    meta_path = os.path.join(get_vector_index_path(index_name), "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+
+    mtime = os.path.getmtime(meta_path)
+    with _load_lock:
+        cached = _loaded_indexes.get(index_name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            index = LocalVectorIndex.load(get_vector_index_path(index_name))
+        except Exception as e:
+            logger.error(f"로컬 벡터 인덱스 로드 실패 ({index_name}): {e}")
+            return None
+        _loaded_indexes[index_name] = (mtime, index)
+        return index
+
+def main():
+    from openai import AzureOpenAI
+    from bm25_index import make_documents, read_folder_files, read_container_files
+
+    parser = argparse.ArgumentParser(description="로컬 벡터 인덱스 생성/검색")
+    parser.add_argument("--index-name", required=True, help="챗봇 인덱스명 (예: guide-index)")
+    parser.add_argument("--container", help="문서를 읽을 Azure Blob 컨테이너")
+    parser.add_argument("--folder", help="문서를 읽을 로컬 폴더")
+    parser.add_argument("--from-bm25", action="store_true", help="로컬 BM25 인덱스의 구간으로 생성")
+    parser.add_argument("--passage-chars", type=int, default=1000, help="구간 크기 (0이면 파일 단위)")
+    parser.add_argument("--ivf-lists", type=int, default=None, help="IVF 군집 수 (0이면 전수 탐색)")
+    parser.add_argument("--query", help="생성 후(또는 기존 인덱스로) 실행할 검색어")
+    parser.add_argument("--top", type=int, default=3)
+    args = parser.parse_args()
+
+    openai_client = AzureOpenAI(
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_version="2023-12-01-preview"
+    )
+
+    if args.container or args.folder or args.from_bm25:
+        documents = None
+        if args.container or args.folder:
+            files = read_folder_files(args.folder) if args.folder else read_container_files(args.container)
+            documents = make_documents(files, args.passage_chars)
+        index = build_vector_index(args.index_name, openai_client, documents, args.ivf_lists)
+        print(f"✅ 벡터 인덱스 생성 완료: 문서 {index.document_count}개 → {get_vector_index_path(args.index_name)}")
+    else:
+        index = get_local_vector_index(args.index_name)
+        if index is None:
+            print(f"❌ '{args.index_name}' 로컬 벡터 인덱스가 없습니다. --container, --folder 또는 --from-bm25로 먼저 생성하세요.")
+            return
+
+    if args.query:
+        hits = index.search_vectors(embed_text(openai_client, args.query), args.top)[0]
+        for i, (score, row) in enumerate(hits, 1):
+            doc = index.get_document(row)
+            print(f"{i}. [{score:.3f}] {doc.get('metadata_storage_name')}: {doc.get('content', '')[:100]}...")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()